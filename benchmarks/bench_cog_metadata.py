@@ -0,0 +1,86 @@
+"""Benchmark COG metadata fetching for Map.add_raster against a local stand-in tiler.
+
+The stand-in answers /cog/info and /cog/tilejson.json after a fixed delay, like a remote
+titiler would. Compares fresh serial httpx.get calls (the previous add_raster behaviour) with
+the pooled, concurrent and cached get_cog_metadata.
+
+Usage:
+    python benchmarks/bench_cog_metadata.py [n_layers] [latency_ms]
+"""
+
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+from rasterarea.ipyleafletmap import clear_http_cache, get_cog_metadata
+
+
+def start_standin_tiler(latency):
+    """Start a stand-in titiler on a free local port and return its endpoint."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            time.sleep(latency)
+            if self.path.startswith("/cog/info"):
+                body = {"bounds": [-180, -90, 180, 90]}
+            else:
+                body = {"tiles": ["http://localhost/{z}/{x}/{y}.png"]}
+            data = json.dumps(body).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{httpd.server_address[1]}"
+
+
+def serial_fresh(urls, endpoint):
+    for url in urls:
+        httpx.get(f"{endpoint}/cog/info", params={"url": url}).json()
+        httpx.get(f"{endpoint}/cog/tilejson.json", params={"url": url}).json()
+
+
+def pooled_concurrent(urls, endpoint):
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda url: get_cog_metadata(url, titiler_endpoint=endpoint), urls))
+
+
+def timeit(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def main(n=50, latency_ms=20):
+    endpoint = start_standin_tiler(latency_ms / 1000)
+    urls = [f"https://example.com/layer{i}.tif" for i in range(n)]
+
+    serial = timeit(serial_fresh, urls, endpoint)
+    clear_http_cache()
+    pooled = timeit(pooled_concurrent, urls, endpoint)
+    cached = timeit(pooled_concurrent, urls, endpoint)
+
+    print(f"layers:             {n} ({latency_ms} ms per request)")
+    print(f"serial, fresh:      {serial:.3f} s")
+    print(f"pooled, concurrent: {pooled:.3f} s ({serial / pooled:.1f}x)")
+    print(f"cached:             {cached:.3f} s")
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    latency_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 20
+    main(n, latency_ms)
@@ -0,0 +1,61 @@
+"""Benchmark the vectorized pixel_area_array against the original per-pixel loop.
+
+Usage:
+    python benchmarks/bench_pixel_area.py [n_pixels]
+"""
+
+import math
+import sys
+import time
+
+import numpy as np
+
+from rasterarea.rasterarea import _ellipsoid_axes, pixel_area_array
+
+
+def pixel_area_loop(point_cloud_arrary, pixel_size=1, coordinatesp='WGS84'):
+    """The per-pixel loop pixel_area_array used before it was vectorized."""
+    a, b = _ellipsoid_axes(coordinatesp)
+    raster_area = point_cloud_arrary
+    for i in range(len(point_cloud_arrary)):
+        center_lat = point_cloud_arrary[i][1]
+        c = math.sqrt(1 - (b/a)**2)
+        zm_a = 1 - c*math.sin(math.radians(center_lat+pixel_size/2))
+        zp_a = 1 + c*math.sin(math.radians(center_lat+pixel_size/2))
+        area_a = math.pi * b**2 * (math.log(zp_a/zm_a) / (2*c) + math.sin(math.radians(center_lat+pixel_size/2)) / (zp_a*zm_a))
+        zm_b = 1 - c*math.sin(math.radians(center_lat-pixel_size/2))
+        zp_b = 1 + c*math.sin(math.radians(center_lat-pixel_size/2))
+        area_b = math.pi * b**2 * (math.log(zp_b/zm_b) / (2*c) + math.sin(math.radians(center_lat-pixel_size/2)) / (zp_b*zm_b))
+        area = (1 / 360 * (area_a - area_b))
+        raster_area[i][2] = area
+    return raster_area
+
+
+def make_point_cloud(n, seed=0):
+    rng = np.random.default_rng(seed)
+    point_cloud = np.empty((n, 3))
+    point_cloud[:, 0] = rng.uniform(-180, 180, n)
+    point_cloud[:, 1] = rng.uniform(-89.5, 89.5, n)
+    point_cloud[:, 2] = rng.normal(size=n)
+    return point_cloud
+
+
+def timeit(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def main(n=1_000_000):
+    point_cloud = make_point_cloud(n)
+    loop_time, expected = timeit(pixel_area_loop, point_cloud.copy(), pixel_size=0.5)
+    vector_time, result = timeit(pixel_area_array, point_cloud.copy(), pixel_size=0.5)
+    np.testing.assert_allclose(result[:, 2], expected[:, 2], rtol=1e-9)
+    print(f"pixels:     {n}")
+    print(f"loop:       {loop_time:.3f} s")
+    print(f"vectorized: {vector_time:.3f} s")
+    print(f"speedup:    {loop_time / vector_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,250 @@
+"""Benchmark suite for the area computations and raster I/O paths of rasterarea.
+
+Synthetic GeoTIFFs of several sizes and dtypes are written to a temporary directory, and every
+case is timed (best of a few runs) and its peak memory measured with tracemalloc. tracemalloc
+sees the numpy allocations but not the internal buffers of GDAL.
+
+Results are written to benchmarks/results/<label>.json, the label defaulting to the version of
+rasterarea, and compared with the most recent earlier result file so that regressions between
+releases are visible.
+
+Usage:
+    python benchmarks/suite.py [--quick] [--label LABEL] [--compare PATH] [--tolerance 0.2] [--fail]
+
+See the Contributing page of the documentation for the workflow between releases.
+"""
+
+import argparse
+import glob
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+
+import rasterarea
+from rasterarea.rasterarea import (
+    ELLIPSOIDS,
+    _read_pixel,
+    _sample_points,
+    area_of_pixel,
+    get_geotiff_array,
+    pixel_area_array,
+    point_cloud_arrary,
+)
+
+SIZES = [256, 1024, 2048]
+QUICK_SIZES = [256]
+DTYPES = ["uint8", "int16", "float32"]
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def write_raster(path, size, dtype, seed=0):
+    """Write a tiled, global EPSG:4326 GeoTIFF of random values."""
+    import rasterio
+    from rasterio.transform import from_bounds
+
+    rng = np.random.default_rng(seed)
+    if np.issubdtype(np.dtype(dtype), np.integer):
+        data = rng.integers(0, 100, (size, size)).astype(dtype)
+    else:
+        data = rng.normal(size=(size, size)).astype(dtype)
+    profile = dict(
+        driver="GTiff",
+        height=size,
+        width=size,
+        count=1,
+        dtype=dtype,
+        crs="EPSG:4326",
+        transform=from_bounds(-180, -90, 180, 90, size, size),
+        nodata=0,
+        tiled=True,
+        blockxsize=256,
+        blockysize=256,
+    )
+    with rasterio.open(path, "w", **profile) as dst:
+        dst.write(data, 1)
+
+
+def measure(func, repeat=3):
+    """Get the best time of a few runs of func and the peak memory of one traced run."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {"time": min(times), "peak_memory": peak}
+
+
+def sample_pixels(file_list, lat_lng, max_workers=8):
+    """Read one pixel of every file, the way Toolbar.get_pixel_values does."""
+    lat, lng = lat_lng
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(lambda file_path: _read_pixel(file_path, lat, lng), file_list))
+
+
+def build_cases(workdir, sizes):
+    """Write the synthetic rasters and return the benchmark cases as (name, callable) pairs."""
+    cases = []
+    lats = np.linspace(-89.5, 89.5, 100_000)
+    for ellipsoid in ELLIPSOIDS:
+        cases.append((
+            f"area_of_pixel/{ellipsoid}",
+            lambda ellipsoid=ellipsoid: [area_of_pixel(lat, 0.25, ellipsoid) for lat in lats[::10]],
+        ))
+
+    rng = np.random.default_rng(0)
+    for size in sizes:
+        for dtype in DTYPES:
+            path = os.path.join(workdir, f"raster_{size}_{dtype}.tif")
+            write_raster(path, size, dtype)
+            key = f"{size}x{size}/{dtype}"
+
+            cases.append((f"get_geotiff_array/full/{key}", lambda path=path: get_geotiff_array(path)))
+            half = size // 2
+            cases.append((
+                f"get_geotiff_array/window/{key}",
+                lambda path=path, half=half: get_geotiff_array(path, window=((0, half), (0, half))),
+            ))
+            cases.append((
+                f"get_geotiff_array/decimated/{key}",
+                lambda path=path, size=size: get_geotiff_array(path, out_shape=(size // 8, size // 8)),
+            ))
+            cases.append((f"point_cloud_arrary/{key}", lambda path=path: point_cloud_arrary(path, no_data=0)))
+
+            if dtype == "float32":
+                point_cloud = point_cloud_arrary(path, no_data=0)
+                for ellipsoid in ELLIPSOIDS:
+                    cases.append((
+                        f"pixel_area_array/{key}/{ellipsoid}",
+                        lambda point_cloud=point_cloud, size=size, ellipsoid=ellipsoid: pixel_area_array(
+                            point_cloud, pixel_size=360 / size, coordinatesp=ellipsoid
+                        ),
+                    ))
+
+            stack = [path] * 64
+            cases.append((f"sample_pixels/stack64/{key}", lambda stack=stack: sample_pixels(stack, (45.1, -120.3))))
+            points_lat = rng.uniform(-90, 90, 10_000)
+            points_lng = rng.uniform(-180, 180, 10_000)
+            cases.append((
+                f"sample_points/10000/{key}",
+                lambda path=path, lat=points_lat, lng=points_lng: _sample_points(path, lat, lng),
+            ))
+    return cases
+
+
+def environment():
+    """Describe the interpreter and library versions the results were measured with."""
+    import rasterio
+
+    return {
+        "rasterarea": rasterarea.__version__,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "rasterio": rasterio.__version__,
+        "gdal": rasterio.__gdal_version__,
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+    }
+
+
+def latest_result(results_dir, exclude=None):
+    """Get the path of the most recently written result file, other than exclude."""
+    paths = [
+        path for path in glob.glob(os.path.join(results_dir, "*.json"))
+        if exclude is None or os.path.abspath(path) != os.path.abspath(exclude)
+    ]
+    return max(paths, key=os.path.getmtime) if paths else None
+
+
+def compare(current, baseline, tolerance=0.2, min_time=1e-3):
+    """Compare two result sets.
+
+    Args:
+        current (dict): The results of this run.
+        baseline (dict): The results of an earlier run.
+        tolerance (float, optional): The relative increase in time or peak memory reported as a
+            regression. Defaults to 0.2.
+        min_time (float, optional): The time in seconds below which timing noise is not reported
+            as a regression. Defaults to 1e-3.
+
+    Returns:
+        list: The (case, metric, baseline, current, ratio) rows of the regressions.
+    """
+    regressions = []
+    print(f"{'case':<52} {'time':>10} {'ratio':>7} {'memory':>10} {'ratio':>7}")
+    for name, result in current["results"].items():
+        previous = baseline["results"].get(name)
+        if previous is None:
+            continue
+        ratios = {}
+        for metric in ("time", "peak_memory"):
+            ratios[metric] = result[metric] / previous[metric] if previous[metric] else float("nan")
+            if metric == "time" and result[metric] < min_time:
+                continue
+            if ratios[metric] > 1 + tolerance:
+                regressions.append((name, metric, previous[metric], result[metric], ratios[metric]))
+        flag = "  <- regression" if regressions and regressions[-1][0] == name else ""
+        print(
+            f"{name:<52} {result['time'] * 1000:>8.2f}ms {ratios['time']:>6.2f}x "
+            f"{result['peak_memory'] / 1024**2:>8.2f}MB {ratios['peak_memory']:>6.2f}x{flag}"
+        )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--quick", action="store_true", help="only benchmark the smallest rasters")
+    parser.add_argument("--label", default=rasterarea.__version__, help="the name of the result file")
+    parser.add_argument("--results-dir", default=RESULTS_DIR, help="the directory of the result files")
+    parser.add_argument("--compare", help="the result file to compare with, defaults to the latest")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="the relative increase reported as a regression")
+    parser.add_argument("--min-time", type=float, default=1e-3, help="the time in seconds below which timings are not compared")
+    parser.add_argument("--repeat", type=int, default=3, help="the number of timed runs of each case")
+    parser.add_argument("--fail", action="store_true", help="exit with status 1 on regressions")
+    args = parser.parse_args(argv)
+
+    output = os.path.join(args.results_dir, f"{args.label}.json")
+    baseline_path = args.compare or latest_result(args.results_dir, exclude=output)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for name, func in build_cases(workdir, QUICK_SIZES if args.quick else SIZES):
+            results[name] = measure(func, args.repeat)
+            print(f"{name:<52} {results[name]['time'] * 1000:>8.2f}ms {results[name]['peak_memory'] / 1024**2:>8.2f}MB")
+
+    current = {
+        "label": args.label,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "environment": environment(),
+        "results": results,
+    }
+    os.makedirs(args.results_dir, exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(current, f, indent=2)
+    print(f"\nresults written to {output}")
+
+    if baseline_path is None:
+        return 0
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\ncompared with {baseline['label']} ({baseline_path})\n")
+    regressions = compare(current, baseline, args.tolerance, args.min_time)
+    print(f"\n{len(regressions)} regressions above {args.tolerance:.0%}")
+    return 1 if regressions and args.fail else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
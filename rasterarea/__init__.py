@@ -4,4 +4,18 @@ __author__ = """Yinan Feng"""
 __email__ = '1041267458@qq.com'
 __version__ = '0.0.6'
 
-from .rasterarea import *
\ No newline at end of file
+from .rasterarea import *
+
+_LAZY_ATTRIBUTES = {"SelectFilesButton": "toolbar", "Toolbar": "toolbar", "Map": "toolbar"}
+_LAZY_MODULES = ("catalog", "foliummap", "ipyleafletmap", "tileserver", "toolbar", "vector")
+
+
+def __getattr__(name):
+    """Load the interactive widgets and the map backends on first access."""
+    import importlib
+
+    if name in _LAZY_ATTRIBUTES:
+        return getattr(importlib.import_module(f".{_LAZY_ATTRIBUTES[name]}", __name__), name)
+    if name in _LAZY_MODULES:
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
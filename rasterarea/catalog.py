@@ -0,0 +1,219 @@
+"""An SQLite index of time-stamped raster files."""
+
+import glob
+import logging
+import os
+import sqlite3
+from datetime import date, datetime
+
+from .rasterarea import date_from_filename, get_geotiff_metadata
+
+logger = logging.getLogger(__name__)
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rasters (
+    path TEXT PRIMARY KEY,
+    date TEXT,
+    mtime INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    crs TEXT,
+    height INTEGER,
+    width INTEGER,
+    west REAL,
+    south REAL,
+    east REAL,
+    north REAL
+);
+CREATE INDEX IF NOT EXISTS rasters_date ON rasters (date);
+CREATE INDEX IF NOT EXISTS rasters_bounds ON rasters (west, east, south, north);
+CREATE TABLE IF NOT EXISTS errors (
+    path TEXT PRIMARY KEY,
+    mtime INTEGER,
+    size INTEGER,
+    error TEXT NOT NULL
+);
+"""
+
+
+def _to_iso(value):
+    """Convert a date, datetime or date string to the ISO format stored in the catalog."""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    elif isinstance(value, date) and not isinstance(value, datetime):
+        value = datetime(value.year, value.month, value.day)
+    return value.isoformat()
+
+
+class RasterCatalog:
+    """A persistent index of the rasters of one or more directories.
+
+    Each raster is stored with its date parsed from the file name, its bounds in longitude and
+    latitude, its CRS, its shape and its modification time. Rescans only reopen new or changed
+    files, and date-range and bounding box queries are answered from the index. Files that cannot
+    be read are recorded with their error, see errors, and retried on the next scan.
+
+    Args:
+        db_path (str, optional): The path to the SQLite database. Defaults to ":memory:".
+        date_parser (callable, optional): A function that returns the date of a file name, or
+            raises ValueError. Defaults to date_from_filename.
+    """
+
+    def __init__(self, db_path=":memory:", date_parser=date_from_filename):
+        self.db_path = db_path
+        self.date_parser = date_parser
+        self.connection = sqlite3.connect(db_path)
+        self.connection.executescript(_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM rasters").fetchone()[0]
+
+    def close(self):
+        """Close the database connection."""
+        self.connection.close()
+
+    def _record(self, path, stat):
+        """Read the catalog record of a raster file."""
+        from rasterio.warp import transform_bounds
+
+        metadata = get_geotiff_metadata(path)
+        bounds = metadata["bounds"]
+        if metadata["crs"] is not None and not metadata["crs"].is_geographic:
+            bounds = transform_bounds(metadata["crs"], "EPSG:4326", *bounds)
+        try:
+            raster_date = _to_iso(self.date_parser(os.path.basename(path)))
+        except ValueError as e:
+            logger.warning("%s is indexed without a date: %s", path, e)
+            raster_date = None
+        crs = metadata["crs"].to_string() if metadata["crs"] is not None else None
+        return (path, raster_date, stat.st_mtime_ns, stat.st_size, crs,
+                metadata["height"], metadata["width"], *bounds)
+
+    def scan(self, directory, pattern="*.tif", recursive=True, batch_size=1000):
+        """Index the rasters of a directory, only reading new or changed files.
+
+        Files that were indexed under the directory but no longer exist are removed, whether or
+        not the pattern and recursive match them, so a narrower scan keeps the files indexed by a
+        wider one. A file that
+        cannot be read does not stop the scan: it is recorded in errors instead. Records are
+        committed every batch_size files, so an interrupted scan keeps its progress.
+
+        Args:
+            directory (str): The directory to scan.
+            pattern (str, optional): The glob pattern of the raster files. Defaults to "*.tif".
+            recursive (bool, optional): Whether to scan subdirectories. Defaults to True.
+            batch_size (int, optional): The number of files read between commits. Defaults to 1000.
+
+        Returns:
+            dict: The number of added, updated, unchanged, removed and failed files, and of the
+                indexed files without a date.
+        """
+        directory = os.path.abspath(directory)
+        if recursive:
+            paths = glob.glob(os.path.join(directory, "**", pattern), recursive=True)
+        else:
+            paths = glob.glob(os.path.join(directory, pattern))
+
+        prefix = os.path.join(directory, "")
+        known = {
+            path: (mtime, size)
+            for path, mtime, size in self.connection.execute(
+                "SELECT path, mtime, size FROM rasters WHERE substr(path, 1, ?) = ?",
+                (len(prefix), prefix),
+            )
+        }
+
+        counts = {"added": 0, "updated": 0, "unchanged": 0, "removed": 0, "failed": 0, "undated": 0}
+        records, failures = [], []
+        for path in paths:
+            stat = os.stat(path)
+            previous = known.pop(path, None)
+            if previous == (stat.st_mtime_ns, stat.st_size):
+                counts["unchanged"] += 1
+                continue
+            try:
+                record = self._record(path, stat)
+            except Exception as e:
+                logger.warning("Could not index %s: %s", path, e)
+                counts["failed"] += 1
+                failures.append((path, stat.st_mtime_ns, stat.st_size, f"{type(e).__name__}: {e}"))
+            else:
+                counts["added" if previous is None else "updated"] += 1
+                counts["undated"] += record[1] is None
+                records.append(record)
+            if len(records) + len(failures) >= batch_size:
+                self._commit(records, failures)
+                records, failures = [], []
+        self._commit(records, failures)
+
+        gone = [(path,) for path in known if not os.path.exists(path)]
+        gone_errors = [
+            (path,)
+            for (path,) in self.connection.execute(
+                "SELECT path FROM errors WHERE substr(path, 1, ?) = ?", (len(prefix), prefix)
+            )
+            if not os.path.exists(path)
+        ]
+        with self.connection:
+            self.connection.executemany("DELETE FROM rasters WHERE path = ?", gone)
+            self.connection.executemany("DELETE FROM errors WHERE path = ?", gone_errors)
+        counts["removed"] = len(gone)
+        return counts
+
+    def _commit(self, records, failures):
+        """Write a batch of records and failures, replacing the earlier state of their files."""
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO rasters VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", records
+            )
+            self.connection.executemany("DELETE FROM errors WHERE path = ?", [(record[0],) for record in records])
+            self.connection.executemany("DELETE FROM rasters WHERE path = ?", [(failure[0],) for failure in failures])
+            self.connection.executemany("INSERT OR REPLACE INTO errors VALUES (?, ?, ?, ?)", failures)
+
+    def errors(self):
+        """Get the files that could not be indexed by the last scans.
+
+        Returns:
+            dict: The error message of each file path.
+        """
+        return dict(self.connection.execute("SELECT path, error FROM errors ORDER BY path"))
+
+    def query(self, start=None, end=None, bbox=None, crs=None):
+        """Find the indexed rasters in a date range and bounding box.
+
+        Args:
+            start (str | datetime, optional): The earliest date, inclusive. Defaults to None.
+            end (str | datetime, optional): The latest date, inclusive. Defaults to None.
+            bbox (tuple, optional): The (west, south, east, north) box in longitude and latitude
+                that the rasters must intersect. Defaults to None.
+            crs (str, optional): The CRS of the rasters, e.g. "EPSG:4326". Defaults to None.
+
+        Returns:
+            list: The paths of the matching rasters, sorted by date.
+        """
+        clauses, params = [], []
+        if start is not None:
+            clauses.append("date >= ?")
+            params.append(_to_iso(start))
+        if end is not None:
+            clauses.append("date <= ?")
+            params.append(_to_iso(end))
+        if bbox is not None:
+            west, south, east, north = bbox
+            clauses.append("west <= ? AND east >= ? AND south <= ? AND north >= ?")
+            params.extend([east, west, north, south])
+        if crs is not None:
+            clauses.append("crs = ?")
+            params.append(crs)
+
+        sql = "SELECT path FROM rasters"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY date, path"
+        return [row[0] for row in self.connection.execute(sql, params)]
@@ -0,0 +1,331 @@
+"""The rasterarea command: area reports for many GeoTIFF files.
+
+Example::
+
+    rasterarea /data/grace --mode class --workers 16 -o areas.csv
+
+Results are written as each file completes. When the output file already exists, the files it
+lists with a result are skipped and new results are appended, so an interrupted run can simply be
+restarted. Files that failed are retried, and the rows of a file whose results were cut short are
+removed before appending.
+"""
+
+import argparse
+import csv
+import glob
+import io
+import json
+import os
+import sys
+
+from .rasterarea import ELLIPSOIDS, _area_worker, _expand_paths, class_area, threshold_area, total_area
+
+_FUNCTIONS = {"total": total_area, "class": class_area, "threshold": threshold_area}
+
+
+def expand_inputs(inputs, pattern="*.tif"):
+    """Expand files, directories and glob patterns into a sorted list of unique paths.
+
+    Args:
+        inputs (list): The files, directories or glob patterns.
+        pattern (str, optional): The glob pattern of the files searched in directories,
+            recursively. Defaults to "*.tif".
+
+    Returns:
+        list: The file paths.
+    """
+    paths = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            paths.update(glob.glob(os.path.join(item, "**", pattern), recursive=True))
+        elif glob.has_magic(item):
+            paths.update(_expand_paths(item))
+        else:
+            paths.add(item)
+    return sorted(paths)
+
+
+def _header(mode):
+    """Get the CSV header of a mode."""
+    return ["path", "class", "area", "error"] if mode == "class" else ["path", "area", "error"]
+
+
+def _first_field(line):
+    """Get the first CSV field of a line of bytes."""
+    return next(csv.reader([line.decode("utf-8", errors="replace")]), [""])[0]
+
+
+def complete_length(output, fmt):
+    """Get the length of the complete file records at the start of an output file.
+
+    A line cut short by an interrupted run is not complete. In the CSV format, where a file can
+    have several rows, neither are the rows before it of the file it belongs to.
+
+    Args:
+        output (str): The path to the output file.
+        fmt (str): The output format, "csv" or "jsonl".
+
+    Returns:
+        int: The length in bytes.
+    """
+    with open(output, "rb") as f:
+        lines = f.read().splitlines(keepends=True)
+    if lines and not lines[-1].endswith(b"\n"):
+        partial = _first_field(lines.pop())
+        if fmt == "csv" and partial and len(lines) > 1:
+            # The cut path is a prefix of the path of the file it interrupted.
+            last = _first_field(lines[-1])
+            if last.startswith(partial):
+                while len(lines) > 1 and _first_field(lines[-1]) == last:
+                    lines.pop()
+    return sum(len(line) for line in lines)
+
+
+def check_output(output, fmt, mode):
+    """Check that the results in an output file were written in the same format and mode.
+
+    Args:
+        output (str): The path to the output file.
+        fmt (str): The output format, "csv" or "jsonl".
+        mode (str): The mode, "total", "class" or "threshold".
+
+    Raises:
+        ValueError: If the output holds results of another format or mode.
+    """
+    with open(output, newline="") as f:
+        lines = [line for line in f if line.endswith("\n")]
+    if not lines:
+        return
+    if fmt == "csv":
+        header = next(csv.reader(lines[:1]), [])
+        if header != _header(mode):
+            raise ValueError(f"{output} has the columns {','.join(header)} instead of those of the {mode} mode")
+        return
+
+    for line in lines:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            raise ValueError(f"{output} is not a JSON lines file") from None
+        if not isinstance(record, dict) or "path" not in record:
+            raise ValueError(f"{output} does not hold rasterarea results")
+        if record.get("area") is not None:
+            if isinstance(record["area"], dict) != (mode == "class"):
+                raise ValueError(f"{output} holds results of another mode than {mode}")
+            return
+
+
+def resume_output(output, fmt, mode):
+    """Prepare an output file to append the results of a resumed run to.
+
+    The file is truncated to its complete file records, then checked with check_output.
+
+    Args:
+        output (str): The path to the output file.
+        fmt (str): The output format, "csv" or "jsonl".
+        mode (str): The mode, "total", "class" or "threshold".
+
+    Raises:
+        ValueError: If the output holds results of another format or mode.
+    """
+    length = complete_length(output, fmt)
+    if length < os.path.getsize(output):
+        with open(output, "r+b") as f:
+            f.truncate(length)
+    check_output(output, fmt, mode)
+
+
+def completed_paths(output, fmt):
+    """Read the paths that have a successful result in an output file.
+
+    Paths whose only results are errors are not included, so that they are retried. Each file's
+    results are written at once, so only the last line of an output cut short by an interrupted
+    run can be incomplete: its path is not included either.
+
+    Args:
+        output (str): The path to the output file.
+        fmt (str): The output format, "csv" or "jsonl".
+
+    Returns:
+        set: The paths of the files with a result in the output.
+    """
+    done = set()
+    if not os.path.exists(output):
+        return done
+    with open(output, newline="") as f:
+        lines = f.read().splitlines(keepends=True)
+    incomplete = lines.pop() if lines and not lines[-1].endswith("\n") else None
+
+    if fmt == "csv":
+        rows = list(csv.DictReader(lines))
+        for row in rows:
+            if row.get("path") and not row.get("error") and row.get("area"):
+                done.add(row["path"])
+        if incomplete is not None:
+            done.discard(next(csv.reader([incomplete]), [None])[0])
+    else:
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get("error") is None and record.get("area") is not None:
+                done.add(record["path"])
+    return done
+
+
+def _rows(path, result, error, mode):
+    """Get the CSV rows of one result."""
+    if error is not None:
+        return [[path, "", "", error]] if mode == "class" else [[path, "", error]]
+    if mode == "class":
+        # A file without valid pixels still gets a row, so that it is not computed again
+        return [[path, value, area, ""] for value, area in result.items()] or [[path, "", 0.0, ""]]
+    return [[path, result, ""]]
+
+
+class _Writer:
+    """Append results to a CSV or JSON lines stream, one flush per file."""
+
+    def __init__(self, stream, fmt, mode, header):
+        self.stream = stream
+        self.fmt = fmt
+        self.mode = mode
+        if fmt == "csv":
+            self.csv = csv.writer(stream)
+            if header:
+                self.csv.writerow(_header(mode))
+
+    def write(self, path, result, error):
+        if self.fmt == "csv":
+            # All the rows of a file go out in one write, so a file is never partly recorded
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(_rows(path, result, error, self.mode))
+            self.stream.write(buffer.getvalue())
+        else:
+            record = {"path": path, "area": result, "error": error}
+            if self.mode == "class" and result is not None:
+                record["area"] = {str(value): area for value, area in result.items()}
+            self.stream.write(json.dumps(record) + "\n")
+        self.stream.flush()
+
+
+def run(paths, writer, func, kwargs, workers=None):
+    """Compute the areas of files and write each result as soon as it is ready.
+
+    Args:
+        paths (list): The file paths.
+        writer (_Writer): The output writer.
+        func (callable): The area function.
+        kwargs (dict): Keyword arguments passed to func.
+        workers (int, optional): The number of worker processes. Use 1 to run in the current
+            process. Defaults to the number of CPUs.
+
+    Returns:
+        int: The number of files that failed.
+    """
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    tasks = [(func, path, kwargs) for path in paths]
+    failed = 0
+    if workers == 1:
+        for path, result, error in map(_area_worker, tasks):
+            writer.write(path, result, error)
+            failed += error is not None
+        return failed
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_area_worker, task) for task in tasks]
+        for future in as_completed(futures):
+            path, result, error = future.result()
+            writer.write(path, result, error)
+            failed += error is not None
+    return failed
+
+
+def _open_output(output, resume=True):
+    """Open an output file for writing, or for appending to the results of an earlier run.
+
+    Returns:
+        tuple: The open stream and whether it is appended to.
+    """
+    append = resume and os.path.exists(output) and os.path.getsize(output) > 0
+    return open(output, "a" if append else "w", newline=""), append
+
+
+def build_parser():
+    """Build the argument parser of the rasterarea command.
+
+    Returns:
+        argparse.ArgumentParser: The parser.
+    """
+    parser = argparse.ArgumentParser(
+        prog="rasterarea",
+        description="Compute the ellipsoidal area of the valid pixels of GeoTIFF files.",
+    )
+    parser.add_argument("inputs", nargs="+", help="GeoTIFF files, directories or glob patterns")
+    parser.add_argument("-o", "--output", help="the output file, appended to and resumed from if it exists (default: stdout)")
+    parser.add_argument("-f", "--format", choices=["csv", "jsonl"], help="the output format (default: from the output extension, else csv)")
+    parser.add_argument("-m", "--mode", choices=sorted(_FUNCTIONS), default="total", help="total area, area per class value, or area at or above a threshold (default: total)")
+    parser.add_argument("-t", "--threshold", type=float, help="the threshold of the threshold mode")
+    parser.add_argument("--below", action="store_true", help="count the pixels below the threshold instead")
+    parser.add_argument("-b", "--band", type=int, default=1, help="the band to read (default: 1)")
+    parser.add_argument("--nodata", type=float, help="the nodata value (default: the nodata value of each file)")
+    parser.add_argument("-e", "--ellipsoid", choices=ELLIPSOIDS, default="WGS84", help="the reference ellipsoid (default: WGS84)")
+    parser.add_argument("-w", "--workers", type=int, help="the number of worker processes (default: the number of CPUs)")
+    parser.add_argument("--pattern", default="*.tif", help="the file pattern searched in directories (default: *.tif)")
+    parser.add_argument("--no-resume", action="store_true", help="overwrite the output instead of skipping the files it lists with a result")
+    return parser
+
+
+def main(argv=None):
+    """Run the rasterarea command.
+
+    Args:
+        argv (list, optional): The command line arguments. Defaults to sys.argv[1:].
+
+    Returns:
+        int: The exit status, 1 if any file failed.
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.mode == "threshold" and args.threshold is None:
+        parser.error("--threshold is required with --mode threshold")
+
+    fmt = args.format
+    if fmt is None:
+        fmt = "jsonl" if args.output and args.output.endswith((".jsonl", ".json")) else "csv"
+
+    kwargs = {"band": args.band, "nodata": args.nodata, "coordinatesp": args.ellipsoid}
+    if args.mode == "threshold":
+        kwargs.update(threshold=args.threshold, below=args.below)
+
+    paths = expand_inputs(args.inputs, args.pattern)
+    skipped = 0
+    if args.output and not args.no_resume and os.path.exists(args.output):
+        try:
+            resume_output(args.output, fmt, args.mode)
+        except ValueError as e:
+            parser.error(f"{e}, use --no-resume to overwrite it")
+        done = completed_paths(args.output, fmt)
+        skipped = sum(path in done for path in paths)
+        paths = [path for path in paths if path not in done]
+
+    if args.output:
+        stream, append = _open_output(args.output, resume=not args.no_resume)
+    else:
+        stream, append = sys.stdout, False
+
+    try:
+        writer = _Writer(stream, fmt, args.mode, header=not append)
+        failed = run(paths, writer, _FUNCTIONS[args.mode], kwargs, args.workers)
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+
+    print(f"{len(paths)} processed, {skipped} skipped, {failed} failed", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -71,24 +71,51 @@ class Map(folium.Map):
         geojson = folium.GeoJson(data=data, name=name,**kwargs)
         geojson.add_to(self)
 
-    def add_shp(self, data, name='Shapefile', **kwargs):
+    def add_gdf(self, gdf, name="GeoDataFrame", optimize="auto", zoom_levels=None, **kwargs):
+        """Adds a GeoDataFrame layer to the map.
+
+        Optimized layers are simplified for the initial zoom level of the map, since folium maps
+        are static once rendered.
+
+        Args:
+            gdf (geopandas.GeoDataFrame): The vector layer.
+            name (str, optional): The name of the layer. Defaults to "GeoDataFrame".
+            optimize (bool | str, optional): Whether to simplify the layer. "auto" simplifies layers
+                with more than rasterarea.vector.OPTIMIZE_THRESHOLD coordinates. Defaults to "auto".
+            zoom_levels (list, optional): The zoom levels to precompute. Defaults to None, see
+                rasterarea.vector.SimplifiedLayer.
+        """
+        from .vector import OPTIMIZE_THRESHOLD, SimplifiedLayer, count_coordinates
+
+        if optimize == "auto":
+            optimize = count_coordinates(gdf) > OPTIMIZE_THRESHOLD
+        if optimize:
+            zoom = self.options.get("zoom", 2)
+            geojson = SimplifiedLayer(gdf, zoom_levels or [zoom]).to_geojson(zoom)
+        else:
+            geojson = gdf.__geo_interface__
+        self.add_geojson(geojson, name=name, **kwargs)
+
+    def add_shp(self, data, name='Shapefile', optimize="auto", zoom_levels=None, **kwargs):
         """Adds a Shapefile layer to the map.
 
         Args:
             data (str): the path to the Shapefile.
+            optimize (bool | str, optional): Whether to simplify the layer, see add_gdf. Defaults to "auto".
+            zoom_levels (list, optional): The zoom levels to precompute. Defaults to None.
         """
         import geopandas as gpd
         gdf = gpd.read_file(data)
-        geojson = gdf.__geo_interface__
-        self.add_geojson(geojson, name=name, **kwargs)
+        self.add_gdf(gdf, name=name, optimize=optimize, zoom_levels=zoom_levels, **kwargs)
 
-    def add_vector(self, data, name = 'Vector Data', **kwargs):
+    def add_vector(self, data, name = 'Vector Data', optimize="auto", zoom_levels=None, **kwargs):
         """Adds Vector Data to the map.
 
         Args:
             data (str): the path to the Vector Data
+            optimize (bool | str, optional): Whether to simplify the layer, see add_gdf. Defaults to "auto".
+            zoom_levels (list, optional): The zoom levels to precompute. Defaults to None.
             """
         import geopandas as gdp
         gdf = gdp.read_file(data)
-        geojson = gdf.__geo_interface__
-        self.add_geojson(geojson, name = name, **kwargs)
\ No newline at end of file
+        self.add_gdf(gdf, name=name, optimize=optimize, zoom_levels=zoom_levels, **kwargs)
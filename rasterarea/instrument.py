@@ -0,0 +1,258 @@
+"""Spans, counters and profiles for timing the stages of rasterarea calls.
+
+Instrumentation is off by default, and a disabled span costs a function call and a flag check. Set the
+RASTERAREA_INSTRUMENT environment variable to "1" to record spans, or to "profile" to also run
+each outermost call under cProfile, or call enable at runtime.
+
+When the outermost span of a thread exits, a report of the call is built and passed to every
+reporter, by default a logger named "rasterarea.instrument" at INFO level. Example::
+
+    from rasterarea import instrument
+
+    instrument.enable()
+    total_area("GRD_2018001.tif")
+    print(instrument.format_report(instrument.last_report()))
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class _State:
+    """The process-wide switches and recent reports."""
+
+    def __init__(self):
+        setting = os.environ.get("RASTERAREA_INSTRUMENT", "").strip().lower()
+        self.enabled = setting not in ("", "0", "false", "no", "off")
+        self.profile = setting == "profile"
+        self.reporters = [log_report]
+        self.reports = deque(maxlen=100)
+        self.local = threading.local()
+
+
+def log_report(report):
+    """Log a report at INFO level."""
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(format_report(report))
+
+
+_state = _State()
+
+
+class _NullSpan:
+    """The span returned while instrumentation is disabled."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def add(self, **counters):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """A timed stage of a call, with counters such as bytes_read or pixels.
+
+    Spans nest: the counters of a span are also counted towards the call it belongs to. Use the
+    span function rather than creating spans directly.
+
+    Args:
+        name (str): The name of the stage.
+        counters (dict): The initial counter values.
+    """
+
+    def __init__(self, name, counters):
+        self.name = name
+        self.counters = dict(counters)
+        self.path = name
+        self.start = None
+        self.elapsed = None
+
+    def add(self, **counters):
+        """Add to the counters of the span.
+
+        Args:
+            **counters: The amounts to add, e.g. bytes_read=1024, pixels=256.
+        """
+        for key, value in counters.items():
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def __enter__(self):
+        local = _state.local
+        stack = getattr(local, "stack", None)
+        if not stack:
+            local.stack = stack = []
+            local.records = []
+            local.profiler = None
+            if _state.profile:
+                import cProfile
+
+                local.profiler = cProfile.Profile()
+                try:
+                    local.profiler.enable()
+                except ValueError:
+                    # Another profiler is already active in this process.
+                    local.profiler = None
+        else:
+            self.path = f"{stack[-1].path}/{self.name}"
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.elapsed = time.perf_counter() - self.start
+        local = _state.local
+        local.stack.pop()
+        local.records.append(self)
+        if not local.stack:
+            profile = None
+            if local.profiler is not None:
+                import io
+                import pstats
+
+                local.profiler.disable()
+                buffer = io.StringIO()
+                pstats.Stats(local.profiler, stream=buffer).sort_stats("cumulative").print_stats(20)
+                profile = buffer.getvalue()
+            report = _build_report(self, local.records, profile)
+            local.records = []
+            local.profiler = None
+            _state.reports.append(report)
+            for reporter in list(_state.reporters):
+                reporter(report)
+        return False
+
+
+def span(name, **counters):
+    """Time a stage of a call.
+
+    Args:
+        name (str): The name of the stage, e.g. "read" or "area".
+        **counters: The initial counter values, e.g. pixels=1024.
+
+    Returns:
+        Span: A context manager whose add method increments its counters, or a no-op stand-in
+            while instrumentation is disabled.
+    """
+    if not _state.enabled:
+        return _NULL_SPAN
+    return Span(name, counters)
+
+
+def _build_report(root, records, profile=None):
+    """Aggregate the spans of a call by path into a report."""
+    stages = {}
+    totals = {}
+    for record in records:
+        stage = stages.setdefault(record.path, {"calls": 0, "elapsed": 0.0, "counters": {}})
+        stage["calls"] += 1
+        stage["elapsed"] += record.elapsed
+        for key, value in record.counters.items():
+            stage["counters"][key] = stage["counters"].get(key, 0) + value
+            totals[key] = totals.get(key, 0) + value
+    return {
+        "name": root.name,
+        "elapsed": root.elapsed,
+        "counters": totals,
+        "stages": dict(sorted(stages.items())),
+        "profile": profile,
+    }
+
+
+def format_report(report):
+    """Format a report as text, one line per stage.
+
+    Args:
+        report (dict): A report passed to the reporters or returned by last_report.
+
+    Returns:
+        str: The breakdown of the call.
+    """
+    lines = [f"{report['name']}: {report['elapsed'] * 1000:.2f} ms {_format_counters(report['counters'])}".rstrip()]
+    for path, stage in report["stages"].items():
+        if path == report["name"]:
+            continue
+        share = stage["elapsed"] / report["elapsed"] if report["elapsed"] else 0
+        lines.append(
+            f"  {path}: {stage['elapsed'] * 1000:.2f} ms ({share:.0%}) x{stage['calls']} "
+            f"{_format_counters(stage['counters'])}".rstrip()
+        )
+    if report["profile"]:
+        lines.append(report["profile"])
+    return "\n".join(lines)
+
+
+def _format_counters(counters):
+    return " ".join(f"{key}={value}" for key, value in sorted(counters.items()))
+
+
+def enable(profile=False):
+    """Turn instrumentation on.
+
+    Args:
+        profile (bool, optional): Whether to also profile each outermost call with cProfile.
+            Defaults to False.
+    """
+    _state.enabled = True
+    _state.profile = profile
+
+
+def disable():
+    """Turn instrumentation off."""
+    _state.enabled = False
+    _state.profile = False
+
+
+def is_enabled():
+    """Get whether instrumentation is on.
+
+    Returns:
+        bool: Whether spans are recorded.
+    """
+    return _state.enabled
+
+
+def add_reporter(reporter):
+    """Register a function called with the report of every call.
+
+    Args:
+        reporter (callable): A function taking the report dict.
+    """
+    _state.reporters.append(reporter)
+
+
+def remove_reporter(reporter):
+    """Unregister a reporter added with add_reporter, or the default reporter log_report.
+
+    Args:
+        reporter (callable): The reporter to remove.
+    """
+    _state.reporters.remove(reporter)
+
+
+def last_report():
+    """Get the report of the most recent call.
+
+    Returns:
+        dict: The report, or None if no call was recorded.
+    """
+    return _state.reports[-1] if _state.reports else None
+
+
+def reports():
+    """Get the reports of the last 100 calls, oldest first.
+
+    Returns:
+        list: The reports.
+    """
+    return list(_state.reports)
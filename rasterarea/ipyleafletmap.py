@@ -1,9 +1,271 @@
+import itertools
+import math
+import os
+import threading
+import time
 import ipyleaflet
 from ipyleaflet import WidgetControl
 import ipywidgets as widgets
+import numpy as np
 import pandas as pd
 import geopandas as gpd
-from shapely.geometry import Point
+
+
+TITILER_ENDPOINT = "https://titiler.xyz"
+
+_http_client = None
+_http_cache = {}
+_http_lock = threading.Lock()
+
+
+def get_http_client():
+    """Get the HTTP client shared by the maps of this process.
+
+    Reusing one client keeps connections to the tiler alive between requests.
+
+    Returns:
+        httpx.Client: The shared client.
+    """
+    global _http_client
+    with _http_lock:
+        if _http_client is None:
+            import httpx
+
+            _http_client = httpx.Client(
+                timeout=30,
+                limits=httpx.Limits(max_connections=32, max_keepalive_connections=32),
+            )
+        return _http_client
+
+
+def get_json(url, params=None, ttl=300, max_entries=1024):
+    """Get a JSON response, served from a time-limited cache when possible.
+
+    Args:
+        url (str): The URL to request.
+        params (dict, optional): The query parameters. Defaults to None.
+        ttl (float, optional): The number of seconds a response is reused. Defaults to 300.
+        max_entries (int, optional): The number of responses to keep. Defaults to 1024.
+
+    Returns:
+        The decoded JSON response.
+    """
+    key = (url, tuple(sorted((params or {}).items())))
+    now = time.monotonic()
+    with _http_lock:
+        cached = _http_cache.get(key)
+        if cached is not None and cached[0] > now:
+            return cached[1]
+
+    response = get_http_client().get(url, params=params)
+    response.raise_for_status()
+    data = response.json()
+
+    with _http_lock:
+        _http_cache[key] = (now + ttl, data)
+        while len(_http_cache) > max_entries:
+            _http_cache.pop(next(iter(_http_cache)))
+    return data
+
+
+def clear_http_cache():
+    """Clear the cache of JSON responses."""
+    with _http_lock:
+        _http_cache.clear()
+
+
+def get_cog_metadata(url, titiler_endpoint=TITILER_ENDPOINT):
+    """Get the bounds and the tile URL of a Cloud Optimized GeoTIFF from titiler.
+
+    The /cog/info and /cog/tilejson.json requests are sent concurrently.
+
+    Args:
+        url (str): The URL of the Cloud Optimized GeoTIFF.
+        titiler_endpoint (str, optional): The titiler service. Defaults to "https://titiler.xyz".
+
+    Returns:
+        tuple: The (west, south, east, north) bounds and the XYZ tile URL template.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    params = {"url": url}
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        info = executor.submit(get_json, f"{titiler_endpoint}/cog/info", params)
+        tilejson = executor.submit(get_json, f"{titiler_endpoint}/cog/tilejson.json", params)
+        return info.result()["bounds"], tilejson.result()["tiles"][0]
+
+def points_to_geojson(lon, lat):
+    """Build a GeoJSON FeatureCollection holding all points in one MultiPoint feature.
+
+    Args:
+        lon (numpy.ndarray): The longitudes.
+        lat (numpy.ndarray): The latitudes.
+
+    Returns:
+        dict: The GeoJSON FeatureCollection.
+    """
+    coordinates = np.column_stack([lon, lat]).tolist()
+    return {
+        "type": "FeatureCollection",
+        "features": [
+            {
+                "type": "Feature",
+                "properties": {"count": len(coordinates)},
+                "geometry": {"type": "MultiPoint", "coordinates": coordinates},
+            }
+        ],
+    }
+
+
+def grid_aggregate(lon, lat, cell_size):
+    """Aggregate points into one point per grid cell, placed at the mean of its points.
+
+    Args:
+        lon (numpy.ndarray): The longitudes.
+        lat (numpy.ndarray): The latitudes.
+        cell_size (float): The cell size in degrees.
+
+    Returns:
+        dict: A GeoJSON FeatureCollection with one Point feature per non-empty cell and the number
+            of points of the cell in the count property.
+    """
+    cells = np.column_stack([np.floor(lon / cell_size), np.floor(lat / cell_size)])
+    _, inverse, counts = np.unique(cells, axis=0, return_inverse=True, return_counts=True)
+    inverse = inverse.ravel()
+    mean_lon = np.bincount(inverse, weights=lon) / counts
+    mean_lat = np.bincount(inverse, weights=lat) / counts
+    return {
+        "type": "FeatureCollection",
+        "features": [
+            {
+                "type": "Feature",
+                "properties": {"count": count},
+                "geometry": {"type": "Point", "coordinates": [x, y]},
+            }
+            for x, y, count in zip(mean_lon.tolist(), mean_lat.tolist(), counts.tolist())
+        ],
+    }
+
+
+def _csv_schema(in_csv, chunksize, dtype=None, floats=(), **kwargs):
+    """Infer one set of column dtypes for all the chunks of a csv file from its first chunk.
+
+    Columns read as integers or booleans in the first chunk get nullable dtypes, so later chunks
+    with missing values keep them. Columns that are empty in the first chunk are read as strings.
+
+    Args:
+        in_csv (str): The path to the csv file.
+        chunksize (int): The number of rows of the first chunk.
+        dtype (dict, optional): Column dtypes that override the inferred ones. Defaults to None.
+        floats (tuple, optional): Columns always read as float64, such as the coordinates.
+            Defaults to ().
+
+    Returns:
+        dict: The dtype of each column.
+    """
+    first = pd.read_csv(in_csv, nrows=chunksize, dtype=dtype, **kwargs)
+    schema = {}
+    for column, series in first.items():
+        if column in floats:
+            schema[column] = "float64"
+        elif series.isna().all() or pd.api.types.is_object_dtype(series.dtype):
+            schema[column] = "str"
+        elif pd.api.types.is_bool_dtype(series.dtype):
+            schema[column] = "boolean"
+        elif pd.api.types.is_integer_dtype(series.dtype):
+            schema[column] = "Int64"
+        else:
+            schema[column] = series.dtype
+    schema.update(dtype or {})
+    return schema
+
+
+def csv_to_vector(in_csv, out_path, x="longitude", y="latitude", chunksize=100000, crs="EPSG:4326", layer=None, verbose=False, dtype=None, **kwargs):
+    """Convert a csv file of points to a GeoPackage or GeoParquet dataset in chunks.
+
+    The csv file is read chunksize rows at a time and each chunk is appended to the output, so
+    memory use does not grow with the size of the file. Outputs ending with .gpkg are written as
+    one GeoPackage layer. Other outputs are written as a GeoParquet dataset: a directory with one
+    part file per chunk, which geopandas.read_parquet reads back as one table.
+
+    The column dtypes are inferred once from the first chunk and applied to every chunk, so all
+    chunks share one schema. The x and y columns are always float64, and columns that are empty
+    in the first chunk are written as strings. A later value that does not fit its column's dtype
+    raises ValueError; pass dtype to set the dtypes of such columns. The output is written to a
+    temporary location and only moved to out_path once every chunk is converted, so a failed
+    conversion leaves an existing output unchanged.
+
+    Args:
+        in_csv (str): The path to the csv file.
+        out_path (str): The path to the .gpkg file or the GeoParquet directory.
+        x (str, optional): The longitude column. Defaults to "longitude".
+        y (str, optional): The latitude column. Defaults to "latitude".
+        chunksize (int, optional): The number of rows per chunk. Defaults to 100000.
+        crs (str, optional): The CRS of the coordinates. Defaults to "EPSG:4326".
+        layer (str, optional): The GeoPackage layer name. Defaults to the name of the csv file.
+        verbose (bool, optional): Whether to print the progress after each chunk. Defaults to False.
+        dtype (dict, optional): The dtypes of some columns, overriding the inferred ones. Defaults
+            to None.
+
+    Raises:
+        ValueError: If a value does not fit the dtype of its column.
+
+    Returns:
+        dict: The number of rows written, the elapsed seconds and the rows per second.
+    """
+    import shutil
+    import tempfile
+
+    geopackage = out_path.lower().endswith(".gpkg")
+    if layer is None:
+        layer = os.path.splitext(os.path.basename(in_csv))[0]
+
+    start = time.perf_counter()
+    rows = 0
+    schema = _csv_schema(in_csv, chunksize, dtype, floats=(x, y), **kwargs)
+    staging = tempfile.mkdtemp(prefix=".csv_to_vector-", dir=os.path.dirname(os.path.abspath(out_path)))
+    try:
+        staged = os.path.join(staging, os.path.basename(out_path)) if geopackage else staging
+        if geopackage and os.path.exists(out_path):
+            # Keep the other layers of an existing GeoPackage.
+            shutil.copy2(out_path, staged)
+
+        chunks = pd.read_csv(in_csv, chunksize=chunksize, dtype=schema, **kwargs)
+        for i in itertools.count():
+            try:
+                df = next(chunks)
+            except StopIteration:
+                break
+            except (TypeError, ValueError) as e:
+                raise ValueError(
+                    f"Chunk {i} of {in_csv} does not match the column dtypes of the first chunk, "
+                    f"set them with dtype: {e}"
+                ) from e
+            gdf = gpd.GeoDataFrame(df, geometry=gpd.points_from_xy(df[x], df[y]), crs=crs)
+            if geopackage:
+                gdf.to_file(staged, driver="GPKG", layer=layer, mode="w" if i == 0 else "a")
+            else:
+                gdf.to_parquet(os.path.join(staged, f"part-{i:05d}.parquet"), index=False)
+            rows += len(gdf)
+            if verbose:
+                elapsed = time.perf_counter() - start
+                print(f"{rows} rows written ({rows / elapsed:.0f} rows/s)")
+
+        if geopackage:
+            os.replace(staged, out_path)
+        else:
+            os.makedirs(out_path, exist_ok=True)
+            for name in os.listdir(out_path):
+                if name.startswith("part-") and name.endswith(".parquet"):
+                    os.remove(os.path.join(out_path, name))
+            for name in os.listdir(staged):
+                os.replace(os.path.join(staged, name), os.path.join(out_path, name))
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+    seconds = time.perf_counter() - start
+    return {"rows": rows, "seconds": seconds, "rows_per_sec": rows / seconds if seconds > 0 else 0.0}
+
 
 class Map(ipyleaflet.Map):
     
@@ -149,57 +411,104 @@ class Map(ipyleaflet.Map):
         self.add_layer(geojson)
 
     
-    def add_shp(self, data, name='Shapefile', **kwargs):
+    def add_gdf(self, gdf, name='GeoDataFrame', optimize="auto", zoom_levels=None, **kwargs):
+        """Adds a GeoDataFrame layer to the map.
+
+        Optimized layers are simplified for the zoom level of the map and only the features in view
+        are sent to the frontend. The layer is updated as the map is zoomed and panned.
+
+        Args:
+            gdf (geopandas.GeoDataFrame): The vector layer.
+            name (str, optional): The name of the layer. Defaults to 'GeoDataFrame'.
+            optimize (bool | str, optional): Whether to simplify the layer. "auto" simplifies layers
+                with more than rasterarea.vector.OPTIMIZE_THRESHOLD coordinates. Defaults to "auto".
+            zoom_levels (list, optional): The zoom levels to precompute. Defaults to None, see
+                rasterarea.vector.SimplifiedLayer.
+        """
+        from .vector import OPTIMIZE_THRESHOLD, SimplifiedLayer, count_coordinates
+
+        if optimize == "auto":
+            optimize = count_coordinates(gdf) > OPTIMIZE_THRESHOLD
+        if not optimize:
+            self.add_geojson(gdf.__geo_interface__, name=name, **kwargs)
+            return
+
+        simplified = SimplifiedLayer(gdf, zoom_levels)
+        view = [simplified.level(self.zoom), self._view_bounds()]
+        layer = ipyleaflet.GeoJSON(data=simplified.to_geojson(*view), name=name, **kwargs)
+        self.add_layer(layer)
+
+        def update(change):
+            current = [simplified.level(self.zoom), self._view_bounds()]
+            if current != view:
+                view[:] = current
+                layer.data = simplified.to_geojson(*current)
+
+        self.observe(update, names=["zoom", "bounds"])
+
+    def _view_bounds(self):
+        """Get the (west, south, east, north) bounds of the view, or None before it is rendered."""
+        if not self.bounds:
+            return None
+        (south, west), (north, east) = self.bounds
+        return west, south, east, north
+
+    def add_shp(self, data, name='Shapefile', optimize="auto", zoom_levels=None, **kwargs):
         """Adds a Shapefile layer to the map.
 
         Args:
             data (str): The path to the Shapefile.
+            optimize (bool | str, optional): Whether to simplify the layer, see add_gdf. Defaults to "auto".
+            zoom_levels (list, optional): The zoom levels to precompute. Defaults to None.
         """
         import geopandas as gpd
         gdf = gpd.read_file(data)
-        geojson = gdf.__geo_interface__
-        self.add_geojson(geojson, name=name, **kwargs)
+        self.add_gdf(gdf, name=name, optimize=optimize, zoom_levels=zoom_levels, **kwargs)
 
-    def add_vector(self, data, name='Vector', **kwargs):
+    def add_vector(self, data, name='Vector', optimize="auto", zoom_levels=None, **kwargs):
         """Adds a vector layer to the map.
 
         Args:
             data (str): The path to the vector file.
+            optimize (bool | str, optional): Whether to simplify the layer, see add_gdf. Defaults to "auto".
+            zoom_levels (list, optional): The zoom levels to precompute. Defaults to None.
         """
         import geopandas as gpd
         gdf = gpd.read_file(data)
-        geojson = gdf.__geo_interface__
-        self.add_geojson(geojson, name=name, **kwargs)
+        self.add_gdf(gdf, name=name, optimize=optimize, zoom_levels=zoom_levels, **kwargs)
 
-    def add_raster(self, url, name='Raster', fit_bounds=True, **kwargs):
+    def add_raster(self, url, name='Raster', fit_bounds=True, local=None, band=1, palette=None, vmin=None, vmax=None, nodata=None, titiler_endpoint=TITILER_ENDPOINT, **kwargs):
         """Adds a raster layer to the map.
 
+        Local GeoTIFF files are served by an in-process tile server (see rasterarea.tileserver),
+        which needs no network access and caches rendered tiles in memory. Other URLs are tiled
+        by titiler, with the metadata requests sent concurrently over a shared connection pool and
+        cached for a few minutes.
+
         Args:
-            url (str): The URL of the raster layer.
+            url (str): The URL of the raster layer, or the path to a local GeoTIFF file.
             name (str, optional): The name of the raster layer. Defaults to 'Raster'.
             fit_bounds (bool, optional): Whether to fit the map bounds to the raster layer. Defaults to True.
+            local (bool, optional): Whether to use the local tile server. Defaults to None, which uses it for existing local files.
+            band (int, optional): The band to render with the local tile server. Defaults to 1.
+            palette (str, optional): The matplotlib colormap used by the local tile server. Defaults to None.
+            vmin (float, optional): The minimum value of the colormap of the local tile server. Defaults to None.
+            vmax (float, optional): The maximum value of the colormap of the local tile server. Defaults to None.
+            nodata (float, optional): The value rendered transparent by the local tile server. Defaults to None.
+            titiler_endpoint (str, optional): The titiler service used for remote URLs. Defaults to "https://titiler.xyz".
         """
-        import httpx
+        if local is None:
+            local = os.path.exists(url)
 
-        titiler_endpoint = "https://titiler.xyz"
-
-        r = httpx.get(
-            f"{titiler_endpoint}/cog/info",
-            params = {
-                "url": url,
-            }
-        ).json()
+        if local:
+            from .tileserver import get_tile_server
 
-        bounds = r["bounds"]
-
-        r = httpx.get(
-            f"{titiler_endpoint}/cog/tilejson.json",
-            params = {
-                "url": url,
-            }
-        ).json()
-
-        tile = r["tiles"][0]
+            server = get_tile_server()
+            layer_id = server.add(url, band=band, palette=palette, vmin=vmin, vmax=vmax, nodata=nodata)
+            tile = server.tile_url(layer_id)
+            bounds = server.bounds(layer_id)
+        else:
+            bounds, tile = get_cog_metadata(url, titiler_endpoint=titiler_endpoint)
 
         self.add_tile_layer(url=tile, name=name, **kwargs)
 
@@ -207,6 +516,34 @@ class Map(ipyleaflet.Map):
             bbox = [[bounds[1], bounds[0]], [bounds[3], bounds[2]]]
             self.fit_bounds(bbox)
 
+    def add_rasters(self, urls, names=None, fit_bounds=True, titiler_endpoint=TITILER_ENDPOINT, max_workers=8, **kwargs):
+        """Adds many remote raster layers to the map, fetching their metadata concurrently.
+
+        Args:
+            urls (list): The URLs of the Cloud Optimized GeoTIFFs.
+            names (list, optional): The names of the layers. Defaults to 'Raster 1', 'Raster 2', ...
+            fit_bounds (bool, optional): Whether to fit the map bounds to all the layers. Defaults to True.
+            titiler_endpoint (str, optional): The titiler service. Defaults to "https://titiler.xyz".
+            max_workers (int, optional): The number of layers fetched at a time. Defaults to 8.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        if names is None:
+            names = [f"Raster {i + 1}" for i in range(len(urls))]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            metadata = list(executor.map(lambda url: get_cog_metadata(url, titiler_endpoint=titiler_endpoint), urls))
+
+        for name, (_, tile) in zip(names, metadata):
+            self.add_tile_layer(url=tile, name=name, **kwargs)
+
+        if fit_bounds and metadata:
+            bounds = [bounds for bounds, _ in metadata]
+            west = min(b[0] for b in bounds)
+            south = min(b[1] for b in bounds)
+            east = max(b[2] for b in bounds)
+            north = max(b[3] for b in bounds)
+            self.fit_bounds([[south, west], [north, east]])
+
     def add_image(self, url, width, height, position = 'bottomright',**kwargs):
         """Add an image to the map.
 
@@ -230,7 +567,7 @@ class Map(ipyleaflet.Map):
         df = pd.read_csv(in_csv)
     
         # Create a geometry column
-        geometry = [Point(xy) for xy in zip(df[x], df[y])]
+        geometry = gpd.points_from_xy(df[x], df[y])
     
         # Create a geodataframe
         gdf = gpd.GeoDataFrame(df, geometry=geometry)
@@ -250,7 +587,7 @@ class Map(ipyleaflet.Map):
         df = pd.read_csv(in_csv)
     
         # Create a geometry column
-        geometry = [Point(xy) for xy in zip(df[x], df[y])]
+        geometry = gpd.points_from_xy(df[x], df[y])
     
         # Create a geodataframe
         gdf = gpd.GeoDataFrame(df, geometry=geometry)
@@ -261,31 +598,74 @@ class Map(ipyleaflet.Map):
         return gdf
 
 
-    def add_marker_from_csv(self, in_csv, x="longitude", y="latitude", label=None, layer_name="Marker cluster"):
+    def add_marker_from_csv(self, in_csv, x="longitude", y="latitude", label=None, layer_name="Marker cluster", mode="auto", threshold=5000, cell_size=None):
         """
-        This function takes a csv file and adds a marker cluster to the map.
+        This function takes a csv file and adds its points to the map.
+
+        Small inputs become a marker cluster with one marker per row. Large inputs are drawn as a
+        single GeoJSON layer of circle markers ("geojson"), or aggregated into one circle per grid
+        cell that follows the zoom level of the map ("grid"), so that no widget is created per row.
+
+        Args:
+            in_csv (str): The path to the csv file.
+            x (str, optional): The longitude column. Defaults to "longitude".
+            y (str, optional): The latitude column. Defaults to "latitude".
+            label (str, optional): The column shown as marker title in "cluster" mode. Defaults to None.
+            layer_name (str, optional): The name of the layer. Defaults to "Marker cluster".
+            mode (str, optional): "cluster", "geojson", "grid", or "auto" to use "cluster" up to
+                threshold rows and "geojson" above. Defaults to "auto".
+            threshold (int, optional): The number of rows above which "auto" stops creating one
+                marker per row. Defaults to 5000.
+            cell_size (float, optional): The grid cell size in degrees in "grid" mode. Defaults to
+                a size that follows the zoom level.
+
+        Returns:
+            The layer added to the map.
         """
-        
-        # Read in the csv file
-        df = pd.read_csv(in_csv)
-        
-        # Create a geometry column
-        geometry = [Point(xy) for xy in zip(df[x], df[y])]
-        
-        # Create a geodataframe
-        gdf = gpd.GeoDataFrame(df, geometry=geometry)
-        
-        # Create a marker cluster
-        marker_cluster = ipyleaflet.MarkerCluster(
-            markers=[ipyleaflet.Marker(location=[point.y, point.x]) for point in gdf.geometry]
-        )
-        
-        # Add the marker cluster to the map
-        self.add_layer(marker_cluster)
-        
-        return marker_cluster
+        columns = [x, y] if label is None else [x, y, label]
+        df = pd.read_csv(in_csv, usecols=columns)
+        lon = df[x].to_numpy(dtype="float64")
+        lat = df[y].to_numpy(dtype="float64")
+
+        if mode == "auto":
+            mode = "cluster" if len(df) <= threshold else "geojson"
+
+        if mode == "cluster":
+            titles = df[label].astype(str).tolist() if label is not None else [""] * len(df)
+            layer = ipyleaflet.MarkerCluster(
+                markers=[
+                    ipyleaflet.Marker(location=(lat_, lon_), title=title, draggable=False)
+                    for lat_, lon_, title in zip(lat.tolist(), lon.tolist(), titles)
+                ],
+                name=layer_name,
+            )
+        elif mode == "geojson":
+            layer = ipyleaflet.GeoJSON(
+                data=points_to_geojson(lon, lat),
+                point_style={"radius": 3, "weight": 1, "fillOpacity": 0.8},
+                name=layer_name,
+            )
+        elif mode == "grid":
+            def grid_data(zoom):
+                size = cell_size or 360 / 2 ** (zoom + 3)
+                return grid_aggregate(lon, lat, size)
+
+            layer = ipyleaflet.GeoJSON(
+                data=grid_data(self.zoom),
+                point_style={"radius": 5, "weight": 1, "fillOpacity": 0.6},
+                style_callback=lambda feature: {"radius": 4 + 3 * math.log10(feature["properties"]["count"])},
+                name=layer_name,
+            )
+            if cell_size is None:
+                self.observe(lambda change: setattr(layer, "data", grid_data(change["new"])), names="zoom")
+        else:
+            raise ValueError(f"Invalid mode: {mode}")
+
+        # Add the layer to the map
+        self.add_layer(layer)
+
+        return layer
 
-    
     def add_toolbar(self, position='topright', **kwargs):
         """Adds a toolbar to the map.
 
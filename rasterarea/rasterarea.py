@@ -1,43 +1,82 @@
-"""Main module."""
+"""Main module.
+
+Only the numeric core is defined here, so that it can be imported on headless batch workers.
+pandas, rasterio and the other optional dependencies are imported by the functions that use them,
+and the interactive widgets of rasterarea.toolbar are loaded on first access.
+"""
 # require GDAL 
 # import localtileserver
+import functools
 import math
-import pandas as pd
-import numpy as np
-import matplotlib as mpl
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
-from matplotlib.colors import TwoSlopeNorm
-import ipywidgets as widgets
-from ipyfilechooser import FileChooser
-import netCDF4 as nc
 import os
-from ipywidgets import TwoByTwoLayout
-from ipyleaflet import WidgetControl
-import traitlets
-from IPython.display import display
-from tkinter import Tk, filedialog
-# from cartopy import config
-# import cartopy.crs as ccrs
-import geemap
-import rasterio
-from ipyleaflet import Marker
+import re
 from datetime import datetime, timedelta
 
-def area_of_pixel(center_lat,pixel_size=1, coordinatesp = 'WGS84', **kwargs):
-    """_summary_
+import numpy as np
+
+from .instrument import span
+
+__all__ = [
+    "ELLIPSOIDS",
+    "area_of_pixel",
+    "area_of_pixel_array",
+    "clear_area_cache",
+    "row_area_table",
+    "pixel_area_grid",
+    "get_geotiff_metadata",
+    "geotiff_metadata_cache_info",
+    "clear_geotiff_metadata_cache",
+    "get_geotiff_info",
+    "get_geotiff_array",
+    "build_overviews",
+    "get_geotiff_preview",
+    "get_geotiff_bounds",
+    "get_geotiff_crs",
+    "get_geotiff_transform",
+    "get_geotiff_resolution",
+    "get_geotiff_nodata",
+    "get_geotiff_shape",
+    "point_cloud_arrary",
+    "pixel_area_array",
+    "total_area",
+    "threshold_area",
+    "class_area",
+    "area_weighted_stats",
+    "zonal_area",
+    "batch_area",
+    "resample_stack",
+    "extract_points",
+    "date_from_filename",
+]
+
+_LAZY_ATTRIBUTES = {"SelectFilesButton": "toolbar", "Toolbar": "toolbar", "Map": "toolbar"}
+
+
+def __getattr__(name):
+    """Load the interactive widgets on first access."""
+    if name in _LAZY_ATTRIBUTES:
+        import importlib
+
+        module = importlib.import_module(f".{_LAZY_ATTRIBUTES[name]}", __package__)
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+ELLIPSOIDS = ("WGS84", "WGS72", "WGS66", "WGS60", "IERS", "GRS80", "GRS67", "Krassovsky")
+
+
+def _ellipsoid_axes(coordinatesp='WGS84'):
+    """Get the semi-major and semi-minor axes of a reference ellipsoid.
 
     Args:
-        center_lat (_type_): _description_
-        pixel_size (int, optional): _description_. Defaults to 1.
-        coordinatesp (str, optional): _description_. Defaults to 'WGS84'.
+        coordinatesp (str, optional): The name of the reference ellipsoid. Defaults to 'WGS84'.
 
     Raises:
-        ValueError: _description_
+        ValueError: If the ellipsoid name is not supported.
 
     Returns:
-        _type_: _description_
-    """ 
+        tuple: The semi-major axis a and the semi-minor axis b in meters.
+    """
     if coordinatesp== 'WGS84':
         a = 6378137
         b = 6356752.3142
@@ -64,6 +103,23 @@ def area_of_pixel(center_lat,pixel_size=1, coordinatesp = 'WGS84', **kwargs):
         b = 6356863.019
     else:
         raise ValueError(f"Invalid coordinatesp name: {coordinatesp}")
+    return a, b
+
+def area_of_pixel(center_lat,pixel_size=1, coordinatesp = 'WGS84', **kwargs):
+    """_summary_
+
+    Args:
+        center_lat (_type_): _description_
+        pixel_size (int, optional): _description_. Defaults to 1.
+        coordinatesp (str, optional): _description_. Defaults to 'WGS84'.
+
+    Raises:
+        ValueError: _description_
+
+    Returns:
+        _type_: _description_
+    """ 
+    a, b = _ellipsoid_axes(coordinatesp)
 
     c = math.sqrt(1 - (b/a)**2)
     zm_a = 1 - c*math.sin(math.radians(center_lat+pixel_size/2))
@@ -75,19 +131,174 @@ def area_of_pixel(center_lat,pixel_size=1, coordinatesp = 'WGS84', **kwargs):
     area = (1 / 360 * (area_a - area_b))
     return area
 
-def get_geotiff_info(geotiff_path, **kwargs):
-    """Get information about a GeoTIFF file.
+def area_of_pixel_array(center_lat, pixel_size=1, coordinatesp='WGS84', **kwargs):
+    """Vectorized version of area_of_pixel for an array of center latitudes.
+
+    Evaluates the same ellipsoidal band formula as area_of_pixel with NumPy ufuncs, so a whole
+    latitude column is computed in one call instead of one Python iteration per pixel.
+
+    Args:
+        center_lat (array_like): The center latitudes of the pixels in degrees.
+        pixel_size (float, optional): The pixel size in degrees. Defaults to 1.
+        coordinatesp (str, optional): The name of the reference ellipsoid. Defaults to 'WGS84'.
+
+    Raises:
+        ValueError: If the ellipsoid name is not supported.
+
+    Returns:
+        numpy.ndarray: The pixel areas in square meters, with the same shape as center_lat.
+    """
+    a, b = _ellipsoid_axes(coordinatesp)
+    c = math.sqrt(1 - (b/a)**2)
+    center_lat = np.asarray(center_lat, dtype=np.float64)
+
+    def band_area(lat):
+        sin_lat = np.sin(np.radians(lat))
+        zm = 1 - c*sin_lat
+        zp = 1 + c*sin_lat
+        return math.pi * b**2 * (np.log(zp/zm) / (2*c) + sin_lat / (zp*zm))
+
+    area = (band_area(center_lat+pixel_size/2) - band_area(center_lat-pixel_size/2)) / 360
+    return area
+
+def _area_cache_path(cache_dir, transform, shape, coordinatesp):
+    """Get the cache file of a pixel area table, keyed by a hash of the grid geometry.
+
+    Args:
+        cache_dir (str): The cache directory.
+        transform (Affine): The raster transform.
+        shape (tuple): The shape of the area table.
+        coordinatesp (str): The name of the reference ellipsoid.
+
+    Returns:
+        str: The path to the .npy cache file.
+    """
+    import hashlib
+
+    key = repr((tuple(transform)[:6], tuple(shape), coordinatesp)).encode()
+    return os.path.join(cache_dir, hashlib.sha1(key).hexdigest() + ".npy")
+
+def _evict_area_cache(cache_dir, max_bytes):
+    """Delete the least recently used area tables until the cache fits in max_bytes.
+
+    Args:
+        cache_dir (str): The cache directory.
+        max_bytes (int): The maximum total size of the cache files.
+    """
+    entries = []
+    for entry in os.scandir(cache_dir):
+        if entry.name.endswith(".npy"):
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        total -= size
+
+def clear_area_cache(cache_dir=None, **kwargs):
+    """Delete all cached pixel area tables.
+
+    Args:
+        cache_dir (str, optional): The cache directory. Defaults to $RASTERAREA_CACHE_DIR.
+    """
+    cache_dir = cache_dir or os.environ.get("RASTERAREA_CACHE_DIR")
+    if cache_dir and os.path.isdir(cache_dir):
+        _evict_area_cache(cache_dir, 0)
+
+def row_area_table(transform, height, coordinatesp='WGS84', cache_dir=None, **kwargs):
+    """Get the area of one pixel per row of a north-up geographic raster.
+
+    On a regular north-up grid every pixel in a row shares the same center latitude, so the
+    area only has to be evaluated once per row.
+
+    When a cache directory is given, or set with the RASTERAREA_CACHE_DIR environment variable,
+    the table is stored there as a .npy file keyed by transform, height and ellipsoid, and later
+    calls for the same grid load it memory-mapped. The least recently used tables are deleted
+    once the cache grows beyond RASTERAREA_CACHE_MAX_BYTES (256 MB by default).
+
+    Args:
+        transform (Affine): The raster transform, e.g. from get_geotiff_transform.
+        height (int): The number of rows, e.g. the first item of get_geotiff_shape.
+        coordinatesp (str, optional): The name of the reference ellipsoid. Defaults to 'WGS84'.
+        cache_dir (str, optional): The cache directory. Defaults to $RASTERAREA_CACHE_DIR, or no
+            caching if it is not set.
+
+    Raises:
+        ValueError: If the transform is rotated or sheared.
+
+    Returns:
+        numpy.ndarray: A 1-D array with the pixel area in square meters of each row. Cached tables
+            are read-only.
+    """
+    if transform.b != 0 or transform.d != 0:
+        raise ValueError("Only north-up transforms without rotation are supported.")
+
+    cache_dir = cache_dir or os.environ.get("RASTERAREA_CACHE_DIR")
+    if cache_dir:
+        cache_path = _area_cache_path(cache_dir, transform, (height,), coordinatesp)
+        try:
+            rows = np.load(cache_path, mmap_mode="r")
+            os.utime(cache_path)
+            return rows
+        except (OSError, ValueError):
+            pass
+
+    center_lat = transform.f + transform.e * (np.arange(height) + 0.5)
+    # area_of_pixel gives the area of a band one degree of longitude wide.
+    rows = area_of_pixel_array(center_lat, pixel_size=abs(transform.e), coordinatesp=coordinatesp)
+    rows *= abs(transform.a)
+
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, rows)
+        os.replace(tmp_path, cache_path)
+        _evict_area_cache(cache_dir, int(os.environ.get("RASTERAREA_CACHE_MAX_BYTES", 256 * 1024**2)))
+
+    return rows
+
+def pixel_area_grid(transform, shape, coordinatesp='WGS84', cache_dir=None, **kwargs):
+    """Get the pixel area of every pixel of a north-up geographic raster.
+
+    The grid is a read-only broadcast view of row_area_table, so it costs no more memory than a
+    single column of areas.
+
+    Args:
+        transform (Affine): The raster transform, e.g. from get_geotiff_transform.
+        shape (tuple): The raster shape (height, width), e.g. from get_geotiff_shape.
+        coordinatesp (str, optional): The name of the reference ellipsoid. Defaults to 'WGS84'.
+        cache_dir (str, optional): The cache directory of row_area_table. Defaults to None.
+
+    Returns:
+        numpy.ndarray: A read-only array of the given shape with the pixel areas in square meters.
+    """
+    height, width = shape
+    rows = row_area_table(transform, height, coordinatesp=coordinatesp, cache_dir=cache_dir)
+    return np.broadcast_to(rows[:, np.newaxis], (height, width))
+
+@functools.lru_cache(maxsize=256)
+def _read_geotiff_metadata(geotiff_path, mtime, size):
+    """Read the metadata of a GeoTIFF file. Cached by path, modification time and size.
 
     Args:
         geotiff_path (str): The path to the GeoTIFF file.
+        mtime (int): The modification time of the file in nanoseconds, or None.
+        size (int): The size of the file in bytes, or None.
 
     Returns:
-        dict: A dictionary containing information about the GeoTIFF file.
+        dict: A dictionary containing the metadata of the GeoTIFF file.
     """
     import rasterio
 
-    with rasterio.open(geotiff_path) as src:
-        info = {
+    with span("metadata"), rasterio.open(geotiff_path) as src:
+        metadata = {
             "crs": src.crs,
             "count": src.count,
             "driver": src.driver,
@@ -98,26 +309,186 @@ def get_geotiff_info(geotiff_path, **kwargs):
             "shape": src.shape,
             "transform": src.transform,
             "width": src.width,
+            "bounds": src.bounds,
+            "res": (src.res[0], src.res[1]),
+            "block_shapes": src.block_shapes,
         }
 
+    return metadata
+
+def get_geotiff_metadata(geotiff_path, **kwargs):
+    """Get the metadata of a GeoTIFF file, opening the file only on a cache miss.
+
+    Entries are keyed by path, modification time and size, so a changed file is read again.
+    The least recently used entries are evicted once the cache holds 256 files.
+
+    Args:
+        geotiff_path (str): The path to the GeoTIFF file.
+
+    Returns:
+        dict: A dictionary containing the metadata of the GeoTIFF file.
+    """
+    geotiff_path = os.fspath(geotiff_path)
+    try:
+        stat = os.stat(geotiff_path)
+    except OSError:
+        # Not a local file, e.g. a URL.
+        return dict(_read_geotiff_metadata(geotiff_path, None, None))
+
+    return dict(_read_geotiff_metadata(os.path.abspath(geotiff_path), stat.st_mtime_ns, stat.st_size))
+
+def geotiff_metadata_cache_info(**kwargs):
+    """Get the hit and miss counters of the GeoTIFF metadata cache.
+
+    Returns:
+        dict: The number of hits, misses and cached files, and the hit rate.
+    """
+    info = _read_geotiff_metadata.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        "hits": info.hits,
+        "misses": info.misses,
+        "size": info.currsize,
+        "maxsize": info.maxsize,
+        "hit_rate": info.hits / lookups if lookups else 0.0,
+    }
+
+def clear_geotiff_metadata_cache(**kwargs):
+    """Clear the GeoTIFF metadata cache and reset its counters."""
+    _read_geotiff_metadata.cache_clear()
+
+def get_geotiff_info(geotiff_path, **kwargs):
+    """Get information about a GeoTIFF file.
+
+    Args:
+        geotiff_path (str): The path to the GeoTIFF file.
+
+    Returns:
+        dict: A dictionary containing information about the GeoTIFF file.
+    """
+    metadata = get_geotiff_metadata(geotiff_path)
+    keys = ["crs", "count", "driver", "dtype", "height", "indexes", "nodata", "shape", "transform", "width"]
+    info = {key: metadata[key] for key in keys}
+
     return info
 
-def get_geotiff_array(geotiff_path, band=1, **kwargs):
+def get_geotiff_array(geotiff_path, band=1, window=None, bounds=None, out_shape=None, out=None, masked=False, resampling="nearest", **kwargs):
     """Get a NumPy array from a GeoTIFF file.
 
     Args:
         geotiff_path (str): The path to the GeoTIFF file.
         band (int, optional): The band to read. Defaults to 1.
+        window (Window | tuple, optional): The pixel window to read, as a rasterio Window or
+            ((row_start, row_stop), (col_start, col_stop)). Defaults to None, the whole band.
+        bounds (tuple, optional): The (left, bottom, right, top) bounds to read in the CRS of the
+            file. Ignored if window is given. Defaults to None.
+        out_shape (tuple, optional): The (height, width) to resample to. Smaller shapes are read
+            from the overviews of the file when it has them. Defaults to None.
+        out (numpy.ndarray, optional): A 2-D array to read into, which can be reused across
+            calls. Its shape is used as out_shape. Defaults to None.
+        masked (bool, optional): Whether to return a masked array with the nodata pixels masked.
+            With out, the data of the masked array is out itself. Defaults to False.
+        resampling (str, optional): The resampling method used with out_shape, e.g. "nearest" or
+            "average". Defaults to "nearest".
+
+    Returns:
+        numpy.ndarray: A NumPy array containing the data from the GeoTIFF file, out if it is given.
+    """
+    import rasterio
+    from rasterio.enums import Resampling
+    from rasterio.windows import from_bounds
+
+    with span("get_geotiff_array"):
+        with span("open"):
+            src = rasterio.open(geotiff_path)
+        with src, span("read") as stage:
+            if window is None and bounds is not None:
+                window = from_bounds(*bounds, transform=src.transform).round_offsets().round_lengths()
+            array = src.read(
+                band,
+                window=window,
+                out_shape=out_shape,
+                out=out,
+                masked=masked and out is None,
+                resampling=Resampling[resampling],
+            )
+            if masked and out is not None:
+                # rasterio returns a new masked array, so read the mask separately to keep out.
+                mask = src.read_masks(band, window=window, out_shape=out.shape, resampling=Resampling[resampling]) == 0
+                array = np.ma.masked_array(out, mask=mask, copy=False)
+            stage.add(bytes_read=array.nbytes, pixels=array.size)
+
+    return array
+
+def build_overviews(geotiff_path, factors=None, resampling="average", min_size=256, **kwargs):
+    """Build external overviews (.ovr) for a GeoTIFF file that has none.
+
+    The overviews are written next to the file, which itself is left unchanged, and are picked
+    up automatically by later decimated reads.
+
+    Args:
+        geotiff_path (str): The path to the GeoTIFF file.
+        factors (list, optional): The decimation factors. Defaults to powers of 2 until the
+            overview is smaller than min_size.
+        resampling (str, optional): The resampling method. Defaults to "average".
+        min_size (int, optional): The size of the smallest default overview. Defaults to 256.
 
     Returns:
-        numpy.ndarray: A NumPy array containing the data from the GeoTIFF file.
+        list: The overview factors of the file.
     """
     import rasterio
+    from rasterio.enums import Resampling
 
     with rasterio.open(geotiff_path) as src:
-        array = src.read(band)
+        existing = src.overviews(1)
+        size = max(src.height, src.width)
+    if existing:
+        return existing
+
+    if factors is None:
+        factors = []
+        factor = 2
+        while size / factor >= min_size:
+            factors.append(factor)
+            factor *= 2
+    if not factors:
+        return []
+
+    with rasterio.Env(TIFF_USE_OVR=True):
+        with rasterio.open(geotiff_path, "r+") as dst:
+            dst.build_overviews(factors, Resampling[resampling])
+    return factors
+
+def get_geotiff_preview(geotiff_path, band=1, max_size=1024, build=True, **kwargs):
+    """Get a decimated, nodata-masked array of a GeoTIFF file for quick display.
+
+    Large rasters are read through their overviews, which are built on first use if missing, so
+    the cost of a preview does not depend on the size of the raster.
 
-    return array
+    Args:
+        geotiff_path (str): The path to the GeoTIFF file.
+        band (int, optional): The band to read. Defaults to 1.
+        max_size (int, optional): The maximum height or width of the preview. Defaults to 1024.
+        build (bool, optional): Whether to build missing overviews. Defaults to True.
+
+    Returns:
+        numpy.ma.MaskedArray: The preview with the nodata pixels masked.
+    """
+    with span("get_geotiff_preview"):
+        height, width = get_geotiff_shape(geotiff_path)
+        scale = max(height, width) / max_size
+        if scale <= 1:
+            return get_geotiff_array(geotiff_path, band, masked=True)
+
+        if build:
+            try:
+                with span("build_overviews"):
+                    build_overviews(geotiff_path, min_size=max_size)
+            except Exception:
+                # Read-only files are previewed without overviews.
+                pass
+        out_shape = (max(1, round(height / scale)), max(1, round(width / scale)))
+        return get_geotiff_array(geotiff_path, band, out_shape=out_shape, masked=True)
 
 def get_geotiff_bounds(geotiff_path, **kwargs):
     """Get the bounds of a GeoTIFF file.
@@ -128,10 +499,7 @@ def get_geotiff_bounds(geotiff_path, **kwargs):
     Returns:
         tuple: A tuple containing the bounds of the GeoTIFF file.
     """
-    import rasterio
-
-    with rasterio.open(geotiff_path) as src:
-        bounds = src.bounds
+    bounds = get_geotiff_metadata(geotiff_path)["bounds"]
 
     return bounds
 
@@ -144,10 +512,7 @@ def get_geotiff_crs(geotiff_path, **kwargs):
     Returns:
         rasterio.crs.CRS: A CRS object containing the CRS of the GeoTIFF file.
     """
-    import rasterio
-
-    with rasterio.open(geotiff_path) as src:
-        crs = src.crs
+    crs = get_geotiff_metadata(geotiff_path)["crs"]
 
     return crs
 
@@ -160,10 +525,7 @@ def get_geotiff_transform(geotiff_path, **kwargs):
     Returns:
         Affine: An Affine object containing the transform of the GeoTIFF file.
     """
-    import rasterio
-
-    with rasterio.open(geotiff_path) as src:
-        transform = src.transform
+    transform = get_geotiff_metadata(geotiff_path)["transform"]
 
     return transform
 
@@ -176,10 +538,7 @@ def get_geotiff_resolution(geotiff_path, **kwargs):
     Returns:
         tuple: A tuple containing the resolution of the GeoTIFF file.
     """
-    import rasterio
-
-    with rasterio.open(geotiff_path) as src:
-        resolution = (src.res[0], src.res[1])
+    resolution = get_geotiff_metadata(geotiff_path)["res"]
 
     return resolution
 
@@ -192,10 +551,7 @@ def get_geotiff_nodata(geotiff_path, **kwargs):
     Returns:
         float: The nodata value of the GeoTIFF file.
     """
-    import rasterio
-
-    with rasterio.open(geotiff_path) as src:
-        nodata = src.nodata
+    nodata = get_geotiff_metadata(geotiff_path)["nodata"]
 
     return nodata
 
@@ -208,10 +564,7 @@ def get_geotiff_shape(geotiff_path, **kwargs):
     Returns:
         tuple: A tuple containing the shape of the GeoTIFF file.
     """
-    import rasterio
-
-    with rasterio.open(geotiff_path) as src:
-        shape = src.shape
+    shape = get_geotiff_metadata(geotiff_path)["shape"]
 
     return shape
 
@@ -227,508 +580,704 @@ def point_cloud_arrary(filepath, no_data=-99999, band=1, **kwargs):
         _type_: _description_
     """
     import lidario as lio
-    translator = lio.Translator("geotiff", "np")
-    point_cloud = translator.translate(input_values=filepath, no_data=no_data, band=band)
+    with span("point_cloud_arrary") as stage:
+        translator = lio.Translator("geotiff", "np")
+        point_cloud = translator.translate(input_values=filepath, no_data=no_data, band=band)
+        stage.add(pixels=len(point_cloud))
     return point_cloud
     
-def pixel_area_array(point_cloud_arrary, pixel_size=1, coordinatesp = 'WGS84', toTable = False, **kwargs):
-    """_summary_
+def pixel_area_array(point_cloud_arrary, pixel_size=1, coordinatesp = 'WGS84', toTable = False, out=None, dtype=None, area_only=False, inplace=False, chunk_size=1_000_000, **kwargs):
+    """Get the pixel area of every point of a point cloud.
 
     Args:
-        filepath (_type_): _description_
-        no_data (int, optional): _description_. Defaults to 0.
-        band (int, optional): _description_. Defaults to 1.
+        point_cloud_arrary (numpy.ndarray): An N x 3 array of (lon, lat, value) points, e.g. from
+            point_cloud_arrary.
+        pixel_size (int, optional): The pixel size in degrees. Defaults to 1.
+        coordinatesp (str, optional): The name of the reference ellipsoid. Defaults to 'WGS84'.
+        toTable (bool, optional): Whether to return a pandas DataFrame (or a Series if area_only)
+            sharing memory with the result array. Defaults to False.
+        out (numpy.ndarray, optional): A preallocated array to write the result into, of shape
+            (N, 3), or (N,) if area_only. Defaults to None.
+        dtype (str, optional): The dtype of a newly allocated result, e.g. 'float32'. Defaults to
+            the dtype of the point cloud, or float64 if area_only.
+        area_only (bool, optional): Whether to return only the N pixel areas instead of an N x 3
+            array. Defaults to False.
+        inplace (bool, optional): Whether to overwrite the value column of the point cloud with the
+            areas instead of allocating a new array. Defaults to False.
+        chunk_size (int, optional): The number of points computed at a time, which bounds the size
+            of the float64 temporaries. Defaults to 1000000.
+
+    Raises:
+        ValueError: If the ellipsoid name is not supported or out has the wrong shape.
 
     Returns:
-        _type_: _description_
+        numpy.ndarray | pandas.DataFrame: The (lon, lat, pixel_area) points, or the pixel areas
+            if area_only.
     """
+    with span("pixel_area_array", pixels=len(point_cloud_arrary)):
+        return _pixel_area_array(point_cloud_arrary, pixel_size, coordinatesp, toTable, out, dtype, area_only, inplace, chunk_size)
+
+
+def _pixel_area_array(point_cloud_arrary, pixel_size, coordinatesp, toTable, out, dtype, area_only, inplace, chunk_size):
+    """Compute pixel_area_array inside its instrumentation span."""
+    point_cloud_arrary = np.asarray(point_cloud_arrary)
+    n = len(point_cloud_arrary)
+    shape = (n,) if area_only else point_cloud_arrary.shape
+
+    if out is not None:
+        if out.shape != shape:
+            raise ValueError(f"out has shape {out.shape}, expected {shape}")
+        raster_area = out
+    elif inplace and not area_only:
+        raster_area = point_cloud_arrary
+    else:
+        if dtype is None:
+            dtype = np.float64 if area_only else point_cloud_arrary.dtype
+        raster_area = np.empty(shape, dtype=dtype)
+
+    if not area_only and raster_area is not point_cloud_arrary:
+        raster_area[:, :2] = point_cloud_arrary[:, :2]
+    areas = raster_area if area_only else raster_area[:, 2]
+    with span("area"):
+        for start in range(0, n, chunk_size):
+            center_lat = point_cloud_arrary[start:start + chunk_size, 1]
+            areas[start:start + chunk_size] = area_of_pixel_array(center_lat, pixel_size=pixel_size, coordinatesp=coordinatesp)
 
-    """_summary_
+    if toTable == True:
+        with span("to_table"):
+            import pandas as pd
+
+            if area_only:
+                raster_area = pd.Series(raster_area, name='pixel_area', copy=False)
+            else:
+                raster_area = pd.DataFrame(raster_area, columns=['center_lon', 'center_lat', 'pixel_area'], copy=False)
+
+    return raster_area
+
+def _valid_mask(data, nodata=None):
+    """Get a boolean mask of the valid pixels of a block.
 
     Args:
-        center_lat (_type_): _description_
-        pixel_size (int, optional): _description_. Defaults to 1.
-        coordinatesp (str, optional): _description_. Defaults to 'WGS84'.
+        data (numpy.ndarray): The pixel values.
+        nodata (float, optional): The nodata value. Defaults to None.
+
+    Returns:
+        numpy.ndarray: True where the pixel holds data.
+    """
+    if np.issubdtype(data.dtype, np.floating):
+        valid = ~np.isnan(data)
+        if nodata is not None and not np.isnan(nodata):
+            valid &= data != nodata
+        return valid
+    if nodata is None:
+        return np.ones(data.shape, dtype=bool)
+    return data != nodata
+
+def _check_geographic(src):
+    """Check that an open raster is on a longitude and latitude grid.
+
+    The pixel areas are computed from the transform as degrees, which is only right for a
+    geographic CRS. Rasters without a CRS are assumed to be geographic.
+
+    Args:
+        src (rasterio.io.DatasetReader): The open raster.
 
     Raises:
-        ValueError: _description_
+        ValueError: If the raster is in a projected CRS.
+    """
+    if src.crs is not None and not src.crs.is_geographic:
+        raise ValueError(
+            f"{src.name} is in the projected CRS {src.crs.to_string()}. Pixel areas are computed for "
+            "longitude and latitude grids only, reproject it to EPSG:4326 first."
+        )
+
+def _iter_area_blocks(src, band=1, nodata=None, coordinatesp='WGS84'):
+    """Iterate over the internal blocks of an open raster together with their pixel areas.
+
+    Args:
+        src (rasterio.io.DatasetReader): The open raster.
+        band (int, optional): The band to read. Defaults to 1.
+        nodata (float, optional): The nodata value. Defaults to the nodata value of the file.
+        coordinatesp (str, optional): The name of the reference ellipsoid. Defaults to 'WGS84'.
+
+    Raises:
+        ValueError: If the raster is in a projected CRS.
+
+    Yields:
+        tuple: The block window, the block values, the valid pixel mask, and the pixel area of
+            each row of the block as a column vector.
+    """
+    _check_geographic(src)
+    if nodata is None:
+        nodata = src.nodata
+    with span("area_table"):
+        rows = row_area_table(src.transform, src.height, coordinatesp=coordinatesp)
+    for _, window in src.block_windows(band):
+        with span("read") as stage:
+            data = src.read(band, window=window)
+            stage.add(bytes_read=data.nbytes, pixels=data.size)
+        with span("mask"):
+            valid = _valid_mask(data, nodata)
+        row_off = window.row_off
+        yield window, data, valid, rows[row_off:row_off + window.height, np.newaxis]
+
+def total_area(geotiff_path, band=1, nodata=None, coordinatesp='WGS84', **kwargs):
+    """Get the total area of the valid pixels of a GeoTIFF file.
+
+    The raster is streamed block by block, so memory use does not grow with the raster size and
+    no point cloud is built.
+
+    Args:
+        geotiff_path (str): The path to the GeoTIFF file.
+        band (int, optional): The band to read. Defaults to 1.
+        nodata (float, optional): The nodata value. Defaults to the nodata value of the file.
+        coordinatesp (str, optional): The name of the reference ellipsoid. Defaults to 'WGS84'.
+
+    Raises:
+        ValueError: If the raster is in a projected CRS.
 
     Returns:
-        _type_: _description_
-    """ 
-    if coordinatesp== 'WGS84':
-        a = 6378137
-        b = 6356752.3142
-    elif coordinatesp== 'WGS72':
-        a = 6378135
-        b = 6356750.5
-    elif coordinatesp== 'WGS66':
-        a = 6378145
-        b = 6356759.769356
-    elif coordinatesp== 'WGS60':
-        a = 6378165
-        b = 6356783.286959
-    elif coordinatesp== 'IERS':
-        a = 6378136.6
-        b = 6356751.9
-    elif coordinatesp== 'GRS80':
-        a = 6378137
-        b = 6356752.3141
-    elif coordinatesp== 'GRS67':
-        a = 6378160
-        b = 6356774.51609
-    elif coordinatesp== 'Krassovsky':
-        a = 6378245
-        b = 6356863.019
+        float: The total area of the valid pixels in square meters.
+    """
+    import rasterio
+
+    total = 0.0
+    with span("total_area"), rasterio.open(geotiff_path) as src:
+        for _, _, valid, rows in _iter_area_blocks(src, band, nodata, coordinatesp):
+            with span("area"):
+                total += float(np.dot(valid.sum(axis=1), rows[:, 0]))
+    return total
+
+
+def threshold_area(geotiff_path, threshold, band=1, nodata=None, coordinatesp='WGS84', below=False, **kwargs):
+    """Get the total area of the valid pixels of a GeoTIFF file at or above a threshold.
+
+    The raster is streamed block by block like total_area.
+
+    Args:
+        geotiff_path (str): The path to the GeoTIFF file.
+        threshold (float): The threshold value.
+        band (int, optional): The band to read. Defaults to 1.
+        nodata (float, optional): The nodata value. Defaults to the nodata value of the file.
+        coordinatesp (str, optional): The name of the reference ellipsoid. Defaults to 'WGS84'.
+        below (bool, optional): Whether to count the pixels below the threshold instead. Defaults
+            to False.
+
+    Raises:
+        ValueError: If the raster is in a projected CRS.
+
+    Returns:
+        float: The area of the selected pixels in square meters.
+    """
+    import rasterio
+
+    total = 0.0
+    with span("threshold_area"), rasterio.open(geotiff_path) as src:
+        for _, data, valid, rows in _iter_area_blocks(src, band, nodata, coordinatesp):
+            with span("area"):
+                selected = valid & ((data < threshold) if below else (data >= threshold))
+                total += float(np.dot(selected.sum(axis=1), rows[:, 0]))
+    return total
+
+
+def class_area(geotiff_path, band=1, nodata=None, coordinatesp='WGS84', **kwargs):
+    """Get the total area of each class value of a classified GeoTIFF file.
+
+    The raster is streamed block by block and the pixel areas are summed per class with an
+    area-weighted bincount, so memory use only grows with the number of classes.
+
+    Args:
+        geotiff_path (str): The path to the GeoTIFF file.
+        band (int, optional): The band to read. Defaults to 1.
+        nodata (float, optional): The nodata value. Defaults to the nodata value of the file.
+        coordinatesp (str, optional): The name of the reference ellipsoid. Defaults to 'WGS84'.
+
+    Raises:
+        ValueError: If the raster is in a projected CRS.
+
+    Returns:
+        dict: A dictionary mapping each class value to its area in square meters, sorted by class.
+    """
+    import rasterio
+
+    areas = {}
+    with span("class_area"), rasterio.open(geotiff_path) as src:
+        for _, data, valid, rows in _iter_area_blocks(src, band, nodata, coordinatesp):
+            with span("area"):
+                weights = np.broadcast_to(rows, data.shape)[valid]
+                classes, inverse = np.unique(data[valid], return_inverse=True)
+                sums = np.bincount(inverse, weights=weights, minlength=len(classes))
+                for value, area in zip(classes.tolist(), sums.tolist()):
+                    areas[value] = areas.get(value, 0.0) + area
+    return dict(sorted(areas.items()))
+
+
+def area_weighted_stats(geotiff_path, band=1, nodata=None, coordinatesp='WGS84', **kwargs):
+    """Get the area-weighted sum and mean of the values of a GeoTIFF file.
+
+    The raster is streamed block by block and accumulated in float64 in a single pass.
+
+    Args:
+        geotiff_path (str): The path to the GeoTIFF file.
+        band (int, optional): The band to read. Defaults to 1.
+        nodata (float, optional): The nodata value. Defaults to the nodata value of the file.
+        coordinatesp (str, optional): The name of the reference ellipsoid. Defaults to 'WGS84'.
+
+    Raises:
+        ValueError: If the raster is in a projected CRS.
+
+    Returns:
+        dict: The weighted sum of value times pixel area ('sum'), the area-weighted mean ('mean')
+            and the valid area in square meters ('area'). The mean is NaN if no pixel is valid.
+    """
+    import rasterio
+
+    weighted_sum = 0.0
+    valid_area = 0.0
+    with span("area_weighted_stats"), rasterio.open(geotiff_path) as src:
+        for _, data, valid, rows in _iter_area_blocks(src, band, nodata, coordinatesp):
+            with span("area"):
+                weights = np.broadcast_to(rows, data.shape)[valid]
+                weighted_sum += float(np.dot(data[valid].astype(np.float64), weights))
+                valid_area += float(weights.sum())
+
+    mean = weighted_sum / valid_area if valid_area > 0 else float('nan')
+    return {'sum': weighted_sum, 'mean': mean, 'area': valid_area}
+
+
+def _overlap_groups(geoms, tree, all_touched=False):
+    """Split polygons into groups in which no two polygons can share a pixel.
+
+    Polygons whose interiors intersect go to different groups, and with all_touched so do
+    polygons that only touch. The groups are assigned greedily in the order of the polygons, so a
+    layer without overlaps is a single group.
+
+    Args:
+        geoms (numpy.ndarray): The polygons.
+        tree (shapely.STRtree): The index of the polygons.
+        all_touched (bool, optional): Whether the polygons are rasterized with all_touched.
+            Defaults to False.
+
+    Returns:
+        numpy.ndarray: The group number of each polygon.
+    """
+    import shapely
+
+    left, right = tree.query(geoms, predicate='intersects')
+    pairs = left != right
+    left, right = left[pairs], right[pairs]
+    if not all_touched:
+        overlapping = ~shapely.touches(geoms[left], geoms[right])
+        left, right = left[overlapping], right[overlapping]
+    order = np.argsort(left, kind='stable')
+    left, right = left[order], right[order]
+    starts = np.searchsorted(left, np.arange(len(geoms) + 1))
+
+    groups = np.full(len(geoms), -1, dtype=np.int64)
+    for i in range(len(geoms)):
+        used = set(groups[right[starts[i]:starts[i + 1]]].tolist())
+        group = 0
+        while group in used:
+            group += 1
+        groups[i] = group
+    return groups
+
+
+def zonal_area(geotiff_path, vector, band=1, nodata=None, coordinatesp='WGS84', column='pixel_area', all_touched=False, **kwargs):
+    """Get the valid pixel area of a GeoTIFF file inside each polygon of a vector layer.
+
+    The polygons are indexed with an STRtree, so each raster block is only read and rasterized
+    when it touches at least one polygon. Overlapping polygons are rasterized separately, so a
+    pixel inside several polygons counts towards the area of each of them.
+
+    Args:
+        geotiff_path (str): The path to the GeoTIFF file.
+        vector (str | geopandas.GeoDataFrame): The path to a vector file or a GeoDataFrame.
+        band (int, optional): The band to read. Defaults to 1.
+        nodata (float, optional): The nodata value. Defaults to the nodata value of the file.
+        coordinatesp (str, optional): The name of the reference ellipsoid. Defaults to 'WGS84'.
+        column (str, optional): The name of the area column. Defaults to 'pixel_area'. Avoid
+            'area', which is shadowed by the GeoDataFrame.area property of the geometric area.
+        all_touched (bool, optional): Whether to count every pixel touched by a polygon instead of
+            only the pixels whose center is inside it. Defaults to False.
+
+    Raises:
+        ValueError: If the raster is in a projected CRS.
+
+    Returns:
+        geopandas.GeoDataFrame: A copy of the vector layer with the area in square meters of each
+            polygon in the column named by column.
+    """
+    import geopandas as gpd
+    import rasterio
+    import shapely
+    from rasterio import features, windows
+
+    if isinstance(vector, (str, os.PathLike)):
+        gdf = gpd.read_file(vector)
     else:
-        raise ValueError(f"Invalid coordinatesp name: {coordinatesp}")
-    raster_area = point_cloud_arrary
-    for i in range(len(point_cloud_arrary)):
-        center_lat = point_cloud_arrary[i][1]
-        c = math.sqrt(1 - (b/a)**2)
-        zm_a = 1 - c*math.sin(math.radians(center_lat+pixel_size/2))
-        zp_a = 1 + c*math.sin(math.radians(center_lat+pixel_size/2))
-        area_a = math.pi * b**2 * (math.log(zp_a/zm_a) / (2*c) + math.sin(math.radians(center_lat+pixel_size/2)) / (zp_a*zm_a))
-        zm_b = 1 - c*math.sin(math.radians(center_lat-pixel_size/2))
-        zp_b = 1 + c*math.sin(math.radians(center_lat-pixel_size/2))
-        area_b = math.pi * b**2 * (math.log(zp_b/zm_b) / (2*c) + math.sin(math.radians(center_lat-pixel_size/2)) / (zp_b*zm_b))
-        area = (1 / 360 * (area_a - area_b))
-        raster_area[i][2] = area
-    
-    if toTable == True:
-        raster_area = pd.DataFrame(raster_area)
-        raster_area.rename(columns={0:'center_lon',1:'center_lat',2:'pixel_area'},inplace=True)
+        gdf = vector.copy()
+
+    areas = np.zeros(len(gdf))
+    with span("zonal_area"), rasterio.open(geotiff_path) as src:
+        if nodata is None:
+            nodata = src.nodata
+        geoms = gdf.geometry
+        if gdf.crs is not None and src.crs is not None and gdf.crs != src.crs:
+            geoms = geoms.to_crs(src.crs)
+        geoms = np.asarray(geoms.values)
+        tree = shapely.STRtree(geoms)
+        groups = _overlap_groups(geoms, tree, all_touched)
+        _check_geographic(src)
+        rows = row_area_table(src.transform, src.height, coordinatesp=coordinatesp)
+
+        for _, window in src.block_windows(band):
+            hits = tree.query(shapely.box(*windows.bounds(window, src.transform)))
+            if len(hits) == 0:
+                continue
+            hits.sort()
+            with span("read") as stage:
+                data = src.read(band, window=window)
+                stage.add(bytes_read=data.nbytes, pixels=data.size)
+            valid_data = _valid_mask(data, nodata)
+            block_rows = np.broadcast_to(rows[window.row_off:window.row_off + window.height, np.newaxis], data.shape)
+            for group in np.unique(groups[hits]):
+                with span("rasterize"):
+                    zones = features.rasterize(
+                        [(geoms[i], i + 1) for i in hits[groups[hits] == group]],
+                        out_shape=data.shape,
+                        transform=windows.transform(window, src.transform),
+                        fill=0,
+                        all_touched=all_touched,
+                        dtype='int32',
+                    )
+                with span("area"):
+                    valid = valid_data & (zones > 0)
+                    areas += np.bincount(zones[valid], weights=block_rows[valid], minlength=len(gdf) + 1)[1:]
+
+    gdf[column] = areas
+    return gdf
+
+
+def _area_worker(task):
+    """Run one area function on one file, capturing any error.
+
+    Args:
+        task (tuple): The area function, the file path, and the keyword arguments.
+
+    Returns:
+        tuple: The file path, the result or None, and the error message or None.
+    """
+    func, path, kwargs = task
+    try:
+        return path, func(path, **kwargs), None
+    except Exception as e:
+        return path, None, f"{type(e).__name__}: {e}"
+
+def _expand_paths(paths):
+    """Expand a glob pattern or a list of paths into a list of paths.
+
+    Args:
+        paths (str | list): A glob pattern or a list of file paths.
+
+    Returns:
+        list: The file paths.
+    """
+    import glob
+
+    if isinstance(paths, (str, os.PathLike)):
+        return sorted(glob.glob(os.fspath(paths), recursive=True))
+    return [os.fspath(path) for path in paths]
+
+def batch_area(paths, func=total_area, max_workers=None, chunksize=1, **kwargs):
+    """Compute areas for many GeoTIFF files in parallel with a process pool.
+
+    A failing file is reported in the error column instead of aborting the whole batch.
+
+    Args:
+        paths (str | list): A glob pattern or a list of file paths.
+        func (callable, optional): The area function to apply to each file, e.g. total_area or
+            class_area. Must be importable by the worker processes. Defaults to total_area.
+        max_workers (int, optional): The number of worker processes. Use 1 to run in the current
+            process. Defaults to the number of CPUs.
+        chunksize (int, optional): The number of files sent to a worker at a time. Defaults to 1.
+        kwargs: Keyword arguments passed to func, e.g. band, nodata or coordinatesp.
+
+    Returns:
+        pandas.DataFrame: One row per file in input order with the columns path, area and error.
+    """
+    import pandas as pd
+    from concurrent.futures import ProcessPoolExecutor
+
+    tasks = [(func, path, kwargs) for path in _expand_paths(paths)]
+    if max_workers == 1:
+        results = list(map(_area_worker, tasks))
     else:
-        pass
-    
-    return raster_area
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(_area_worker, tasks, chunksize=chunksize))
+    return pd.DataFrame(results, columns=['path', 'area', 'error'])
 
 
-class SelectFilesButton(widgets.Button):
-    """A file widget that leverages tkinter.filedialog."""
-
-    def __init__(self):
-        super(SelectFilesButton, self).__init__()
-        # Add the selected_files trait
-        self.add_traits(files=traitlets.traitlets.List())
-        # Create the button.
-        self.description = "Select Files"
-        self.icon = "square-o"
-        # Set on click behavior.
-        self.on_click(self.select_files)
-
-    @staticmethod
-    def select_files(b):
-        """Generate instance of tkinter.filedialog.
-
-        Parameters
-        ----------
-        b : obj:
-            An instance of ipywidgets.widgets.Button 
-        """
-        # Create Tk root
-        root = Tk()
-        # Hide the main window
-        root.withdraw()
-        # Raise the root to the top of all windows.
-        root.call('wm', 'attributes', '.', '-topmost', True)
-        # List of selected fileswill be set to b.value
-        b.files = filedialog.askopenfilename(multiple=True)
-
-        b.description = "Files Selected"
-        b.icon = "check-square-o"
-        b.style.button_color = "lightgreen"
-
-
-class Toolbar(widgets.VBox):
-    """
-    create a widget for interactive plot
-        
-    """    
-    def __init__(self,parent,**kwargs):
-        super().__init__()
-        self.create_widgets()
-        self.output = widgets.Output()
-        self.setup_interactive_plot()   
-        self.parent = parent
-
-        # Observe the changes in the fileuploader.files and call open_file
-        self.fileuploader.observe(self.open_file, names='files')
-        self.layerselector.observe(self.plot, 'value')  
-    
-    padding = "0px 0px 0px 5px"
-    ## create buttons
-    def create_widgets(self):
-        self.fileuploader = SelectFilesButton()
-        self.add_button = widgets.Button(description="Add")
-        self.add_button.on_click(self.add)
-        self.layerselector = widgets.Dropdown(
-            options=["No file uploaded"],
-            value=None,
-            description="Layer:"
-        )
-        self.pick_button = widgets.Button(description="Pick", layout=widgets.Layout(padding="0px 0px 0px 5px"))  # Create a pick_button
-        self.pick_button.on_click(self.pick_location)  # Add an event listener for the pick_button
-        self.plot_button = widgets.Button(description="Plot", layout=widgets.Layout(padding="0px 0px 0px 5px"))  # Create a plot_button
-        self.plot_button.on_click(self.plot_time_series)  # Add an event listener for the plot_button
-        self.marker = None
-        self.start_date_picker = widgets.DatePicker(description='Start Date', value=datetime(2018, 1, 1))
-        self.end_date_picker = widgets.DatePicker(description='End Date', value=datetime(2018, 12, 31))
-        self.time_resolution_dropdown = widgets.Dropdown(options=['Daily', 'Monthly', 'Yearly'], description='Resolution')
-        self.save_button = widgets.Button(description="Save", layout=widgets.Layout(padding="0px 0px 0px 5px"))  # Create a save_button
-        self.save_button.on_click(self.save_plot)  
-        self.children = [self.fileuploader,
-                        self.pick_button,
-                        self.plot_button,
-                        self.start_date_picker,
-                        self.end_date_picker,
-                        self.time_resolution_dropdown,
-                        self.save_button]  # Add the plot_button to the children list
-        self.fig = None 
-
-    ## define toolbar layout
-    def setup_interactive_plot(self):
-        left_box = widgets.VBox([
-            self.fileuploader,
-            self.layerselector,
-            self.add_button,
-            self.pick_button,
-            self.start_date_picker,
-            self.end_date_picker,
-            self.time_resolution_dropdown,
-            self.plot_button,
-            self.save_button
-        ])
-
-        toolbar = widgets.HBox([left_box, self.output])
-        display(toolbar)
-    ## define open file event
-    def open_file(self, change):
-        self.ds_list = self.fileuploader.files
-        self.update_dropdown()
-
-    def update_dropdown(self):
-        if len(self.ds_list) > 0:
-            file_names = [os.path.basename(file_path) for file_path in self.ds_list]
-            self.layerselector.options = file_names
-            self.layerselector.value = file_names[0]
-        else:
-            self.layerselector.options = ["No file uploaded"]
-            self.layerselector.value = None
-
-    def read_and_plot_file(self, file_path):
-        with self.output:
-            self.output.clear_output()
-            if file_path.endswith(".tif"):
-                self.parent.add_raster(source=file_path, bands=1, layer_name='GRACE', palette='Accent', vmin=None, vmax=None, nodata=-99999, attribute=None)
-                with rasterio.open(file_path) as ds:
-                    data = ds.read(1)
-            else:
-                print("File type not supported")
-                return
-        
-            nodata = -99999
-            data[data == nodata] = np.nan # Set nodata values to NaN
-
-        # Setting up the color scale
-            cmap = plt.cm.RdBu
-            cmap.set_bad(color='white')
-            norm = TwoSlopeNorm(vmin=-1, vcenter=0, vmax=1)
-
-            plt.imshow(data, cmap=cmap, norm=norm) # Plot the image with the new color scale
-            plt.colorbar()
-            plt.show()
-            print(self.output.outputs)
-    
-    def plot(self, change):
-        if change['name'] == 'value':
-            selected_file_name = self.layerselector.value
-            selected_file_index = self.layerselector.options.index(selected_file_name)
-            selected_file_path = self.fileuploader.files[selected_file_index]
-            self.read_and_plot_file(selected_file_path)
-
-    def add(self, event=None):
-        self.read_and_plot_file(file_path = self.fileuploader.files[0])
-
-    def pick_location(self, button):
-        if not self.parent.on_interaction(self.handle_click):  # Add a click event handler to the parent (Map)
-            self.parent.on_interaction(self.handle_click)
-
-    def handle_click(self, **kwargs):
-        if kwargs.get('type') == 'click':  # Check if the event is a click event
-            lat_lng = kwargs.get('coordinates')
-            if lat_lng:
-                if self.marker:  # If a marker already exists, remove it before adding a new one
-                    self.parent.remove_layer(self.marker)
-
-                self.marker = Marker(location=lat_lng, draggable=False)  # Create a marker at the clicked location
-                self.parent.add_layer(self.marker)  # Add the marker to the map
-                print(f'Clicked coordinates: {lat_lng}')  # Print the real-world coordinates
-
-    @staticmethod
-    def date_from_filename(filename):
-        parts = filename.split('_')
-        for part in parts:
-            if part.isdigit():
-                start_day_of_year = int(part[:7])
-                end_day_of_year = int(part[7:])
-                break
+def resample_stack(file_list, freq='M', how='mean', dates=None, band=1, nodata=None, coordinatesp='WGS84', **kwargs):
+    """Aggregate a time-indexed stack of GeoTIFF files to daily, monthly or yearly periods.
+
+    The files are read one at a time, period by period and block by block, into running sums and
+    valid pixel counts, so only one file is open at once and the memory used beyond the result is
+    a block and a count grid, however many files the stack has. The files must share the same
+    grid.
+
+    Args:
+        file_list (list): The paths to the GeoTIFF files.
+        freq (str, optional): The period, 'D' (daily), 'M' (monthly) or 'Y' (yearly). Defaults
+            to 'M'.
+        how (str, optional): 'mean' or 'sum' per pixel, or 'area_mean' for the area-weighted
+            mean over all valid pixels and time steps of each period. Defaults to 'mean'.
+        dates (list, optional): The date of each file. Defaults to the dates parsed from the file
+            names with date_from_filename.
+        band (int, optional): The band to read. Defaults to 1.
+        nodata (float, optional): The nodata value. Defaults to the nodata value of each file.
+        coordinatesp (str, optional): The name of the reference ellipsoid, used by 'area_mean'.
+            Defaults to 'WGS84'.
+
+    Raises:
+        ValueError: If how is not supported, the files do not share the same grid, or, for
+            'area_mean', the files are in a projected CRS.
+
+    Returns:
+        tuple | pandas.Series: For 'mean' and 'sum', the start date of each period and a
+            (periods, height, width) float64 array that is NaN where a period has no valid
+            value. For 'area_mean', a Series indexed by the start date of each period.
+    """
+    import rasterio
+    import pandas as pd
+
+    if how not in ('mean', 'sum', 'area_mean'):
+        raise ValueError(f"Invalid aggregation: {how}")
+    if dates is None:
+        dates = [date_from_filename(os.path.basename(file_path)) for file_path in file_list]
+
+    periods = pd.DatetimeIndex(dates).to_period(freq)
+    codes, unique_periods = pd.factorize(periods, sort=True)
+    order = np.argsort(codes, kind='stable')
+    starts = np.flatnonzero(np.r_[True, np.diff(codes[order]) != 0])
+    index = unique_periods.to_timestamp()
+
+    with span("resample_stack"):
+        with rasterio.open(file_list[order[0]]) as first:
+            if how == 'area_mean':
+                _check_geographic(first)
+            name, shape, transform = first.name, first.shape, first.transform
+
+        if how == 'area_mean':
+            rows = row_area_table(transform, shape[0], coordinatesp=coordinatesp)
+            weighted_sums = np.zeros(len(starts))
+            valid_areas = np.zeros(len(starts))
         else:
-            raise ValueError("Date not found in file name")
-
-        year = int(start_day_of_year / 1000)
-        start_day_of_year %= 1000
-        end_date = datetime(year, 1, 1) + timedelta(days=end_day_of_year - 1)
-        return end_date
-
-    def get_tiff_dates(self, file_list):
-        dates = []
-        for file_path in file_list:
-            file_name = os.path.basename(file_path)
-            date_obj = self.date_from_filename(file_name)
-            dates.append(date_obj)
-        return dates
-
-    def get_pixel_values(self, file_list, lat_lng):
-        lat, lng = lat_lng
-        values = []
-        for file_path in file_list:
-            with rasterio.open(file_path) as src:
-                row, col = src.index(lng, lat)
-                value = src.read(1)[row, col]
-                values.append(value)
-        return values
-    
-    def check_number_of_files(self, start_date, end_date, time_resolution):
-        if time_resolution == 'Daily':
-            expected_files = (end_date - start_date).days + 1
-        elif time_resolution == 'Monthly':
-            expected_files = (end_date.year - start_date.year) * 12 + end_date.month - start_date.month + 1
-        elif time_resolution == 'Yearly':
-            expected_files = end_date.year - start_date.year + 1
-        
-        if len(self.fileuploader.files) != expected_files:
-            return f"Error: {expected_files} files expected for the selected date range and time resolution, but {len(self.fileuploader.files)} files were uploaded."
-        return ""
-
-    def plot_time_series(self, button):
-        if not hasattr(self, 'marker') or self.marker is None:
-            return
-
-        lat_lng = self.marker.location
-        values = self.get_pixel_values(self.fileuploader.files, lat_lng)
-
-        start_date = self.start_date_picker.value
-        end_date = self.end_date_picker.value
-        time_resolution = self.time_resolution_dropdown.value
-
-        error_message = self.check_number_of_files(start_date, end_date, time_resolution)
-        if error_message:
-            print(error_message)
-            return
-
-        if time_resolution == 'Daily':
-            date_range = pd.date_range(start_date, end_date, freq='D')
-            x_axis_format = mdates.DayLocator()
-            x_axis_date_format = mdates.DateFormatter('%Y-%m-%d')
-        elif time_resolution == 'Monthly':
-            date_range = pd.date_range(start_date, end_date, freq='M')
-            x_axis_format = mdates.MonthLocator()
-            x_axis_date_format = mdates.DateFormatter('%Y-%m')
-        elif time_resolution == 'Yearly':
-            date_range = pd.date_range(start_date, end_date, freq='Y')
-            x_axis_format = mdates.YearLocator()
-            x_axis_date_format = mdates.DateFormatter('%Y')
-
-                # Resample the values to match the length of the date_range
-        values = np.interp(
-            np.linspace(0, len(values) - 1, len(date_range)),
-            np.arange(len(values)),
-            values
-        )
-        with self.output:
-            self.output.clear_output() 
-            self.fig, ax = plt.subplots()
-            ax.plot(date_range, values)
-            ax.xaxis.set_major_locator(x_axis_format)
-            ax.xaxis.set_major_formatter(x_axis_date_format)
-            plt.xticks(rotation=45)
-            plt.show()
-            
-    def save_plot(self, button):
-        with self.output:
-            if self.fig:  # Check if there is a figure to save
-                self.fig.savefig('plot.png')  # Save the figure to a file named 'plot.png'
-                print('Plot saved as plot.png')  # Print a message to indicate the plot has been saved
-            else:
-                print('No plot to save')  # Print a message if there is no plot to save
+            grids = np.full((len(starts),) + shape, np.nan)
+            counts = np.zeros(shape, dtype=np.int64)
+
+        for period, group in enumerate(np.split(order, starts[1:])):
+            if how != 'area_mean':
+                sums = grids[period]
+                sums[:] = 0
+                counts[:] = 0
+            for i in group:
+                with rasterio.open(file_list[i]) as src:
+                    if src.shape != shape or src.transform != transform:
+                        raise ValueError(f"{src.name} does not share the grid of {name}")
+                    value = src.nodata if nodata is None else nodata
+                    for _, window in src.block_windows(band):
+                        with span("read") as stage:
+                            data = src.read(band, window=window)
+                            stage.add(bytes_read=data.nbytes, pixels=data.size)
+                        with span("reduce"):
+                            valid = _valid_mask(data, value)
+                            values = np.where(valid, data, 0).astype(np.float64)
+                            row_slice = slice(window.row_off, window.row_off + window.height)
+                            col_slice = slice(window.col_off, window.col_off + window.width)
+                            if how == 'area_mean':
+                                block_rows = rows[row_slice, np.newaxis]
+                                weighted_sums[period] += (values * block_rows).sum()
+                                valid_areas[period] += (valid * block_rows).sum()
+                            else:
+                                sums[row_slice, col_slice] += values
+                                counts[row_slice, col_slice] += valid
+
+            if how != 'area_mean':
+                if how == 'mean':
+                    np.divide(sums, counts, out=sums, where=counts > 0)
+                sums[counts == 0] = np.nan
+
+    if how == 'area_mean':
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return pd.Series(weighted_sums / valid_areas, index=index)
+    return index, grids
+
+
+def _read_pixel(file_path, lat, lng, band=1):
+    """Read the value of the pixel at a location without decoding the whole band.
 
-class Map(geemap.Map):
-    
-    def __init__(self, center=[20, 0], zoom=2, **kwargs) -> None:
+    Args:
+        file_path (str): The path to the GeoTIFF file.
+        lat (float): The latitude of the location.
+        lng (float): The longitude of the location.
+        band (int, optional): The band to read. Defaults to 1.
 
-        if "scroll_wheel_zoom" not in kwargs:
-            kwargs["scroll_wheel_zoom"] = True
+    Returns:
+        The pixel value, or NaN if the location is outside the raster or the pixel is nodata.
+    """
+    import rasterio
+    from rasterio.windows import Window
 
-        super().__init__(center=center, zoom=zoom, **kwargs)
-        self.toolbar = Toolbar(parent=self)
+    with rasterio.open(file_path) as src:
+        row, col = src.index(lng, lat)
+        if not (0 <= row < src.height and 0 <= col < src.width):
+            return np.nan
+        pixel = src.read(band, window=Window(col, row, 1, 1))
+        if not _valid_mask(pixel, src.nodatavals[band - 1])[0, 0]:
+            return np.nan
+        return pixel[0, 0]
 
-    
-    def add_basemap(self, basemap, **kwargs):
 
-        import xyzservices.providers as xyz
+def _sample_points(file_path, lats, lngs, band=1):
+    """Read the pixel values at many locations, reading each internal block at most once.
+
+    Args:
+        file_path (str): The path to the GeoTIFF file.
+        lats (numpy.ndarray): The latitudes of the locations.
+        lngs (numpy.ndarray): The longitudes of the locations.
+        band (int, optional): The band to read. Defaults to 1.
+
+    Returns:
+        numpy.ndarray: The pixel values as float64, NaN for locations outside the raster and
+            nodata pixels.
+    """
+    import rasterio
+    from rasterio.transform import rowcol
+    from rasterio.windows import Window
+
+    values = np.full(len(lats), np.nan)
+    with rasterio.open(file_path) as src:
+        rows, cols = rowcol(src.transform, lngs, lats)
+        rows = np.asarray(rows, dtype=np.int64)
+        cols = np.asarray(cols, dtype=np.int64)
+        inside = np.flatnonzero((rows >= 0) & (rows < src.height) & (cols >= 0) & (cols < src.width))
+        if len(inside) == 0:
+            return values
+
+        block_height, block_width = src.block_shapes[band - 1]
+        blocks_per_row = -(-src.width // block_width)
+        block_ids = rows[inside] // block_height * blocks_per_row + cols[inside] // block_width
+        order = np.argsort(block_ids, kind='stable')
+        inside, block_ids = inside[order], block_ids[order]
+        unique_ids, starts = np.unique(block_ids, return_index=True)
+
+        for block_id, group in zip(unique_ids, np.split(inside, starts[1:])):
+            row_off = block_id // blocks_per_row * block_height
+            col_off = block_id % blocks_per_row * block_width
+            window = Window(col_off, row_off, min(block_width, src.width - col_off), min(block_height, src.height - row_off))
+            block = src.read(band, window=window)
+            sampled = block[rows[group] - row_off, cols[group] - col_off]
+            values[group] = np.where(_valid_mask(sampled, src.nodatavals[band - 1]), sampled, np.nan)
+    return values
+
+def extract_points(file_list, points, band=1, x="longitude", y="latitude", label=None, dates=None, max_workers=8, **kwargs):
+    """Extract the time series of many locations from a stack of GeoTIFF files.
+
+    Each file is opened once and each internal block is read at most once, no matter how many
+    locations fall into it.
+
+    Args:
+        file_list (list): The paths to the GeoTIFF files, one per time step.
+        points (str | array_like): The path to a CSV file or an array of (lat, lng) pairs.
+        band (int, optional): The band to read. Defaults to 1.
+        x (str, optional): The longitude column of the CSV file. Defaults to "longitude".
+        y (str, optional): The latitude column of the CSV file. Defaults to "latitude".
+        label (str, optional): The CSV column to use as column names. Defaults to None.
+        dates (list, optional): The date of each file. Defaults to the dates parsed from the file
+            names with date_from_filename.
+        max_workers (int, optional): The number of files read concurrently. Defaults to 8.
+
+    Raises:
+        ValueError: If dates is None and a file name holds no date.
 
-        if basemap.lower() == "roadmap":
-            url = 'http://mt0.google.com/vt/lyrs=m&hl=en&x={x}&y={y}&z={z}'
-            self.add_tile_layer(url, name=basemap, **kwargs)
-        elif basemap.lower() == "satellite":
-            url = 'http://mt0.google.com/vt/lyrs=y&hl=en&x={x}&y={y}&z={z}'
-            self.add_tile_layer(url, name=basemap, **kwargs)
+    Returns:
+        pandas.DataFrame: The pixel values with a DatetimeIndex of one row per file and one
+            column per location. Locations outside a raster and nodata pixels are NaN.
+    """
+    import pandas as pd
+    from concurrent.futures import ThreadPoolExecutor
+
+    with span("extract_points"):
+        columns = None
+        if isinstance(points, (str, os.PathLike)):
+            with span("read_csv"):
+                df = pd.read_csv(points)
+            lats = df[y].to_numpy(dtype=np.float64)
+            lngs = df[x].to_numpy(dtype=np.float64)
+            if label is not None:
+                columns = df[label].tolist()
         else:
-            try:
-                basemap = eval(f"xyz.{basemap}")
-                url = basemap.build_url()
-                attribution = basemap.attribution
-                self.add_tile_layer(url, name=basemap.name, attribution=attribution, **kwargs)
-            except:
-                raise ValueError(f"Basemap '{basemap}' not found.")
-
-    def add_raster(
-        self,
-        source,
-        bands=1,
-        layer_name=None,
-        palette=None,
-        vmin=None,
-        vmax=None,
-        nodata=None,
-        attribute=None
-    ):
-        """Add a local raster dataset to the map.
-
-            If you are using this function in JupyterHub on a remote server and the raster does not render properly, try
-            running the following two lines before calling this function:
-
-            import os
-            os.environ['LOCALTILESERVER_CLIENT_PREFIX'] = 'proxy/{port}'
-
-        Args:
-            source (str): The path to the GeoTIFF file or the URL of the Cloud Optimized GeoTIFF.
-            band (int, optional): The band to use. Band indexing starts at 1. Defaults to None.
-            palette (str, optional): The name of the color palette from `palettable` to use when plotting a single band. See https://jiffyclub.github.io/palettable. Default is greyscale
-            vmin (float, optional): The minimum value to use when colormapping the palette when plotting a single band. Defaults to None.
-            vmax (float, optional): The maximum value to use when colormapping the palette when plotting a single band. Defaults to None.
-            nodata (float, optional): The value from the band to use to interpret as not valid data. Defaults to None.
-            attribution (str, optional): Attribution for the source raster. This defaults to a message about it being a local file.. Defaults to None.
-            layer_name (str, optional): The layer name to use. Defaults to None.
-        """
-        super().add_raster(source=source, bands=bands, layer_name=layer_name, palette=palette, vmin=vmin, vmax=vmax, nodata=nodata, attribute=attribute)
-
- 
-    def add_toolbar(self, position='topright', **kwargs):
-        """Adds a toolbar to the map.
-
-        Args:
-            toolbar (str, optional): The toolbar to add. Defaults to 'draw'.
-            position (str, optional): The position of the toolbar. Defaults to 'topright'.
-        """
-        widget_width = "250px"
-        padding = "0px 0px 0px 5px"  # upper, right, bottom, left
-
-        toolbar_button = widgets.ToggleButton(
-            value=False,
-            tooltip="Toolbar",
-            icon="wrench",
-            layout=widgets.Layout(width="28px", height="28px", padding=padding),
-        )
+            points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+            lats, lngs = points[:, 0], points[:, 1]
 
-        close_button = widgets.ToggleButton(
-            value=False,
-            tooltip="Close the tool",
-            icon="times",
-            button_style="primary",
-            layout=widgets.Layout(height="28px", width="28px", padding=padding),
-        )
-        toolbar = widgets.HBox([toolbar_button])
+        # Parse the dates first, so that an undated file fails before any reading
+        if dates is None:
+            dates = [date_from_filename(file_path) for file_path in file_list]
+
+        with span("sample", pixels=len(lats) * len(file_list)):
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                values = list(executor.map(lambda file_path: _sample_points(file_path, lats, lngs, band), file_list))
+
+        with span("to_table"):
+            return pd.DataFrame(
+                np.vstack(values) if values else np.empty((0, len(lats))),
+                index=pd.DatetimeIndex(dates),
+                columns=columns,
+            )
 
-        def toolbar_click(change):
-            if change["new"]:
-                toolbar.children = [toolbar_button, close_button]
-            else:
-                toolbar.children = [toolbar_button]
-        
-        toolbar_button.observe(toolbar_click, "value")
-
-        def close_click(change):
-            if change["new"]:
-                toolbar_button.close()
-                close_button.close()
-                toolbar.close()
-        
-        close_button.observe(close_click, "value")
-        rows = 2
-        cols = 2
-        grid = widgets.GridspecLayout(rows, cols, grid_gap="0px", layout=widgets.Layout(width="65px"))
-        icons = ["folder-open", "map", "info", "question"]
-
-        for i in range(rows):
-            for j in range(cols):
-                grid[i, j] = widgets.Button(description="", button_style="primary", icon=icons[i*rows+j], 
-                                            layout=widgets.Layout(width="28px", padding="0px"))
-        toolbar = widgets.VBox([toolbar_button])
-        def toolbar_click(change):
-            if change["new"]:
-                toolbar.children = [widgets.HBox([close_button, toolbar_button]), grid]
-            else:
-                toolbar.children = [toolbar_button]
-        
-        toolbar_button.observe(toolbar_click, "value")
-
-        toolbar_ctrl = WidgetControl(widget=toolbar, position=position)
-
-        output = widgets.Output()
-        output_ctrl = WidgetControl(widget=output, position="bottomright")
-        def tool_click(b):    
-            with output:
-                output.clear_output()
-                print(f"You clicked the {b.icon} button")
-
-        for i in range(rows):
-            for j in range(cols):
-                tool = grid[i, j]
-                tool.on_click(tool_click)
-
-        with output:
-            output.clear_output()
-            print("Click on a button to see the output")
-
-        basemap = widgets.Dropdown(
-            options=["roadmap", "satellite"],
-            value=None,
-            description="Basemap:",
-            style={"description_width": "initial"},
-            layout=widgets.Layout(width="200px"),
-        )
-        basemap_ctrl = WidgetControl(widget=basemap, position="topright")
 
-        def tool_click(b):    
-            with output:
-                output.clear_output()
-                print(f"You clicked the {b.icon} button")
+_DAY_RANGE = re.compile(r"(?<!\d)(\d{4})(\d{3})-(\d{4})(\d{3})(?!\d)")
+_COMPACT_DAY_RANGE = re.compile(r"(?<!\d)(\d{4})(\d{3})(\d{3})(?!\d)")
+_YEAR_MONTH = re.compile(r"(?<!\d)((?:19|20)\d{2})(0[1-9]|1[0-2])(?!\d)")
+
+
+def date_from_filename(filename):
+    """Parse the date of a raster from its file name.
+
+    Three forms are recognized, tried in this order:
+
+    - A day-of-year range YYYYDDD-YYYYDDD, as in the GRACE files
+      GRD-3_2018152-2018181_GRFO_UTCSR_BA01_0600_LND_v04.tif. The end date is returned.
+    - A compact range YYYYDDDDDD of a year, a start and an end day of year. The end date is
+      returned.
+    - A year and month YYYYMM, as in cg200301.tif. The first day of the month is returned.
+
+    Args:
+        filename (str): The file name.
+
+    Raises:
+        ValueError: If no date is found in the file name.
+
+    Returns:
+        datetime: The date of the raster.
+    """
+    stem = os.path.splitext(os.path.basename(filename))[0]
 
-                if b.icon == "map":
-                    self.add_control(basemap_ctrl)
-                if b.icon == "folder-open":
-                    self.toolbar.setup_interactive_plot()
+    match = _DAY_RANGE.search(stem)
+    if match:
+        year, day = int(match.group(3)), int(match.group(4))
+        return datetime(year, 1, 1) + timedelta(days=day - 1)
 
-        for i in range(rows):
-            for j in range(cols):
-                tool = grid[i, j]
-                tool.on_click(tool_click)
+    match = _COMPACT_DAY_RANGE.search(stem)
+    if match:
+        year, start_day, end_day = (int(group) for group in match.groups())
+        if end_day < start_day:
+            year += 1
+        return datetime(year, 1, 1) + timedelta(days=end_day - 1)
 
-        def change_basemap(change):
-            if change["new"]:
-                self.add_basemap(basemap.value)
+    match = _YEAR_MONTH.search(stem)
+    if match:
+        return datetime(int(match.group(1)), int(match.group(2)), 1)
 
-        basemap.observe(change_basemap, names='value')
-        self.add_control(toolbar_ctrl)
\ No newline at end of file
+    raise ValueError(f"Date not found in file name: {filename}")
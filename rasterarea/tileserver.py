@@ -0,0 +1,309 @@
+"""A local XYZ tile server for GeoTIFF files, used when no remote tiler is reachable."""
+
+import hashlib
+import io
+import math
+import os
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+
+WEB_MERCATOR_EXTENT = 20037508.342789244
+
+
+def tile_bounds(z, x, y):
+    """Get the bounds of an XYZ tile in Web Mercator (EPSG:3857).
+
+    Args:
+        z (int): The zoom level.
+        x (int): The tile column.
+        y (int): The tile row, counted from the top.
+
+    Returns:
+        tuple: The (left, bottom, right, top) bounds of the tile in meters.
+    """
+    size = 2 * WEB_MERCATOR_EXTENT / 2**z
+    left = -WEB_MERCATOR_EXTENT + x * size
+    top = WEB_MERCATOR_EXTENT - y * size
+    return left, top - size, left + size, top
+
+
+class TileServer:
+    """Serve PNG tiles of local GeoTIFF files over HTTP from a background thread.
+
+    Tiles are rendered from windowed, decimated reads of the source file and kept in an
+    in-memory LRU cache, so panning back over an area that was already viewed does not touch
+    the file again.
+
+    The tile URLs point to http://{host}:{port}, which only a browser on the same machine can
+    reach. When the notebook runs on a remote server, set client_prefix to the address the
+    browser reaches the server at, either a full URL such as "http://myhost:{port}" (with
+    host="0.0.0.0") or the path of a jupyter-server-proxy, such as "proxy/{port}" or
+    "user/me/proxy/{port}" on JupyterHub. "{port}" is replaced with the port of the server.
+
+    Args:
+        host (str, optional): The host to bind to. Defaults to "127.0.0.1".
+        port (int, optional): The port to bind to. Defaults to 0, a free port.
+        cache_size (int, optional): The number of rendered tiles to keep in memory. Defaults to 1024.
+        tile_size (int, optional): The width and height of the tiles in pixels. Defaults to 256.
+        client_prefix (str, optional): The URL or path prefix of the tile URLs. Defaults to the
+            RASTERAREA_TILE_CLIENT_PREFIX environment variable, else the
+            LOCALTILESERVER_CLIENT_PREFIX environment variable of localtileserver, else
+            http://{host}:{port}.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, cache_size=1024, tile_size=256, client_prefix=None):
+        if client_prefix is None:
+            client_prefix = os.environ.get("RASTERAREA_TILE_CLIENT_PREFIX") or os.environ.get("LOCALTILESERVER_CLIENT_PREFIX")
+        self.client_prefix = client_prefix
+        self.cache_size = cache_size
+        self.tile_size = tile_size
+        self.hits = 0
+        self.misses = 0
+        self._layers = {}
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server._handle(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self._httpd.daemon_threads = True
+        self.host, self.port = self._httpd.server_address[:2]
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+
+    def add(self, path, band=1, palette=None, vmin=None, vmax=None, nodata=None, overviews=False):
+        """Register a GeoTIFF file to serve.
+
+        Args:
+            path (str): The path to the GeoTIFF file.
+            band (int, optional): The band to render. Defaults to 1.
+            palette (str, optional): The name of a matplotlib colormap. Defaults to "viridis".
+            vmin (float, optional): The value mapped to the bottom of the colormap. Defaults to the
+                minimum of a preview of the band.
+            vmax (float, optional): The value mapped to the top of the colormap. Defaults to the
+                maximum of a preview of the band.
+            nodata (float, optional): The value to render transparent. Defaults to the nodata value
+                of the file.
+            overviews (bool, optional): Whether to build missing overviews as an .ovr file next to
+                the file, which speeds up the tiles of low zoom levels. Otherwise nothing is
+                written and the preview is a decimated read. Defaults to False.
+
+        Returns:
+            str: The layer id used in the tile URL.
+        """
+        from .rasterarea import get_geotiff_nodata, get_geotiff_preview
+
+        if nodata is None:
+            nodata = get_geotiff_nodata(path)
+        if vmin is None or vmax is None:
+            preview = np.ma.masked_invalid(get_geotiff_preview(path, band, max_size=512, build=overviews))
+            if nodata is not None:
+                preview = np.ma.masked_equal(preview, nodata)
+            vmin = float(preview.min()) if vmin is None else vmin
+            vmax = float(preview.max()) if vmax is None else vmax
+
+        layer = dict(path=path, band=band, palette=palette or "viridis", vmin=vmin, vmax=vmax, nodata=nodata)
+        layer_id = hashlib.sha1(repr(sorted(layer.items())).encode()).hexdigest()[:16]
+        self._layers[layer_id] = layer
+        return layer_id
+
+    def tile_url(self, layer_id):
+        """Get the XYZ URL template of a layer.
+
+        Args:
+            layer_id (str): The layer id returned by add.
+
+        Returns:
+            str: The URL template with {z}, {x} and {y} placeholders.
+        """
+        return f"{self.base_url()}/{layer_id}/{{z}}/{{x}}/{{y}}.png"
+
+    def base_url(self):
+        """Get the URL the browser reaches the server at.
+
+        Returns:
+            str: The client_prefix with its {port} filled in, as an absolute path if it has no
+                scheme, or http://{host}:{port} if client_prefix is not set.
+        """
+        if not self.client_prefix:
+            return f"http://{self.host}:{self.port}"
+        prefix = self.client_prefix.format(port=self.port).rstrip("/")
+        if "://" in prefix:
+            return prefix
+        return "/" + prefix.lstrip("/")
+
+    def bounds(self, layer_id):
+        """Get the bounds of a layer in longitude and latitude.
+
+        Args:
+            layer_id (str): The layer id returned by add.
+
+        Returns:
+            tuple: The (west, south, east, north) bounds.
+        """
+        from rasterio.warp import transform_bounds
+
+        from .rasterarea import get_geotiff_bounds, get_geotiff_crs
+
+        path = self._layers[layer_id]["path"]
+        return transform_bounds(get_geotiff_crs(path), "EPSG:4326", *get_geotiff_bounds(path))
+
+    def get_tile(self, layer_id, z, x, y):
+        """Get a PNG tile, rendering it on a cache miss.
+
+        Args:
+            layer_id (str): The layer id returned by add.
+            z (int): The zoom level.
+            x (int): The tile column.
+            y (int): The tile row.
+
+        Returns:
+            bytes: The PNG image.
+        """
+        key = (layer_id, z, x, y)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return self._cache[key]
+            self.misses += 1
+
+        tile = self.render_tile(self._layers[layer_id], z, x, y)
+        with self._lock:
+            self._cache[key] = tile
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return tile
+
+    def render_tile(self, layer, z, x, y):
+        """Render a PNG tile of a layer.
+
+        Only the window of the source that covers the tile is read, decimated to about the tile
+        size so that low zoom levels are served from the overviews of the file.
+
+        Args:
+            layer (dict): The layer settings.
+            z (int): The zoom level.
+            x (int): The tile column.
+            y (int): The tile row.
+
+        Returns:
+            bytes: The PNG image.
+        """
+        import matplotlib
+        import rasterio
+        from PIL import Image
+        from rasterio import windows
+        from rasterio.transform import from_bounds
+        from rasterio.warp import Resampling, reproject, transform_bounds
+
+        size = self.tile_size
+        tile = np.full((size, size), np.nan, dtype=np.float32)
+        bounds = tile_bounds(z, x, y)
+
+        with rasterio.open(layer["path"]) as src:
+            src_bounds = transform_bounds("EPSG:3857", src.crs, *bounds)
+            full = windows.Window(0, 0, src.width, src.height)
+            try:
+                (row_start, row_stop), (col_start, col_stop) = windows.from_bounds(
+                    *src_bounds, transform=src.transform
+                ).toranges()
+                window = windows.Window.from_slices(
+                    (math.floor(row_start), math.ceil(row_stop)),
+                    (math.floor(col_start), math.ceil(col_stop)),
+                ).intersection(full)
+            except (rasterio.errors.WindowError, ValueError):
+                window = None
+
+            if window is not None and window.width >= 1 and window.height >= 1:
+                out_shape = (min(int(window.height), 2 * size), min(int(window.width), 2 * size))
+                data = src.read(layer["band"], window=window, out_shape=out_shape, masked=True)
+                data = data.astype(np.float32).filled(np.nan)
+                if layer["nodata"] is not None:
+                    data[data == layer["nodata"]] = np.nan
+                src_transform = windows.transform(window, src.transform) * rasterio.Affine.scale(
+                    window.width / out_shape[1], window.height / out_shape[0]
+                )
+                reproject(
+                    data,
+                    tile,
+                    src_transform=src_transform,
+                    src_crs=src.crs,
+                    src_nodata=np.nan,
+                    dst_transform=from_bounds(*bounds, size, size),
+                    dst_crs="EPSG:3857",
+                    dst_nodata=np.nan,
+                    resampling=Resampling.nearest,
+                )
+
+        vmin, vmax = layer["vmin"], layer["vmax"]
+        scaled = (tile - vmin) / (vmax - vmin) if vmax > vmin else np.zeros_like(tile)
+        rgba = matplotlib.colormaps[layer["palette"]](np.clip(scaled, 0, 1), bytes=True)
+        rgba[np.isnan(tile), 3] = 0
+
+        buffer = io.BytesIO()
+        Image.fromarray(rgba, "RGBA").save(buffer, format="PNG")
+        return buffer.getvalue()
+
+    def cache_info(self):
+        """Get the hit and miss counters of the tile cache.
+
+        Returns:
+            dict: The number of hits, misses and cached tiles.
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._cache)}
+
+    def shutdown(self):
+        """Stop serving tiles."""
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def _handle(self, request):
+        """Answer a /{layer_id}/{z}/{x}/{y}.png request."""
+        parts = request.path.split("?")[0].strip("/").split("/")
+        try:
+            if len(parts) != 4 or parts[0] not in self._layers:
+                raise ValueError
+            layer_id, z, x, y = parts[0], int(parts[1]), int(parts[2]), int(parts[3].split(".")[0])
+        except ValueError:
+            request.send_error(404)
+            return
+
+        try:
+            body = self.get_tile(layer_id, z, x, y)
+        except Exception as e:
+            request.send_error(500, str(e))
+            return
+        request.send_response(200)
+        request.send_header("Content-Type", "image/png")
+        request.send_header("Content-Length", str(len(body)))
+        request.send_header("Cache-Control", "max-age=3600")
+        request.end_headers()
+        request.wfile.write(body)
+
+
+_tile_server = None
+
+
+def get_tile_server():
+    """Get the tile server shared by the maps of this process, starting it on first use.
+
+    Returns:
+        TileServer: The shared tile server.
+    """
+    global _tile_server
+    if _tile_server is None:
+        _tile_server = TileServer()
+    return _tile_server
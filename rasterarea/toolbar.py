@@ -0,0 +1,455 @@
+"""Interactive widgets and the geemap map for exploring raster time series."""
+import os
+from datetime import datetime
+
+import geemap
+import ipywidgets as widgets
+import matplotlib.dates as mdates
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+import traitlets
+from IPython.display import display
+from ipyleaflet import Marker, WidgetControl
+from matplotlib.colors import TwoSlopeNorm
+
+from .instrument import span
+from .rasterarea import _read_pixel, date_from_filename, get_geotiff_preview
+
+
+class SelectFilesButton(widgets.Button):
+    """A file widget that leverages tkinter.filedialog."""
+
+    def __init__(self):
+        super(SelectFilesButton, self).__init__()
+        # Add the selected_files trait
+        self.add_traits(files=traitlets.traitlets.List())
+        # Create the button.
+        self.description = "Select Files"
+        self.icon = "square-o"
+        # Set on click behavior.
+        self.on_click(self.select_files)
+
+    @staticmethod
+    def select_files(b):
+        """Generate instance of tkinter.filedialog.
+
+        Parameters
+        ----------
+        b : obj:
+            An instance of ipywidgets.widgets.Button 
+        """
+        from tkinter import Tk, filedialog
+
+        # Create Tk root
+        root = Tk()
+        # Hide the main window
+        root.withdraw()
+        # Raise the root to the top of all windows.
+        root.call('wm', 'attributes', '.', '-topmost', True)
+        # List of selected fileswill be set to b.value
+        b.files = filedialog.askopenfilename(multiple=True)
+
+        b.description = "Files Selected"
+        b.icon = "check-square-o"
+        b.style.button_color = "lightgreen"
+
+
+class Toolbar(widgets.VBox):
+    """
+    create a widget for interactive plot
+        
+    """    
+    def __init__(self,parent,**kwargs):
+        super().__init__()
+        self.create_widgets()
+        self.output = widgets.Output()
+        self.setup_interactive_plot()   
+        self.parent = parent
+
+        # Observe the changes in the fileuploader.files and call open_file
+        self.fileuploader.observe(self.open_file, names='files')
+        self.layerselector.observe(self.plot, 'value')  
+    
+    padding = "0px 0px 0px 5px"
+    preview_size = 1024  # largest side of the preview image in pixels
+    ## create buttons
+    def create_widgets(self):
+        self.fileuploader = SelectFilesButton()
+        self.add_button = widgets.Button(description="Add")
+        self.add_button.on_click(self.add)
+        self.layerselector = widgets.Dropdown(
+            options=["No file uploaded"],
+            value=None,
+            description="Layer:"
+        )
+        self.pick_button = widgets.Button(description="Pick", layout=widgets.Layout(padding="0px 0px 0px 5px"))  # Create a pick_button
+        self.pick_button.on_click(self.pick_location)  # Add an event listener for the pick_button
+        self.plot_button = widgets.Button(description="Plot", layout=widgets.Layout(padding="0px 0px 0px 5px"))  # Create a plot_button
+        self.plot_button.on_click(self.plot_time_series)  # Add an event listener for the plot_button
+        self.marker = None
+        self.start_date_picker = widgets.DatePicker(description='Start Date', value=datetime(2018, 1, 1))
+        self.end_date_picker = widgets.DatePicker(description='End Date', value=datetime(2018, 12, 31))
+        self.time_resolution_dropdown = widgets.Dropdown(options=['Daily', 'Monthly', 'Yearly'], description='Resolution')
+        self.save_button = widgets.Button(description="Save", layout=widgets.Layout(padding="0px 0px 0px 5px"))  # Create a save_button
+        self.save_button.on_click(self.save_plot)  
+        self.children = [self.fileuploader,
+                        self.pick_button,
+                        self.plot_button,
+                        self.start_date_picker,
+                        self.end_date_picker,
+                        self.time_resolution_dropdown,
+                        self.save_button]  # Add the plot_button to the children list
+        self.fig = None 
+
+    ## define toolbar layout
+    def setup_interactive_plot(self):
+        left_box = widgets.VBox([
+            self.fileuploader,
+            self.layerselector,
+            self.add_button,
+            self.pick_button,
+            self.start_date_picker,
+            self.end_date_picker,
+            self.time_resolution_dropdown,
+            self.plot_button,
+            self.save_button
+        ])
+
+        toolbar = widgets.HBox([left_box, self.output])
+        display(toolbar)
+    ## define open file event
+    def open_file(self, change):
+        self.ds_list = self.fileuploader.files
+        self.update_dropdown()
+
+    def update_dropdown(self):
+        if len(self.ds_list) > 0:
+            file_names = [os.path.basename(file_path) for file_path in self.ds_list]
+            self.layerselector.options = file_names
+            self.layerselector.value = file_names[0]
+        else:
+            self.layerselector.options = ["No file uploaded"]
+            self.layerselector.value = None
+
+    def read_and_plot_file(self, file_path):
+        with self.output, span("read_and_plot_file"):
+            self.output.clear_output()
+            if file_path.endswith(".tif"):
+                with span("add_raster"):
+                    self.parent.add_raster(source=file_path, bands=1, layer_name='GRACE', palette='Accent', vmin=None, vmax=None, nodata=-99999, attribute=None)
+                data = get_geotiff_preview(file_path, max_size=self.preview_size)
+            else:
+                print("File type not supported")
+                return
+        
+            nodata = -99999
+            with span("mask"):
+                data = np.ma.masked_equal(data, nodata, copy=False) # Mask nodata values
+
+        # Setting up the color scale
+            with span("render"):
+                cmap = plt.cm.RdBu
+                cmap.set_bad(color='white')
+                norm = TwoSlopeNorm(vmin=-1, vcenter=0, vmax=1)
+
+                plt.imshow(data, cmap=cmap, norm=norm) # Plot the image with the new color scale
+                plt.colorbar()
+                plt.show()
+            print(self.output.outputs)
+    
+    def plot(self, change):
+        if change['name'] == 'value':
+            selected_file_name = self.layerselector.value
+            selected_file_index = self.layerselector.options.index(selected_file_name)
+            selected_file_path = self.fileuploader.files[selected_file_index]
+            self.read_and_plot_file(selected_file_path)
+
+    def add(self, event=None):
+        self.read_and_plot_file(file_path = self.fileuploader.files[0])
+
+    def pick_location(self, button):
+        if not self.parent.on_interaction(self.handle_click):  # Add a click event handler to the parent (Map)
+            self.parent.on_interaction(self.handle_click)
+
+    def handle_click(self, **kwargs):
+        if kwargs.get('type') == 'click':  # Check if the event is a click event
+            lat_lng = kwargs.get('coordinates')
+            if lat_lng:
+                if self.marker:  # If a marker already exists, remove it before adding a new one
+                    self.parent.remove_layer(self.marker)
+
+                self.marker = Marker(location=lat_lng, draggable=False)  # Create a marker at the clicked location
+                self.parent.add_layer(self.marker)  # Add the marker to the map
+                print(f'Clicked coordinates: {lat_lng}')  # Print the real-world coordinates
+
+    @staticmethod
+    def date_from_filename(filename):
+        return date_from_filename(filename)
+
+    def get_tiff_dates(self, file_list):
+        dates = []
+        for file_path in file_list:
+            file_name = os.path.basename(file_path)
+            date_obj = self.date_from_filename(file_name)
+            dates.append(date_obj)
+        return dates
+
+    def get_pixel_values(self, file_list, lat_lng, max_workers=8):
+        from concurrent.futures import ThreadPoolExecutor
+
+        lat, lng = lat_lng
+        with span("get_pixel_values", pixels=len(file_list)):
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                values = list(executor.map(lambda file_path: _read_pixel(file_path, lat, lng), file_list))
+        return values
+    
+    @staticmethod
+    def check_dates(dates, start_date, end_date):
+        """Check that some files fall into the selected date range.
+
+        Args:
+            dates (pandas.DatetimeIndex): The dates of the files.
+            start_date (date): The first date of the range.
+            end_date (date): The last date of the range.
+
+        Returns:
+            str: An error message, or an empty string if the range can be plotted.
+        """
+        if start_date is None or end_date is None or start_date > end_date:
+            return "Error: select a start date before the end date."
+        in_range = (dates >= pd.Timestamp(start_date)) & (dates <= pd.Timestamp(end_date))
+        if not in_range.any():
+            return f"Error: none of the {len(dates)} files is dated between {start_date} and {end_date}."
+        return ""
+
+    def plot_time_series(self, button):
+        if not hasattr(self, 'marker') or self.marker is None:
+            return
+
+        with span("plot_time_series"):
+            lat_lng = self.marker.location
+            start_date = self.start_date_picker.value
+            end_date = self.end_date_picker.value
+            time_resolution = self.time_resolution_dropdown.value
+
+            files = list(self.fileuploader.files)
+            try:
+                dates = pd.DatetimeIndex(self.get_tiff_dates(files))
+            except ValueError as e:
+                print(f"Error: {e}")
+                return
+            error_message = self.check_dates(dates, start_date, end_date)
+            if error_message:
+                print(error_message)
+                return
+
+            # Only the files in the selected range are read
+            in_range = (dates >= pd.Timestamp(start_date)) & (dates <= pd.Timestamp(end_date))
+            files = [file_path for file_path, keep in zip(files, in_range) if keep]
+            dates = dates[in_range]
+            values = self.get_pixel_values(files, lat_lng)
+
+            if time_resolution == 'Daily':
+                rule = 'D'
+                x_axis_format = mdates.DayLocator()
+                x_axis_date_format = mdates.DateFormatter('%Y-%m-%d')
+            elif time_resolution == 'Monthly':
+                rule = 'MS'
+                x_axis_format = mdates.MonthLocator()
+                x_axis_date_format = mdates.DateFormatter('%Y-%m')
+            elif time_resolution == 'Yearly':
+                rule = 'YS'
+                x_axis_format = mdates.YearLocator()
+                x_axis_date_format = mdates.DateFormatter('%Y')
+
+            # Align the values on the real file dates and aggregate them to the chosen resolution
+            with span("resample"):
+                series = pd.Series(values, index=dates, dtype='float64').sort_index()
+                series = series.resample(rule).mean()
+            with self.output, span("render"):
+                self.output.clear_output() 
+                self.fig, ax = plt.subplots()
+                ax.plot(series.index, series.values)
+                ax.xaxis.set_major_locator(x_axis_format)
+                ax.xaxis.set_major_formatter(x_axis_date_format)
+                plt.xticks(rotation=45)
+                plt.show()
+            
+    def save_plot(self, button):
+        with self.output:
+            if self.fig:  # Check if there is a figure to save
+                self.fig.savefig('plot.png')  # Save the figure to a file named 'plot.png'
+                print('Plot saved as plot.png')  # Print a message to indicate the plot has been saved
+            else:
+                print('No plot to save')  # Print a message if there is no plot to save
+
+class Map(geemap.Map):
+    
+    def __init__(self, center=[20, 0], zoom=2, **kwargs) -> None:
+
+        if "scroll_wheel_zoom" not in kwargs:
+            kwargs["scroll_wheel_zoom"] = True
+
+        super().__init__(center=center, zoom=zoom, **kwargs)
+        self.toolbar = Toolbar(parent=self)
+
+    
+    def add_basemap(self, basemap, **kwargs):
+
+        import xyzservices.providers as xyz
+
+        if basemap.lower() == "roadmap":
+            url = 'http://mt0.google.com/vt/lyrs=m&hl=en&x={x}&y={y}&z={z}'
+            self.add_tile_layer(url, name=basemap, **kwargs)
+        elif basemap.lower() == "satellite":
+            url = 'http://mt0.google.com/vt/lyrs=y&hl=en&x={x}&y={y}&z={z}'
+            self.add_tile_layer(url, name=basemap, **kwargs)
+        else:
+            try:
+                basemap = eval(f"xyz.{basemap}")
+                url = basemap.build_url()
+                attribution = basemap.attribution
+                self.add_tile_layer(url, name=basemap.name, attribution=attribution, **kwargs)
+            except:
+                raise ValueError(f"Basemap '{basemap}' not found.")
+
+    def add_raster(
+        self,
+        source,
+        bands=1,
+        layer_name=None,
+        palette=None,
+        vmin=None,
+        vmax=None,
+        nodata=None,
+        attribute=None
+    ):
+        """Add a local raster dataset to the map.
+
+            If you are using this function in JupyterHub on a remote server and the raster does not render properly, try
+            running the following two lines before calling this function:
+
+            import os
+            os.environ['LOCALTILESERVER_CLIENT_PREFIX'] = 'proxy/{port}'
+
+        Args:
+            source (str): The path to the GeoTIFF file or the URL of the Cloud Optimized GeoTIFF.
+            band (int, optional): The band to use. Band indexing starts at 1. Defaults to None.
+            palette (str, optional): The name of the color palette from `palettable` to use when plotting a single band. See https://jiffyclub.github.io/palettable. Default is greyscale
+            vmin (float, optional): The minimum value to use when colormapping the palette when plotting a single band. Defaults to None.
+            vmax (float, optional): The maximum value to use when colormapping the palette when plotting a single band. Defaults to None.
+            nodata (float, optional): The value from the band to use to interpret as not valid data. Defaults to None.
+            attribution (str, optional): Attribution for the source raster. This defaults to a message about it being a local file.. Defaults to None.
+            layer_name (str, optional): The layer name to use. Defaults to None.
+        """
+        super().add_raster(source=source, bands=bands, layer_name=layer_name, palette=palette, vmin=vmin, vmax=vmax, nodata=nodata, attribute=attribute)
+
+ 
+    def add_toolbar(self, position='topright', **kwargs):
+        """Adds a toolbar to the map.
+
+        Args:
+            toolbar (str, optional): The toolbar to add. Defaults to 'draw'.
+            position (str, optional): The position of the toolbar. Defaults to 'topright'.
+        """
+        widget_width = "250px"
+        padding = "0px 0px 0px 5px"  # upper, right, bottom, left
+
+        toolbar_button = widgets.ToggleButton(
+            value=False,
+            tooltip="Toolbar",
+            icon="wrench",
+            layout=widgets.Layout(width="28px", height="28px", padding=padding),
+        )
+
+        close_button = widgets.ToggleButton(
+            value=False,
+            tooltip="Close the tool",
+            icon="times",
+            button_style="primary",
+            layout=widgets.Layout(height="28px", width="28px", padding=padding),
+        )
+        toolbar = widgets.HBox([toolbar_button])
+
+        def toolbar_click(change):
+            if change["new"]:
+                toolbar.children = [toolbar_button, close_button]
+            else:
+                toolbar.children = [toolbar_button]
+        
+        toolbar_button.observe(toolbar_click, "value")
+
+        def close_click(change):
+            if change["new"]:
+                toolbar_button.close()
+                close_button.close()
+                toolbar.close()
+        
+        close_button.observe(close_click, "value")
+        rows = 2
+        cols = 2
+        grid = widgets.GridspecLayout(rows, cols, grid_gap="0px", layout=widgets.Layout(width="65px"))
+        icons = ["folder-open", "map", "info", "question"]
+
+        for i in range(rows):
+            for j in range(cols):
+                grid[i, j] = widgets.Button(description="", button_style="primary", icon=icons[i*rows+j], 
+                                            layout=widgets.Layout(width="28px", padding="0px"))
+        toolbar = widgets.VBox([toolbar_button])
+        def toolbar_click(change):
+            if change["new"]:
+                toolbar.children = [widgets.HBox([close_button, toolbar_button]), grid]
+            else:
+                toolbar.children = [toolbar_button]
+        
+        toolbar_button.observe(toolbar_click, "value")
+
+        toolbar_ctrl = WidgetControl(widget=toolbar, position=position)
+
+        output = widgets.Output()
+        output_ctrl = WidgetControl(widget=output, position="bottomright")
+        def tool_click(b):    
+            with output:
+                output.clear_output()
+                print(f"You clicked the {b.icon} button")
+
+        for i in range(rows):
+            for j in range(cols):
+                tool = grid[i, j]
+                tool.on_click(tool_click)
+
+        with output:
+            output.clear_output()
+            print("Click on a button to see the output")
+
+        basemap = widgets.Dropdown(
+            options=["roadmap", "satellite"],
+            value=None,
+            description="Basemap:",
+            style={"description_width": "initial"},
+            layout=widgets.Layout(width="200px"),
+        )
+        basemap_ctrl = WidgetControl(widget=basemap, position="topright")
+
+        def tool_click(b):    
+            with output:
+                output.clear_output()
+                print(f"You clicked the {b.icon} button")
+
+                if b.icon == "map":
+                    self.add_control(basemap_ctrl)
+                if b.icon == "folder-open":
+                    self.toolbar.setup_interactive_plot()
+
+        for i in range(rows):
+            for j in range(cols):
+                tool = grid[i, j]
+                tool.on_click(tool_click)
+
+        def change_basemap(change):
+            if change["new"]:
+                self.add_basemap(basemap.value)
+
+        basemap.observe(change_basemap, names='value')
+        self.add_control(toolbar_ctrl)
\ No newline at end of file
@@ -0,0 +1,125 @@
+"""Zoom-aware simplification of large vector layers for the map backends."""
+
+import math
+
+import numpy as np
+
+
+OPTIMIZE_THRESHOLD = 100000
+
+
+def zoom_tolerance(zoom, tile_size=256):
+    """Get the size of a screen pixel in degrees at a zoom level.
+
+    Args:
+        zoom (float): The zoom level.
+        tile_size (int, optional): The tile size in pixels. Defaults to 256.
+
+    Returns:
+        float: The width of one pixel at the equator in degrees.
+    """
+    return 360 / (tile_size * 2**zoom)
+
+
+def count_coordinates(gdf):
+    """Get the total number of coordinates of a GeoDataFrame.
+
+    Args:
+        gdf (geopandas.GeoDataFrame): The vector layer.
+
+    Returns:
+        int: The number of coordinates.
+    """
+    import shapely
+
+    return int(shapely.get_num_coordinates(gdf.geometry.values).sum())
+
+
+def simplify(geometry, tolerance):
+    """Simplify geometries, keeping the borders shared by adjacent polygons.
+
+    A polygonal coverage, polygons that meet without overlapping such as administrative
+    boundaries, is simplified as a whole with shapely.coverage_simplify (shapely 2.1 and GEOS
+    3.12 or later), so that the polygons still share their borders without gaps or overlaps.
+    Other layers, or any layer with older versions of shapely, are simplified one geometry at a
+    time: each geometry stays valid, but a border shared by two polygons may be simplified
+    differently on each side.
+
+    Args:
+        geometry (numpy.ndarray): The geometries.
+        tolerance (float): The simplification tolerance in the units of the coordinates.
+
+    Returns:
+        numpy.ndarray: The simplified geometries.
+    """
+    import shapely
+
+    if hasattr(shapely, "coverage_simplify") and len(geometry) > 0:
+        polygonal = np.isin(shapely.get_type_id(geometry), [3, 6]).all()
+        if polygonal and shapely.coverage_is_valid(geometry):
+            return shapely.coverage_simplify(geometry, tolerance)
+    return shapely.simplify(geometry, tolerance, preserve_topology=True)
+
+
+class SimplifiedLayer:
+    """A vector layer with precomputed simplified geometries for a few zoom levels.
+
+    The geometries of each level are simplified with a tolerance of one screen pixel at that zoom
+    (see simplify for when shared borders are kept), and their coordinates are rounded to the
+    precision that can be seen at that zoom. A spatial index picks the features in view.
+
+    Args:
+        gdf (geopandas.GeoDataFrame): The vector layer.
+        zoom_levels (list, optional): The zoom levels to precompute. Defaults to [2, 5, 8, 11, 14].
+    """
+
+    def __init__(self, gdf, zoom_levels=None):
+        import shapely
+
+        if gdf.crs is not None and not gdf.crs.equals("EPSG:4326"):
+            gdf = gdf.to_crs("EPSG:4326")
+        self.gdf = gdf
+        self.zoom_levels = sorted(zoom_levels or [2, 5, 8, 11, 14])
+        self.levels = {}
+        for zoom in self.zoom_levels:
+            tolerance = zoom_tolerance(zoom)
+            decimals = max(0, math.ceil(-math.log10(tolerance)) + 1)
+            geometry = simplify(np.asarray(gdf.geometry.values), tolerance)
+            self.levels[zoom] = shapely.transform(geometry, lambda coords: np.round(coords, decimals))
+
+    def level(self, zoom):
+        """Get the precomputed zoom level used to display a zoom.
+
+        Args:
+            zoom (float): The zoom level of the map.
+
+        Returns:
+            int: The smallest precomputed level at least as detailed as zoom, or the most detailed.
+        """
+        for level in self.zoom_levels:
+            if level >= zoom:
+                return level
+        return self.zoom_levels[-1]
+
+    def to_geojson(self, zoom, bounds=None):
+        """Get the features in view at a zoom level as GeoJSON.
+
+        Args:
+            zoom (float): The zoom level of the map.
+            bounds (tuple, optional): The (west, south, east, north) bounds of the view. Defaults to
+                None, all features.
+
+        Returns:
+            dict: The GeoJSON FeatureCollection.
+        """
+        import geopandas as gpd
+        import shapely
+
+        geometry = self.levels[self.level(zoom)]
+        if bounds is None:
+            index = np.arange(len(self.gdf))
+        else:
+            index = np.sort(self.gdf.sindex.query(shapely.box(*bounds)))
+        subset = self.gdf.iloc[index].copy()
+        subset[self.gdf.geometry.name] = gpd.GeoSeries(geometry[index], index=subset.index, crs=self.gdf.crs)
+        return subset.__geo_interface__
@@ -39,6 +39,11 @@ setup(
         'Programming Language :: Python :: 3.9',
         'Programming Language :: Python :: 3.10',
     ],
+    entry_points={
+        'console_scripts': [
+            'rasterarea=rasterarea.cli:main',
+        ],
+    },
     description="This package provides a more accurate way to claculate the area of rasters.",
     install_requires=install_requires,
     dependency_links=dependency_links,
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+
+"""Tests for the `rasterarea.catalog` module."""
+
+
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from rasterarea.catalog import RasterCatalog
+from tests.test_rasterarea import SAMPLE_DIR, write_geotiff
+
+
+class TestRasterCatalog(unittest.TestCase):
+    """Tests for `RasterCatalog`."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        from affine import Affine
+
+        self.tmpdir = tempfile.TemporaryDirectory()
+        data = np.zeros((10, 10), dtype="float32")
+        self.paths = []
+        for month, west in [(1, 0.0), (2, 50.0), (3, 0.0)]:
+            day = month * 30
+            path = os.path.join(self.tmpdir.name, f"GRD-3_2018{day:03d}-2018{day:03d}_GRFO_UTCSR_BA01_0600_LND_v04.tif")
+            write_geotiff(path, data, transform=Affine(1.0, 0.0, west, 0.0, -1.0, 10.0), tiled=False)
+            self.paths.append(path)
+        self.catalog = RasterCatalog(os.path.join(self.tmpdir.name, "catalog.db"))
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+        self.catalog.close()
+        self.tmpdir.cleanup()
+
+    def test_scan_and_query(self):
+        """Test date-range and bounding box queries."""
+        counts = self.catalog.scan(self.tmpdir.name)
+        self.assertEqual(counts, {"added": 3, "updated": 0, "unchanged": 0, "removed": 0, "failed": 0, "undated": 0})
+        self.assertEqual(self.catalog.query(), self.paths)
+        self.assertEqual(self.catalog.query(start="2018-02-01", end="2018-03-01"), self.paths[1:2])
+        self.assertEqual(self.catalog.query(bbox=(-5, -5, 5, 5)), [self.paths[0], self.paths[2]])
+        self.assertEqual(self.catalog.query(crs="EPSG:4326", bbox=(55, 5, 56, 6)), self.paths[1:2])
+
+    def test_incremental_rescan(self):
+        """Test that rescans only pick up changed, new and deleted files."""
+        self.catalog.scan(self.tmpdir.name)
+        time.sleep(0.01)
+        write_geotiff(self.paths[0], np.ones((20, 10), dtype="float32"), tiled=False)
+        os.remove(self.paths[1])
+        counts = self.catalog.scan(self.tmpdir.name)
+        self.assertEqual(counts, {"added": 0, "updated": 1, "unchanged": 1, "removed": 1, "failed": 0, "undated": 0})
+        self.assertEqual(len(self.catalog), 2)
+
+        reopened = RasterCatalog(self.catalog.db_path)
+        self.assertEqual(reopened.query(), [self.paths[0], self.paths[2]])
+        reopened.close()
+
+    def test_narrower_rescan(self):
+        """Test that a narrower rescan keeps the files indexed by a wider one."""
+        subdir = os.path.join(self.tmpdir.name, "2019")
+        os.makedirs(subdir)
+        nested = write_geotiff(os.path.join(subdir, "cg201901.tif"), np.zeros((10, 10), dtype="float32"))
+        self.assertEqual(self.catalog.scan(self.tmpdir.name)["added"], 4)
+
+        counts = self.catalog.scan(self.tmpdir.name, recursive=False)
+        self.assertEqual((counts["unchanged"], counts["removed"]), (3, 0))
+        counts = self.catalog.scan(self.tmpdir.name, pattern="cg*.tif")
+        self.assertEqual((counts["unchanged"], counts["removed"]), (1, 0))
+        self.assertEqual(len(self.catalog), 4)
+
+        os.remove(nested)
+        self.assertEqual(self.catalog.scan(self.tmpdir.name, recursive=False)["removed"], 1)
+        self.assertEqual(self.catalog.query(), self.paths)
+
+    def test_sample_data(self):
+        """Test date-range queries on the sample GRACE files."""
+        with RasterCatalog() as catalog:
+            counts = catalog.scan(SAMPLE_DIR)
+            self.assertEqual((counts["added"], counts["failed"], counts["undated"]), (14, 0, 0))
+            self.assertEqual(len(catalog.query(start="2003-01-01", end="2019-01-01")), 14)
+            self.assertEqual(len(catalog.query(start="2018-01-01")), 3)
+            self.assertEqual(
+                [os.path.basename(path) for path in catalog.query(start="2003-03-01", end="2003-04-30")],
+                ["cg200303.tif", "cg200304.tif"],
+            )
+
+    def test_unreadable_file(self):
+        """Test that an unreadable file is recorded and does not stop the scan."""
+        broken = os.path.join(self.tmpdir.name, "broken.tif")
+        with open(broken, "w") as f:
+            f.write("not a tiff")
+        counts = self.catalog.scan(self.tmpdir.name)
+        self.assertEqual((counts["added"], counts["failed"]), (3, 1))
+        self.assertEqual(list(self.catalog.errors()), [broken])
+        self.assertEqual(len(self.catalog), 3)
+
+        os.remove(broken)
+        self.catalog.scan(self.tmpdir.name)
+        self.assertEqual(self.catalog.errors(), {})
+
+    def test_batched_commits(self):
+        """Test that an interrupted scan keeps the batches committed before the interruption."""
+        stop_at = sorted(self.paths)[-1]
+
+        class InterruptedCatalog(RasterCatalog):
+            def _record(self, path, stat):
+                if path == stop_at:
+                    raise KeyboardInterrupt
+                return super()._record(path, stat)
+
+        db_path = os.path.join(self.tmpdir.name, "interrupted.db")
+        catalog = InterruptedCatalog(db_path)
+        with mock.patch("glob.glob", return_value=sorted(self.paths)), self.assertRaises(KeyboardInterrupt):
+            catalog.scan(self.tmpdir.name, batch_size=1)
+        catalog.close()
+        with RasterCatalog(db_path) as reopened:
+            self.assertEqual(len(reopened), 2)
@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+
+"""Tests for the `rasterarea.cli` module."""
+
+
+import contextlib
+import csv
+import io
+import json
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from rasterarea import cli
+from rasterarea.rasterarea import class_area, threshold_area, total_area
+from tests.test_rasterarea import write_geotiff
+
+
+class TestCli(unittest.TestCase):
+    """Tests for the `rasterarea` command."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.dir = os.path.join(self.tmpdir.name, "rasters")
+        os.makedirs(os.path.join(self.dir, "2018"))
+        rng = np.random.default_rng(0)
+        self.paths = []
+        for name in ["a.tif", "b.tif", os.path.join("2018", "c.tif")]:
+            data = rng.integers(0, 3, size=(32, 32)).astype("int16")
+            self.paths.append(write_geotiff(os.path.join(self.dir, name), data))
+        self.paths.sort()
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+        self.tmpdir.cleanup()
+
+    def run_cli(self, *args):
+        stderr = io.StringIO()
+        with contextlib.redirect_stderr(stderr):
+            status = cli.main(list(args))
+        return status, stderr.getvalue()
+
+    def read_csv(self, path):
+        with open(path, newline="") as f:
+            return list(csv.DictReader(f))
+
+    def test_expand_inputs(self):
+        """Test that directories, globs and files are expanded without duplicates."""
+        paths = cli.expand_inputs([self.dir, os.path.join(self.dir, "*.tif"), self.paths[0]])
+        self.assertEqual(paths, self.paths)
+
+    def test_total_csv_and_resume(self):
+        """Test the total mode and that a second run only processes new files."""
+        output = os.path.join(self.tmpdir.name, "areas.csv")
+        status, _ = self.run_cli(self.paths[0], "-o", output, "-w", "1")
+        self.assertEqual(status, 0)
+
+        missing = os.path.join(self.dir, "missing.tif")
+        status, message = self.run_cli(self.dir, missing, "-o", output, "-w", "2")
+        self.assertEqual(status, 1)
+        self.assertIn("3 processed, 1 skipped, 1 failed", message)
+
+        rows = self.read_csv(output)
+        self.assertEqual(sorted(row["path"] for row in rows), sorted(self.paths + [missing]))
+        for row in rows:
+            if row["path"] == missing:
+                self.assertIn("Error", row["error"])
+            else:
+                self.assertAlmostEqual(float(row["area"]), total_area(row["path"]), delta=1)
+
+    def test_failed_files_are_retried(self):
+        """Test that a file that failed is computed again once it can be read."""
+        output = os.path.join(self.tmpdir.name, "areas.csv")
+        late = os.path.join(self.dir, "late.tif")
+        status, message = self.run_cli(late, "-o", output, "-w", "1")
+        self.assertEqual(status, 1)
+        write_geotiff(late, np.ones((8, 8), dtype="int16"))
+        status, message = self.run_cli(late, "-o", output, "-w", "1")
+        self.assertEqual(status, 0)
+        self.assertIn("1 processed, 0 skipped, 0 failed", message)
+        status, message = self.run_cli(late, "-o", output, "-w", "1")
+        self.assertIn("0 processed, 1 skipped", message)
+
+    def test_class_rows_cut_short(self):
+        """Test that the rows of a file cut short are replaced by those of a new run."""
+        output = os.path.join(self.tmpdir.name, "areas.csv")
+        self.run_cli(self.paths[0], self.paths[1], "-o", output, "-m", "class", "-w", "1")
+        with open(output) as f:
+            content = f.read()
+        for cut in (content.rindex(","), content.rindex(self.paths[1]) + 5):
+            with open(output, "w") as f:
+                f.write(content[:cut])
+            status, message = self.run_cli(self.paths[0], self.paths[1], "-o", output, "-m", "class", "-w", "1")
+            self.assertEqual(status, 0)
+            self.assertIn("1 processed, 1 skipped", message)
+            rows = self.read_csv(output)
+            pairs = [(row["path"], row["class"]) for row in rows]
+            self.assertEqual(len(pairs), len(set(pairs)))
+            self.assertEqual(sorted(pairs), sorted((path, str(value)) for path in self.paths[:2] for value in range(3)))
+            self.assertTrue(all(row["error"] == "" for row in rows))
+
+    def test_total_row_cut_short(self):
+        """Test that a total row cut inside its area is computed again."""
+        output = os.path.join(self.tmpdir.name, "areas.csv")
+        self.run_cli(self.paths[0], self.paths[1], "-o", output, "-w", "1")
+        with open(output) as f:
+            content = f.read()
+        with open(output, "w") as f:
+            f.write(content[:content.rindex(",") - 4])
+        status, message = self.run_cli(self.paths[0], self.paths[1], "-o", output, "-w", "1")
+        self.assertIn("1 processed, 1 skipped", message)
+        rows = self.read_csv(output)
+        self.assertEqual(sorted(row["path"] for row in rows), self.paths[:2])
+        for row in rows:
+            self.assertAlmostEqual(float(row["area"]), total_area(row["path"]), delta=1)
+
+    def test_output_of_another_mode(self):
+        """Test that resuming into an output of another mode or format is rejected."""
+        output = os.path.join(self.tmpdir.name, "areas.csv")
+        self.run_cli(self.paths[0], "-o", output, "-w", "1")
+        for args in (["-m", "class"], ["-f", "jsonl"]):
+            with self.assertRaises(SystemExit), contextlib.redirect_stderr(io.StringIO()):
+                cli.main([self.paths[1], "-o", output, "-w", "1"] + args)
+        status, _ = self.run_cli(self.paths[1], "-o", output, "-m", "class", "-w", "1", "--no-resume")
+        self.assertEqual(status, 0)
+        self.assertEqual(list(self.read_csv(output)[0]), ["path", "class", "area", "error"])
+
+        output = os.path.join(self.tmpdir.name, "areas.jsonl")
+        self.run_cli(self.paths[0], "-o", output, "-w", "1")
+        with self.assertRaises(SystemExit), contextlib.redirect_stderr(io.StringIO()):
+            cli.main([self.paths[1], "-o", output, "-m", "class", "-w", "1"])
+
+    def test_class_jsonl(self):
+        """Test the class mode with JSON lines output."""
+        output = os.path.join(self.tmpdir.name, "areas.jsonl")
+        status, _ = self.run_cli(self.dir, "-o", output, "--mode", "class", "-e", "GRS80", "-w", "1")
+        self.assertEqual(status, 0)
+        with open(output) as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual(sorted(record["path"] for record in records), self.paths)
+        expected = class_area(records[0]["path"], coordinatesp="GRS80")
+        self.assertEqual(records[0]["area"], {str(value): area for value, area in expected.items()})
+
+    def test_threshold_and_interrupted_output(self):
+        """Test the threshold mode and resuming from an output cut off mid-line."""
+        output = os.path.join(self.tmpdir.name, "areas.csv")
+        with open(output, "w") as f:
+            f.write(f"path,area,error\n{self.paths[0]},1.0,\n{self.paths[1][:-3]}")
+        status, message = self.run_cli(self.dir, "-o", output, "-m", "threshold", "-t", "1", "-w", "1")
+        self.assertEqual(status, 0)
+        self.assertIn("2 processed, 1 skipped", message)
+        rows = {row["path"]: row for row in self.read_csv(output)}
+        self.assertAlmostEqual(float(rows[self.paths[2]]["area"]), threshold_area(self.paths[2], 1), delta=1)
+
+    def test_threshold_required(self):
+        """Test that the threshold mode requires a threshold."""
+        with self.assertRaises(SystemExit), contextlib.redirect_stderr(io.StringIO()):
+            cli.main([self.dir, "--mode", "threshold"])
+
+
+if __name__ == "__main__":
+    unittest.main()
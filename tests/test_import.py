@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+
+"""Tests for the cold import of the `rasterarea` package."""
+
+
+import json
+import subprocess
+import sys
+import unittest
+
+# Importing the core took several seconds when it pulled in geemap; it now takes well under this.
+IMPORT_BUDGET = 1.0
+
+HEAVY_MODULES = ["geemap", "ipyleaflet", "ipywidgets", "ipyfilechooser", "tkinter", "matplotlib", "netCDF4", "pandas", "rasterio"]
+
+SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import rasterarea
+elapsed = time.perf_counter() - start
+print(json.dumps({"elapsed": elapsed, "modules": sorted(sys.modules)}))
+"""
+
+
+def cold_import():
+    """Import rasterarea in a fresh interpreter and return the import time and loaded modules."""
+    output = subprocess.run([sys.executable, "-c", SCRIPT], capture_output=True, text=True, check=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+class TestImport(unittest.TestCase):
+    """Tests for the headless import of `rasterarea`."""
+
+    def test_no_heavy_modules(self):
+        """Test that importing the core does not load the widget and map dependencies."""
+        modules = set(cold_import()["modules"])
+        self.assertEqual([name for name in HEAVY_MODULES if name in modules], [])
+
+    def test_import_time(self):
+        """Test that the cold import time stays within budget."""
+        elapsed = min(cold_import()["elapsed"] for _ in range(3))
+        self.assertLess(elapsed, IMPORT_BUDGET)
+
+    def test_lazy_attributes(self):
+        """Test that the widgets and map backends are still reachable from the package."""
+        import rasterarea
+        from rasterarea import toolbar
+
+        self.assertIs(rasterarea.Toolbar, toolbar.Toolbar)
+        self.assertIs(rasterarea.rasterarea.Map, toolbar.Map)
+        self.assertTrue(hasattr(rasterarea.foliummap, "Map"))
+        with self.assertRaises(AttributeError):
+            rasterarea.missing
+
+
+if __name__ == "__main__":
+    unittest.main()
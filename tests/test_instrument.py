@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+
+"""Tests for the `rasterarea.instrument` module."""
+
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from rasterarea import instrument
+from rasterarea.rasterarea import pixel_area_array, total_area
+from tests.test_rasterarea import write_geotiff
+
+
+class TestInstrument(unittest.TestCase):
+    """Tests for the spans and reports of `instrument`."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        data = np.ones((64, 64), dtype="int16")
+        self.tif = write_geotiff(os.path.join(self.tmpdir.name, "test.tif"), data)
+        self.received = []
+        instrument.add_reporter(self.received.append)
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+        instrument.remove_reporter(self.received.append)
+        instrument.disable()
+        self.tmpdir.cleanup()
+
+    def test_disabled(self):
+        """Test that nothing is recorded while instrumentation is off."""
+        instrument.disable()
+        with instrument.span("outer") as stage:
+            stage.add(pixels=1)
+        total_area(self.tif)
+        self.assertEqual(self.received, [])
+
+    def test_total_area_report(self):
+        """Test the stages and counters of a streamed area computation."""
+        instrument.enable()
+        total_area(self.tif)
+        self.assertEqual(len(self.received), 1)
+        report = self.received[0]
+        self.assertIs(report, instrument.last_report())
+        self.assertEqual(report["name"], "total_area")
+        self.assertEqual(report["counters"], {"bytes_read": 64 * 64 * 2, "pixels": 64 * 64})
+        self.assertEqual(report["stages"]["total_area/read"]["calls"], 16)
+        self.assertEqual(report["stages"]["total_area/area"]["calls"], 16)
+        self.assertIn("total_area/mask", report["stages"])
+        self.assertLessEqual(report["stages"]["total_area/read"]["elapsed"], report["elapsed"])
+        self.assertIn("total_area/read:", instrument.format_report(report))
+
+    def test_nested_calls_report_once(self):
+        """Test that calls inside an outer span are reported as its stages."""
+        instrument.enable()
+        with instrument.span("job"):
+            pixel_area_array(np.zeros((10, 3)), toTable=True)
+        self.assertEqual(len(self.received), 1)
+        stages = self.received[0]["stages"]
+        self.assertEqual(stages["job/pixel_area_array"]["counters"], {"pixels": 10})
+        self.assertIn("job/pixel_area_array/to_table", stages)
+
+    def test_profile(self):
+        """Test cProfile capture of the outermost call."""
+        instrument.enable(profile=True)
+        total_area(self.tif)
+        self.assertIn("function calls", self.received[0]["profile"])
+
+
+if __name__ == "__main__":
+    unittest.main()
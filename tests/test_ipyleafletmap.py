@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+
+"""Tests for the `rasterarea.ipyleafletmap` module."""
+
+
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from rasterarea import ipyleafletmap
+
+
+class StandInTiler(BaseHTTPRequestHandler):
+    """Answers titiler metadata requests and counts them."""
+
+    requests = []
+
+    def do_GET(self):
+        StandInTiler.requests.append(self.path)
+        if self.path.startswith("/cog/info"):
+            body = {"bounds": [10, 20, 30, 40]}
+        else:
+            body = {"tiles": [f"http://tiles{self.path[-6:]}/{{z}}/{{x}}/{{y}}.png"]}
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestIpyleafletmap(unittest.TestCase):
+    """Tests for `rasterarea.ipyleafletmap`."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        StandInTiler.requests = []
+        ipyleafletmap.clear_http_cache()
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), StandInTiler)
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        self.endpoint = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def test_get_cog_metadata_is_cached(self):
+        """Test that COG metadata is fetched once per URL."""
+        bounds, tile = ipyleafletmap.get_cog_metadata("a.tif", titiler_endpoint=self.endpoint)
+        self.assertEqual(bounds, [10, 20, 30, 40])
+        self.assertTrue(tile.endswith("/{z}/{x}/{y}.png"))
+        ipyleafletmap.get_cog_metadata("a.tif", titiler_endpoint=self.endpoint)
+        self.assertEqual(len(StandInTiler.requests), 2)
+
+    def test_add_rasters(self):
+        """Test adding many remote layers at once."""
+        m = ipyleafletmap.Map()
+        urls = [f"layer{i}.tif" for i in range(5)]
+        m.add_rasters(urls, titiler_endpoint=self.endpoint)
+        self.assertEqual([layer.name for layer in m.layers[-5:]], [f"Raster {i}" for i in range(1, 6)])
+        self.assertEqual(len(StandInTiler.requests), 10)
+
+    def test_grid_aggregate(self):
+        """Test aggregating points per grid cell."""
+        import numpy as np
+
+        lon = np.array([0.1, 0.3, 5.5, -0.5])
+        lat = np.array([0.1, 0.5, 5.5, 0.5])
+        features = ipyleafletmap.grid_aggregate(lon, lat, 1.0)["features"]
+        cells = {tuple(f["geometry"]["coordinates"]): f["properties"]["count"] for f in features}
+        self.assertEqual(cells, {(-0.5, 0.5): 1, (0.2, 0.3): 2, (5.5, 5.5): 1})
+
+    def test_add_marker_from_csv_modes(self):
+        """Test that large CSV files do not create one marker widget per row."""
+        import os
+        import tempfile
+
+        import ipyleaflet
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            csv = os.path.join(tmpdir, "points.csv")
+            with open(csv, "w") as f:
+                f.write("name,longitude,latitude\n")
+                for i in range(20):
+                    f.write(f"p{i},{i},{i / 2}\n")
+            m = ipyleafletmap.Map()
+            cluster = m.add_marker_from_csv(csv, label="name")
+            self.assertIsInstance(cluster, ipyleaflet.MarkerCluster)
+            self.assertEqual(cluster.markers[3].title, "p3")
+
+            layer = m.add_marker_from_csv(csv, threshold=10)
+            self.assertIsInstance(layer, ipyleaflet.GeoJSON)
+            self.assertEqual(len(layer.data["features"][0]["geometry"]["coordinates"]), 20)
+
+            grid = m.add_marker_from_csv(csv, mode="grid")
+            total = sum(f["properties"]["count"] for f in grid.data["features"])
+            self.assertEqual(total, 20)
+            m.zoom = 10
+            self.assertEqual(len(grid.data["features"]), 20)
+
+    def test_csv_to_vector(self):
+        """Test the chunked conversion to GeoPackage and GeoParquet."""
+        import os
+        import tempfile
+
+        import geopandas as gpd
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            csv = os.path.join(tmpdir, "stations.csv")
+            with open(csv, "w") as f:
+                f.write("id,longitude,latitude\n")
+                for i in range(25):
+                    f.write(f"{i},{i - 10},{i / 2}\n")
+
+            gpkg = os.path.join(tmpdir, "stations.gpkg")
+            stats = ipyleafletmap.csv_to_vector(csv, gpkg, chunksize=10)
+            self.assertEqual(stats["rows"], 25)
+            gdf = gpd.read_file(gpkg)
+            self.assertEqual(list(gdf["id"]), list(range(25)))
+            self.assertEqual((gdf.geometry[24].x, gdf.geometry[24].y), (14.0, 12.0))
+
+            parquet = os.path.join(tmpdir, "stations.parquet")
+            ipyleafletmap.csv_to_vector(csv, parquet, chunksize=10)
+            ipyleafletmap.csv_to_vector(csv, parquet, chunksize=20)
+            gdf = gpd.read_parquet(parquet)
+            self.assertEqual(len(gdf), 25)
+            self.assertEqual(gdf.crs, "EPSG:4326")
+
+    def test_csv_to_vector_dtypes(self):
+        """Test that every chunk is written with the column dtypes of the first one."""
+        import os
+        import tempfile
+
+        import geopandas as gpd
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            csv = os.path.join(tmpdir, "stations.csv")
+            with open(csv, "w") as f:
+                f.write("id,note,longitude,latitude\n")
+                for i in range(10):
+                    f.write(f"{i},,{i},{i}\n")
+                for i in range(10, 20):
+                    f.write(f",x,{i},{i}\n")
+
+            parquet = os.path.join(tmpdir, "stations.parquet")
+            ipyleafletmap.csv_to_vector(csv, parquet, chunksize=10)
+            gdf = gpd.read_parquet(parquet)
+            self.assertTrue(gdf["note"].iloc[:10].isna().all())
+            self.assertEqual(list(gdf["note"].iloc[10:]), ["x"] * 10)
+            self.assertEqual(gdf["id"].iloc[9], 9)
+            self.assertTrue(gdf["id"].iloc[10:].isna().all())
+
+            gpkg = os.path.join(tmpdir, "stations.gpkg")
+            ipyleafletmap.csv_to_vector(csv, gpkg, chunksize=10)
+            gdf = gpd.read_file(gpkg)
+            self.assertEqual(list(gdf["note"].iloc[10:]), ["x"] * 10)
+
+            with open(csv, "a") as f:
+                f.write("1.5,y,1,1\n")
+            with self.assertRaises(ValueError):
+                ipyleafletmap.csv_to_vector(csv, parquet, chunksize=10)
+            with self.assertRaises(ValueError):
+                ipyleafletmap.csv_to_vector(csv, gpkg, chunksize=10)
+            self.assertEqual(len(gpd.read_parquet(parquet)), 20)
+            self.assertEqual(len(gpd.read_file(gpkg)), 20)
+            self.assertEqual([name for name in os.listdir(tmpdir) if name.startswith(".")], [])
+            ipyleafletmap.csv_to_vector(csv, parquet, chunksize=10, dtype={"id": "float64"})
+            self.assertEqual(gpd.read_parquet(parquet)["id"].iloc[20], 1.5)
+
+    def test_csv_to_vector_coordinates(self):
+        """Test that whole-number coordinates in the first chunk do not make the columns integers."""
+        import os
+        import tempfile
+
+        import geopandas as gpd
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            csv = os.path.join(tmpdir, "stations.csv")
+            with open(csv, "w") as f:
+                f.write("id,longitude,latitude\n")
+                for i in range(10):
+                    f.write(f"{i},{i},{-i}\n")
+                for i in range(10, 20):
+                    f.write(f"{i},{i + 0.25},{-i - 0.5}\n")
+
+            for out in ("stations.parquet", "stations.gpkg"):
+                path = os.path.join(tmpdir, out)
+                ipyleafletmap.csv_to_vector(csv, path, chunksize=10)
+                gdf = gpd.read_parquet(path) if out.endswith(".parquet") else gpd.read_file(path)
+                self.assertEqual(gdf["longitude"].dtype, "float64")
+                self.assertEqual(gdf["id"].iloc[19], 19)
+                self.assertEqual((gdf.geometry[19].x, gdf.geometry[19].y), (19.25, -19.5))
@@ -3,19 +3,421 @@
 """Tests for `rasterarea` package."""
 
 
+import os
+import tempfile
 import unittest
 
+import numpy as np
+
 from rasterarea import rasterarea
 
 
+SAMPLE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "docs", "examples", "data", "grace_tif")
+
+
+def write_geotiff(path, data, transform=None, nodata=None, **kwargs):
+    """Write a single-band test GeoTIFF in EPSG:4326."""
+    import rasterio
+    from affine import Affine
+
+    if transform is None:
+        transform = Affine(1.0, 0.0, -180.0, 0.0, -1.0, 90.0)
+    profile = dict(driver="GTiff", height=data.shape[0], width=data.shape[1], count=1,
+                   dtype=data.dtype, crs="EPSG:4326", transform=transform, nodata=nodata,
+                   tiled=True, blockxsize=16, blockysize=16)
+    profile.update(kwargs)
+    with rasterio.open(path, "w", **profile) as dst:
+        dst.write(data, 1)
+    return path
+
+
 class TestRasterarea(unittest.TestCase):
     """Tests for `rasterarea` package."""
 
     def setUp(self):
         """Set up test fixtures, if any."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        rng = np.random.default_rng(0)
+        self.data = rng.integers(0, 4, size=(180, 360)).astype("int16")
+        self.data[:20, :] = -9999
+        self.tif = write_geotiff(os.path.join(self.tmpdir.name, "test.tif"), self.data, nodata=-9999)
 
     def tearDown(self):
         """Tear down test fixtures, if any."""
+        self.tmpdir.cleanup()
 
     def test_000_something(self):
         """Test something."""
+
+    def test_area_of_pixel_array_matches_scalar(self):
+        """Test the vectorized area formula against area_of_pixel."""
+        lats = np.linspace(-89.75, 89.75, 360)
+        for coordinatesp in ['WGS84', 'GRS67', 'Krassovsky']:
+            expected = [rasterarea.area_of_pixel(lat, 0.5, coordinatesp) for lat in lats]
+            result = rasterarea.area_of_pixel_array(lats, 0.5, coordinatesp)
+            np.testing.assert_allclose(result, expected, rtol=1e-9)
+
+    def test_area_of_pixel_array_invalid_ellipsoid(self):
+        """Test that an unknown ellipsoid name raises ValueError."""
+        with self.assertRaises(ValueError):
+            rasterarea.area_of_pixel_array([0.0], coordinatesp='Mars')
+
+    def test_pixel_area_array(self):
+        """Test that pixel_area_array fills the area column."""
+        point_cloud = np.array([[10.0, 0.5, 3.0], [11.0, 45.5, 7.0]])
+        expected = [rasterarea.area_of_pixel(0.5), rasterarea.area_of_pixel(45.5)]
+        result = rasterarea.pixel_area_array(point_cloud, chunk_size=1)
+        np.testing.assert_allclose(result[:, 2], expected)
+        np.testing.assert_array_equal(result[:, :2], point_cloud[:, :2])
+        self.assertEqual(list(point_cloud[:, 2]), [3.0, 7.0])
+        table = rasterarea.pixel_area_array(np.array([[10.0, 0.5, 3.0]]), toTable=True)
+        self.assertEqual(list(table.columns), ['center_lon', 'center_lat', 'pixel_area'])
+
+    def test_pixel_area_array_output_options(self):
+        """Test the out, dtype, area_only and inplace options of pixel_area_array."""
+        point_cloud = np.array([[10.0, 0.5, 3.0], [11.0, 45.5, 7.0]])
+        expected = [rasterarea.area_of_pixel(0.5), rasterarea.area_of_pixel(45.5)]
+
+        areas = rasterarea.pixel_area_array(point_cloud, area_only=True, dtype="float32")
+        self.assertEqual((areas.shape, areas.dtype), ((2,), np.float32))
+        np.testing.assert_allclose(areas, expected, rtol=1e-6)
+
+        out = np.zeros(2)
+        self.assertIs(rasterarea.pixel_area_array(point_cloud, area_only=True, out=out), out)
+        np.testing.assert_allclose(out, expected)
+        with self.assertRaises(ValueError):
+            rasterarea.pixel_area_array(point_cloud, out=out)
+
+        series = rasterarea.pixel_area_array(point_cloud, area_only=True, toTable=True)
+        self.assertEqual(series.name, 'pixel_area')
+
+        result = rasterarea.pixel_area_array(point_cloud, inplace=True)
+        self.assertIs(result, point_cloud)
+        np.testing.assert_allclose(point_cloud[:, 2], expected)
+
+    def test_row_area_table(self):
+        """Test the per-row area table and its broadcast grid."""
+        from affine import Affine
+
+        transform = Affine(0.5, 0.0, -180.0, 0.0, -0.5, 90.0)
+        rows = rasterarea.row_area_table(transform, 360)
+        self.assertEqual(rows.shape, (360,))
+        self.assertAlmostEqual(rows[0], rasterarea.area_of_pixel(89.75, 0.5) * 0.5)
+        self.assertAlmostEqual(rows.sum() * 720 / 5.10065621e14, 1.0, places=6)
+
+        grid = rasterarea.pixel_area_grid(transform, (360, 720))
+        self.assertEqual(grid.shape, (360, 720))
+        self.assertEqual(grid.strides[1], 0)
+        np.testing.assert_array_equal(grid[:, 100], rows)
+
+        with self.assertRaises(ValueError):
+            rasterarea.row_area_table(Affine(0.5, 0.1, 0.0, 0.0, -0.5, 0.0), 10)
+
+    def test_total_area(self):
+        """Test the streamed total area against the full area grid."""
+        transform = rasterarea.get_geotiff_transform(self.tif)
+        grid = rasterarea.pixel_area_grid(transform, self.data.shape)
+        expected = grid[self.data != -9999].sum()
+        self.assertAlmostEqual(rasterarea.total_area(self.tif) / expected, 1.0, places=12)
+        everything = rasterarea.total_area(self.tif, nodata=12345)
+        self.assertAlmostEqual(everything / grid.sum(), 1.0, places=12)
+
+    def test_class_area(self):
+        """Test the per-class area against the full area grid."""
+        transform = rasterarea.get_geotiff_transform(self.tif)
+        grid = rasterarea.pixel_area_grid(transform, self.data.shape)
+        areas = rasterarea.class_area(self.tif)
+        self.assertEqual(list(areas), [0, 1, 2, 3])
+        for value, area in areas.items():
+            self.assertAlmostEqual(area / grid[self.data == value].sum(), 1.0, places=12)
+        self.assertAlmostEqual(sum(areas.values()) / rasterarea.total_area(self.tif), 1.0, places=12)
+
+    def test_threshold_area(self):
+        """Test the area at or above and below a threshold against the full area grid."""
+        transform = rasterarea.get_geotiff_transform(self.tif)
+        grid = rasterarea.pixel_area_grid(transform, self.data.shape)
+        above = rasterarea.threshold_area(self.tif, 2)
+        below = rasterarea.threshold_area(self.tif, 2, below=True)
+        self.assertAlmostEqual(above / grid[self.data >= 2].sum(), 1.0, places=12)
+        self.assertAlmostEqual(below / grid[(self.data < 2) & (self.data != -9999)].sum(), 1.0, places=12)
+        self.assertAlmostEqual((above + below) / rasterarea.total_area(self.tif), 1.0, places=12)
+
+    def test_batch_area(self):
+        """Test that batch_area keeps input order and reports failures."""
+        missing = os.path.join(self.tmpdir.name, "missing.tif")
+        result = rasterarea.batch_area([self.tif, missing, self.tif], max_workers=2)
+        self.assertEqual(list(result["path"]), [self.tif, missing, self.tif])
+        expected = rasterarea.total_area(self.tif)
+        self.assertAlmostEqual(result["area"][0], expected)
+        self.assertAlmostEqual(result["area"][2], expected)
+        self.assertTrue(result["error"].isna()[0])
+        self.assertIn("RasterioIOError", result["error"][1])
+
+        result = rasterarea.batch_area(os.path.join(self.tmpdir.name, "*.tif"), func=rasterarea.class_area, max_workers=1)
+        self.assertEqual(list(result["area"][0]), [0, 1, 2, 3])
+
+    def test_zonal_area(self):
+        """Test the zonal area against the area grid inside each polygon."""
+        import geopandas as gpd
+        from shapely.geometry import box
+
+        gdf = gpd.GeoDataFrame({"name": ["a", "b", "c"]},
+                               geometry=[box(-170, -50, -100, 10), box(0, 60, 40, 89), box(50, 0, 60, 5)],
+                               crs="EPSG:4326")
+        result = rasterarea.zonal_area(self.tif, gdf)
+        self.assertIsInstance(result, gpd.GeoDataFrame)
+        grid = rasterarea.pixel_area_grid(rasterarea.get_geotiff_transform(self.tif), self.data.shape)
+        valid = self.data != -9999
+        expected = [grid[80:140, 10:80][valid[80:140, 10:80]].sum(),
+                    grid[1:30, 180:220][valid[1:30, 180:220]].sum(),
+                    grid[85:90, 230:240][valid[85:90, 230:240]].sum()]
+        np.testing.assert_allclose(result["pixel_area"], expected, rtol=1e-12)
+        self.assertNotIn("area", result.columns)
+        np.testing.assert_allclose(rasterarea.zonal_area(self.tif, gdf, column="water")["water"], expected, rtol=1e-12)
+
+    def test_zonal_area_overlap(self):
+        """Test that overlapping polygons each get the area of all their pixels."""
+        import geopandas as gpd
+        from shapely.geometry import box
+
+        polygons = [box(-170, -50, -100, 10), box(-130, -30, -60, 30), box(-100, -50, -90, 10)]
+        gdf = gpd.GeoDataFrame({"name": ["a", "b", "c"]}, geometry=polygons, crs="EPSG:4326")
+        grid = rasterarea.pixel_area_grid(rasterarea.get_geotiff_transform(self.tif), self.data.shape)
+        valid = self.data != -9999
+        result = rasterarea.zonal_area(self.tif, gdf)
+        expected = [grid[80:140, 10:80][valid[80:140, 10:80]].sum(),
+                    grid[60:120, 50:120][valid[60:120, 50:120]].sum(),
+                    grid[80:140, 80:90][valid[80:140, 80:90]].sum()]
+        np.testing.assert_allclose(result["pixel_area"], expected, rtol=1e-12)
+
+        result = rasterarea.zonal_area(self.tif, gdf, all_touched=True)
+        expected = [rasterarea.zonal_area(self.tif, gdf.iloc[[i]], all_touched=True)["pixel_area"].iloc[0] for i in range(len(gdf))]
+        np.testing.assert_allclose(result["pixel_area"], expected, rtol=1e-12)
+
+    def test_area_weighted_stats(self):
+        """Test the area-weighted sum and mean against the area grid."""
+        grid = rasterarea.pixel_area_grid(rasterarea.get_geotiff_transform(self.tif), self.data.shape)
+        valid = self.data != -9999
+        stats = rasterarea.area_weighted_stats(self.tif)
+        expected_sum = (self.data[valid] * grid[valid]).sum()
+        self.assertAlmostEqual(stats["sum"] / expected_sum, 1.0, places=12)
+        self.assertAlmostEqual(stats["area"] / grid[valid].sum(), 1.0, places=12)
+        self.assertAlmostEqual(stats["mean"], expected_sum / grid[valid].sum())
+
+    def test_projected_raster(self):
+        """Test that the area functions reject rasters in a projected CRS."""
+        import geopandas as gpd
+        from affine import Affine
+        from shapely.geometry import box
+
+        utm = write_geotiff(os.path.join(self.tmpdir.name, "utm.tif"), np.ones((100, 100), dtype="uint8"),
+                            transform=Affine(30.0, 0.0, 500000.0, 0.0, -30.0, 5000000.0), crs="EPSG:32633")
+        for func in (rasterarea.total_area, rasterarea.class_area, rasterarea.area_weighted_stats):
+            with self.assertRaisesRegex(ValueError, "projected CRS EPSG:32633"):
+                func(utm)
+        with self.assertRaises(ValueError):
+            rasterarea.threshold_area(utm, 1)
+        gdf = gpd.GeoDataFrame(geometry=[box(500000, 4997000, 503000, 5000000)], crs="EPSG:32633")
+        with self.assertRaises(ValueError):
+            rasterarea.zonal_area(utm, gdf)
+        result = rasterarea.batch_area([utm], max_workers=1)
+        self.assertIn("projected CRS", result["error"][0])
+
+    def test_get_pixel_values(self):
+        """Test the single-pixel reads of Toolbar.get_pixel_values."""
+        values = rasterarea.Toolbar.get_pixel_values(None, [self.tif, self.tif], (45.5, -170.5))
+        self.assertEqual(values, [self.data[44, 9], self.data[44, 9]])
+        self.assertTrue(np.isnan(rasterarea._read_pixel(self.tif, 95.0, 0.0)))
+
+    def test_extract_points(self):
+        """Test the batched point extraction against direct indexing."""
+        import pandas as pd
+
+        first = write_geotiff(os.path.join(self.tmpdir.name, "cg200301.tif"), self.data, nodata=-9999)
+        doubled = np.where(self.data == -9999, np.nan, self.data * 2).astype("float32")
+        second = write_geotiff(os.path.join(self.tmpdir.name, "cg200302.tif"), doubled, nodata=np.nan)
+        points = [(45.5, -170.5), (-60.2, 100.7), (-60.9, 100.1), (95.0, 0.0), (85.5, 0.5)]
+        table = rasterarea.extract_points([first, second], points)
+        self.assertIsInstance(table.index, pd.DatetimeIndex)
+        self.assertEqual(list(table.index), [pd.Timestamp("2003-01-01"), pd.Timestamp("2003-02-01")])
+        expected = [self.data[44, 9], self.data[150, 280], self.data[150, 280], np.nan, np.nan]
+        np.testing.assert_array_equal(table.iloc[0], expected)
+        np.testing.assert_array_equal(table.iloc[1], np.array(expected) * 2)
+        self.assertTrue(np.isnan(rasterarea._read_pixel(first, 85.5, 0.5)))
+        self.assertTrue(np.isnan(rasterarea._read_pixel(second, 85.5, 0.5)))
+
+        with self.assertRaises(ValueError):
+            rasterarea.extract_points([self.tif], points)
+
+        csv = os.path.join(self.tmpdir.name, "points.csv")
+        with open(csv, "w") as f:
+            f.write("name,latitude,longitude\na,45.5,-170.5\nb,-60.2,100.7\n")
+        table = rasterarea.extract_points([self.tif], csv, label="name", dates=["2018-01-01"])
+        self.assertEqual(list(table.columns), ["a", "b"])
+        self.assertEqual(table.loc["2018-01-01", "b"], self.data[150, 280])
+
+    def test_geotiff_metadata_cache(self):
+        """Test that repeated metadata lookups open the file once."""
+        rasterarea.clear_geotiff_metadata_cache()
+        self.assertEqual(rasterarea.get_geotiff_shape(self.tif), (180, 360))
+        self.assertEqual(rasterarea.get_geotiff_nodata(self.tif), -9999)
+        self.assertEqual(rasterarea.get_geotiff_resolution(self.tif), (1.0, 1.0))
+        self.assertEqual(rasterarea.get_geotiff_info(self.tif)["dtype"], "int16")
+        info = rasterarea.geotiff_metadata_cache_info()
+        self.assertEqual((info["misses"], info["hits"]), (1, 3))
+        self.assertEqual(info["hit_rate"], 0.75)
+
+        write_geotiff(self.tif, self.data[:90], nodata=-9999)
+        self.assertEqual(rasterarea.get_geotiff_shape(self.tif), (90, 360))
+
+    def test_get_geotiff_array_options(self):
+        """Test windowed, bounded, decimated, buffered and masked reads."""
+        np.testing.assert_array_equal(rasterarea.get_geotiff_array(self.tif), self.data)
+        part = rasterarea.get_geotiff_array(self.tif, window=((10, 30), (5, 25)))
+        np.testing.assert_array_equal(part, self.data[10:30, 5:25])
+        part = rasterarea.get_geotiff_array(self.tif, bounds=(-175, 60, -155, 80))
+        np.testing.assert_array_equal(part, self.data[10:30, 5:25])
+        self.assertEqual(rasterarea.get_geotiff_array(self.tif, out_shape=(90, 180)).shape, (90, 180))
+
+        buffer = np.empty((20, 20), dtype="int16")
+        result = rasterarea.get_geotiff_array(self.tif, window=((10, 30), (5, 25)), out=buffer)
+        self.assertIs(result, buffer)
+
+        masked = rasterarea.get_geotiff_array(self.tif, masked=True)
+        self.assertTrue(masked.mask[:20].all())
+        self.assertFalse(masked.mask[20:].any())
+
+        buffer = np.zeros((180, 360), dtype="int16")
+        masked = rasterarea.get_geotiff_array(self.tif, out=buffer, masked=True)
+        self.assertIsInstance(masked, np.ma.MaskedArray)
+        self.assertTrue(np.shares_memory(masked.data, buffer))
+        np.testing.assert_array_equal(buffer, self.data)
+        self.assertTrue(masked.mask[:20].all())
+        self.assertFalse(masked.mask[20:].any())
+
+    def test_row_area_table_disk_cache(self):
+        """Test that area tables are cached on disk and evicted by size."""
+        from affine import Affine
+
+        cache_dir = os.path.join(self.tmpdir.name, "cache")
+        transform = Affine(0.5, 0.0, -180.0, 0.0, -0.5, 90.0)
+        rows = rasterarea.row_area_table(transform, 360, cache_dir=cache_dir)
+        self.assertEqual(len(os.listdir(cache_dir)), 1)
+        cached = rasterarea.row_area_table(transform, 360, cache_dir=cache_dir)
+        self.assertIsInstance(cached, np.memmap)
+        np.testing.assert_array_equal(cached, rows)
+
+        rasterarea.row_area_table(transform, 360, coordinatesp="GRS80", cache_dir=cache_dir)
+        self.assertEqual(len(os.listdir(cache_dir)), 2)
+        os.environ["RASTERAREA_CACHE_MAX_BYTES"] = "4000"
+        try:
+            rasterarea.row_area_table(transform, 180, cache_dir=cache_dir)
+        finally:
+            del os.environ["RASTERAREA_CACHE_MAX_BYTES"]
+        self.assertEqual(len(os.listdir(cache_dir)), 1)
+        rasterarea.clear_area_cache(cache_dir)
+        self.assertEqual(os.listdir(cache_dir), [])
+
+    def test_get_geotiff_preview(self):
+        """Test that previews are decimated, masked and backed by overviews."""
+        preview = rasterarea.get_geotiff_preview(self.tif, max_size=90)
+        self.assertEqual(preview.shape, (45, 90))
+        self.assertTrue(preview.mask[:5].all())
+        self.assertTrue(os.path.exists(self.tif + ".ovr"))
+        self.assertEqual(rasterarea.build_overviews(self.tif), [2, 4])
+
+        full = rasterarea.get_geotiff_preview(self.tif, max_size=400)
+        self.assertEqual(full.shape, (180, 360))
+
+    def test_date_from_filename(self):
+        """Test the date parser on the file names of the sample data."""
+        from datetime import datetime
+
+        names = sorted(os.listdir(SAMPLE_DIR))
+        self.assertEqual(len(names), 14)
+        dates = {name: rasterarea.date_from_filename(name) for name in names}
+        self.assertEqual(dates["GRD-3_2018152-2018181_GRFO_UTCSR_BA01_0600_LND_v04.tif"], datetime(2018, 6, 30))
+        self.assertEqual(dates["GRD-3_2018213-2018243_GRFO_UTCSR_BA01_0600_LND_v04.tif"], datetime(2018, 8, 31))
+        self.assertEqual(dates["cg200301.tif"], datetime(2003, 1, 1))
+        self.assertEqual(dates["cg200312.tif"], datetime(2003, 12, 1))
+        self.assertEqual(rasterarea.date_from_filename("GRD_2018360005_v1.tif"), datetime(2019, 1, 5))
+        with self.assertRaises(ValueError):
+            rasterarea.date_from_filename("elevation.tif")
+
+    def test_resample_sample_data(self):
+        """Test that the sample GRACE stacks are resampled by their file name dates."""
+        import glob
+
+        grd = rasterarea.resample_stack(sorted(glob.glob(os.path.join(SAMPLE_DIR, "GRD-3_*.tif"))), how="area_mean")
+        self.assertEqual([str(date.date()) for date in grd.index], ["2018-06-01", "2018-07-01", "2018-08-01"])
+        cg = rasterarea.resample_stack(sorted(glob.glob(os.path.join(SAMPLE_DIR, "cg*.tif"))), freq="Y", how="area_mean")
+        self.assertEqual([str(date.date()) for date in cg.index], ["2003-01-01"])
+
+    def test_toolbar_check_dates(self):
+        """Test that the Toolbar accepts any number of files dated in the selected range."""
+        import pandas as pd
+        from datetime import date
+
+        daily = pd.date_range("2018-01-01", "2018-12-31", freq="D")
+        self.assertEqual(rasterarea.Toolbar.check_dates(daily, date(2018, 1, 1), date(2018, 12, 31)), "")
+        self.assertIn("none of the 365 files", rasterarea.Toolbar.check_dates(daily, date(2019, 1, 1), date(2019, 2, 1)))
+        self.assertIn("start date", rasterarea.Toolbar.check_dates(daily, date(2018, 2, 1), date(2018, 1, 1)))
+
+    def test_resample_stack(self):
+        """Test monthly means, sums and area-weighted means of a daily stack."""
+        rng = np.random.default_rng(1)
+        days = [1, 15, 40, 41, 42]
+        stack = rng.normal(size=(5, 180, 360)).astype("float32").astype("float64")
+        stack[2, 50:60, :] = -9999
+        files = []
+        for day, data in zip(days, stack):
+            path = os.path.join(self.tmpdir.name, f"GRD-3_2018{day:03d}-2018{day:03d}_GRFO_UTCSR_BA01_0600_LND_v04.tif")
+            files.append(write_geotiff(path, data.astype("float32"), nodata=-9999))
+
+        index, means = rasterarea.resample_stack(files[::-1], freq="M")
+        self.assertEqual([str(date.date()) for date in index], ["2018-01-01", "2018-02-01"])
+        np.testing.assert_allclose(means[0], stack[:2].mean(axis=0), rtol=1e-12)
+        february = np.ma.masked_equal(stack[2:], -9999).mean(axis=0)
+        np.testing.assert_allclose(means[1], february, rtol=1e-12)
+
+        _, sums = rasterarea.resample_stack(files, freq="Y", how="sum")
+        self.assertEqual(sums.shape, (1, 180, 360))
+        np.testing.assert_allclose(sums[0], np.ma.masked_equal(stack, -9999).sum(axis=0), rtol=1e-12)
+
+        area_mean = rasterarea.resample_stack(files, freq="M", how="area_mean")
+        grid = rasterarea.pixel_area_grid(rasterarea.get_geotiff_transform(files[0]), (180, 360))
+        expected = (stack[:2] * grid).sum() / (2 * grid.sum())
+        self.assertAlmostEqual(area_mean.iloc[0], expected)
+
+    def test_resample_stack_one_file_open(self):
+        """Test that the files of a stack are opened one at a time."""
+        from unittest import mock
+
+        import rasterio
+
+        files = []
+        for day in range(1, 41):
+            path = os.path.join(self.tmpdir.name, f"GRD-3_2018{day:03d}-2018{day:03d}_GRFO_UTCSR_BA01_0600_LND_v04.tif")
+            files.append(write_geotiff(path, self.data, nodata=-9999))
+        open_files = []
+        most = [0]
+        real_open = rasterio.open
+
+        def tracking_open(*args, **kwargs):
+            src = real_open(*args, **kwargs)
+            close = src.close
+            open_files.append(src)
+            most[0] = max(most[0], len(open_files))
+
+            def tracked_close():
+                open_files.remove(src)
+                close()
+
+            src.close = tracked_close
+            return src
+
+        with mock.patch("rasterio.open", tracking_open):
+            index, means = rasterarea.resample_stack(files, freq="M")
+        self.assertEqual(most[0], 1)
+        self.assertEqual(len(index), 2)
+        np.testing.assert_array_equal(means[1], np.where(self.data == -9999, np.nan, self.data))
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+
+"""Tests for the `rasterarea.tileserver` module."""
+
+
+import io
+import os
+import tempfile
+import unittest
+import urllib.error
+import urllib.request
+from unittest import mock
+
+import numpy as np
+
+from rasterarea.tileserver import TileServer, tile_bounds
+from tests.test_rasterarea import write_geotiff
+
+
+class TestTileServer(unittest.TestCase):
+    """Tests for `TileServer`."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        data = np.tile(np.linspace(0, 1, 360, dtype="float32"), (180, 1))
+        data[:, :180] = -9999
+        self.tif = write_geotiff(os.path.join(self.tmpdir.name, "test.tif"), data, nodata=-9999)
+        self.server = TileServer(cache_size=2)
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+        self.server.shutdown()
+        self.tmpdir.cleanup()
+
+    def test_tile_bounds(self):
+        """Test the Web Mercator bounds of XYZ tiles."""
+        left, bottom, right, top = tile_bounds(0, 0, 0)
+        self.assertAlmostEqual(left, -top)
+        self.assertAlmostEqual(right, top)
+        self.assertEqual(tile_bounds(1, 1, 0), (0.0, 0.0, right, top))
+
+    def test_serve_tiles(self):
+        """Test rendering, caching and serving tiles over HTTP."""
+        from PIL import Image
+
+        layer_id = self.server.add(self.tif)
+        np.testing.assert_allclose(self.server.bounds(layer_id), (-180, -90, 180, 90))
+
+        url = self.server.tile_url(layer_id).format(z=1, x=0, y=0)
+        with urllib.request.urlopen(url) as response:
+            self.assertEqual(response.headers["Content-Type"], "image/png")
+            body = response.read()
+        image = np.asarray(Image.open(io.BytesIO(body)))
+        self.assertEqual(image.shape, (256, 256, 4))
+        self.assertTrue((image[..., 3] == 0).all())
+
+        east = self.server.get_tile(layer_id, 1, 1, 0)
+        image = np.asarray(Image.open(io.BytesIO(east)))
+        self.assertTrue((image[..., 3] == 255).all())
+
+        self.assertIs(self.server.get_tile(layer_id, 1, 1, 0), east)
+        self.server.get_tile(layer_id, 5, 31, 31)
+        self.assertEqual(self.server.cache_info(), {"hits": 1, "misses": 3, "size": 2})
+
+        with self.assertRaises(urllib.error.HTTPError):
+            urllib.request.urlopen(self.server.tile_url("unknown").format(z=0, x=0, y=0))
+
+    def test_no_files_written(self):
+        """Test that adding a layer only writes overviews when asked to."""
+        from affine import Affine
+
+        data = np.tile(np.linspace(0, 1, 2048, dtype="float32"), (1024, 1))
+        large = write_geotiff(os.path.join(self.tmpdir.name, "large.tif"), data,
+                              transform=Affine(360 / 2048, 0.0, -180.0, 0.0, -180 / 1024, 90.0))
+        self.server.add(large)
+        self.assertEqual(sorted(os.listdir(self.tmpdir.name)), ["large.tif", "test.tif"])
+        self.server.add(large, palette="gray", overviews=True)
+        self.assertTrue(os.path.exists(large + ".ovr"))
+
+    def test_client_prefix(self):
+        """Test the tile URLs behind a proxy or a public address."""
+        port = self.server.port
+        self.assertEqual(self.server.tile_url("abc"), f"http://127.0.0.1:{port}/abc/{{z}}/{{x}}/{{y}}.png")
+
+        self.server.client_prefix = "proxy/{port}/"
+        self.assertEqual(self.server.tile_url("abc"), f"/proxy/{port}/abc/{{z}}/{{x}}/{{y}}.png")
+        self.server.client_prefix = "https://hub.example.org/user/me/proxy/{port}"
+        self.assertEqual(self.server.base_url(), f"https://hub.example.org/user/me/proxy/{port}")
+
+        with mock.patch.dict(os.environ, {"LOCALTILESERVER_CLIENT_PREFIX": "user/me/proxy/{port}"}):
+            server = TileServer()
+            try:
+                self.assertEqual(server.base_url(), f"/user/me/proxy/{server.port}")
+            finally:
+                server.shutdown()
+        with mock.patch.dict(os.environ, {"RASTERAREA_TILE_CLIENT_PREFIX": "http://myhost:{port}"}):
+            server = TileServer(host="0.0.0.0")
+            try:
+                self.assertEqual(server.base_url(), f"http://myhost:{server.port}")
+            finally:
+                server.shutdown()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+
+"""Tests for the `rasterarea.vector` module."""
+
+
+import unittest
+
+import geopandas as gpd
+import numpy as np
+import shapely
+from shapely.geometry import Polygon
+
+from rasterarea.vector import SimplifiedLayer, count_coordinates, simplify, zoom_tolerance
+
+
+def circles(n, vertices=2000):
+    """Build a GeoDataFrame of n detailed circles spread along the equator."""
+    angles = np.linspace(0, 2 * np.pi, vertices, endpoint=False)
+    geometry = [
+        Polygon(np.column_stack([10 * i + np.cos(angles), np.sin(angles)])) for i in range(n)
+    ]
+    return gpd.GeoDataFrame({"id": range(n)}, geometry=geometry, crs="EPSG:4326")
+
+
+class TestSimplifiedLayer(unittest.TestCase):
+    """Tests for `SimplifiedLayer`."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        self.gdf = circles(5)
+        self.layer = SimplifiedLayer(self.gdf, zoom_levels=[2, 8, 14])
+
+    def test_level(self):
+        """Test the choice of the precomputed level."""
+        self.assertEqual(self.layer.level(1), 2)
+        self.assertEqual(self.layer.level(5.5), 8)
+        self.assertEqual(self.layer.level(18), 14)
+
+    def test_simplification(self):
+        """Test that low zoom levels have fewer, rounded coordinates."""
+        coarse = self.layer.to_geojson(2)
+        fine = self.layer.to_geojson(14)
+        self.assertEqual(len(coarse["features"]), 5)
+        coarse_ring = coarse["features"][0]["geometry"]["coordinates"][0]
+        fine_ring = fine["features"][0]["geometry"]["coordinates"][0]
+        self.assertLess(len(coarse_ring), len(fine_ring) // 10)
+        self.assertGreaterEqual(len(coarse_ring), 4)
+        decimals = int(np.ceil(-np.log10(zoom_tolerance(2)))) + 1
+        for x, y in coarse_ring:
+            self.assertEqual(round(x, decimals), x)
+            self.assertEqual(round(y, decimals), y)
+        self.assertEqual(fine["features"][3]["properties"]["id"], 3)
+
+    def test_bounds(self):
+        """Test that only the features in view are returned."""
+        geojson = self.layer.to_geojson(8, bounds=(8, -2, 22, 2))
+        self.assertEqual([f["properties"]["id"] for f in geojson["features"]], [1, 2])
+
+    def test_reprojection(self):
+        """Test that projected layers are converted to longitude and latitude."""
+        layer = SimplifiedLayer(self.gdf.to_crs("EPSG:3857"), zoom_levels=[8])
+        ring = np.array(layer.to_geojson(8)["features"][1]["geometry"]["coordinates"][0])
+        np.testing.assert_allclose(ring.min(axis=0), (9, -1), atol=1e-2)
+        np.testing.assert_allclose(ring.max(axis=0), (11, 1), atol=1e-2)
+
+    @unittest.skipUnless(hasattr(shapely, "coverage_simplify"), "requires shapely 2.1")
+    def test_shared_borders(self):
+        """Test that adjacent polygons keep a common border at every level."""
+        y = np.linspace(0, 10, 2000)
+        border = list(zip(5 + 0.3 * np.sin(3 * y), y))
+        geometry = np.array([
+            Polygon([(0, 0)] + border + [(0, 10)]),
+            Polygon([(10, 0), (10, 10)] + border[::-1]),
+        ])
+        self.assertFalse(shapely.coverage_is_valid(shapely.simplify(geometry, zoom_tolerance(2))))
+        self.assertTrue(shapely.coverage_is_valid(simplify(geometry, zoom_tolerance(2))))
+
+        layer = SimplifiedLayer(gpd.GeoDataFrame(geometry=geometry, crs="EPSG:4326"), zoom_levels=[2, 8])
+        for zoom in (2, 8):
+            self.assertTrue(shapely.coverage_is_valid(layer.levels[zoom]))
+            self.assertLess(shapely.get_num_coordinates(layer.levels[zoom]).sum(), 4000)
+
+        circles_only = simplify(np.asarray(self.gdf.geometry.values), zoom_tolerance(2))
+        self.assertTrue(all(shapely.is_valid(circles_only)))
+
+    def test_count_coordinates(self):
+        """Test counting coordinates."""
+        self.assertEqual(count_coordinates(self.gdf), 5 * 2001)
+
+
+class TestMapLayers(unittest.TestCase):
+    """Tests for the optimized vector layers of the map backends."""
+
+    def test_ipyleaflet_updates_with_view(self):
+        """Test that the ipyleaflet layer follows the zoom and bounds of the map."""
+        from rasterarea.ipyleafletmap import Map
+
+        m = Map(zoom=2)
+        m.add_gdf(circles(5), name="circles", optimize=True)
+        layer = m.layers[-1]
+        coarse = len(layer.data["features"][0]["geometry"]["coordinates"][0])
+        m.zoom = 14
+        m.set_trait("bounds", ((-2, 8), (2, 12)))
+        self.assertEqual([f["properties"]["id"] for f in layer.data["features"]], [1])
+        fine = len(layer.data["features"][0]["geometry"]["coordinates"][0])
+        self.assertGreater(fine, coarse)
+
+    def test_folium_static_layer(self):
+        """Test that the folium layer is simplified for the initial zoom."""
+        from rasterarea.foliummap import Map
+
+        m = Map(zoom=2)
+        m.add_gdf(circles(5), name="circles")
+        m.add_gdf(circles(5), name="simplified", optimize=True)
+        full, simplified = list(m._children.values())[-2:]
+        self.assertGreater(
+            len(full.data["features"][0]["geometry"]["coordinates"][0]),
+            len(simplified.data["features"][0]["geometry"]["coordinates"][0]),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()